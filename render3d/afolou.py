@@ -11,7 +11,7 @@ import rendering3d
 
 pathFile = os.path.dirname(__file__)
 
-rendering3d.orthographicProjection = False
+rendering3d.camera.orthographic = False
 
 pygame.init()
 WIDTH = 800
@@ -54,6 +54,9 @@ pygame.mixer.music.load(os.path.join(pathFile, "sounds/musica.mp3"))
 pygame.mixer.music.set_volume(.05)
 pygame.mixer.music.play(-1) # O primeiro argumento é o tanto de repetições da música; se for -1, repete infinitamente
 
+# Keeps what was drawn last frame, so only what changed is redrawn
+renderer = rendering3d.Renderer(window)
+
 while True:
     # Mouse input
     left, middle, right = pygame.mouse.get_pressed()
@@ -73,10 +76,8 @@ while True:
             if rightButtonDown:
                 rendering3d.rotate(event.rel[1], event.rel[0], 0)
 
-    window.fill(WHITE)
-
-    afolouCube.draw(drawTextures=True)
+    rects = renderer.renderDirty([afolouCube], WHITE, drawTextures=True)
 
     pygame.display.set_caption(f"A a folou | FPS: {clock.get_fps():.0f}")
-    pygame.display.update()
+    renderer.present(rects)
     clock.tick(FPS)
\ No newline at end of file
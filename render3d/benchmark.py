@@ -0,0 +1,133 @@
+import os
+import sys
+sys.dont_write_bytecode = True
+# The benchmark doesn't need a visible window, and pygame's banner would end up in the JSON output
+os.environ.setdefault("RENDER3D_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import argparse
+import glob
+import json
+import numpy as np
+from pygame.math import Vector3
+import rendering3d
+from rendering3d import BaseObject, Cube, Sphere, InstancedObject, Renderer, WIDTH, HEIGHT, WHITE, RED, GREEN, BLUE, YELLOW, ORANGE
+from objects_info.read_obj import loadObj
+import objects_info.cube
+
+pathFile = os.path.dirname(__file__)
+
+FRAMES = 60
+
+# Camera paths, as the total scene rotation (degrees around x, y, z) over a run. Each frame moves one step along it
+CAMERA_PATHS = {
+    "yaw": Vector3(0, 360, 0),
+    "pitch": Vector3(360, 0, 0),
+    "tumble": Vector3(360, 720, 180),
+}
+
+def loadObject(filePath: str) -> BaseObject:
+    mesh = loadObj(filePath)
+    obj = BaseObject(Vector3(WIDTH/2, HEIGHT/2, 3), faces=mesh.getFaces())
+    obj.points = mesh.getVertices()
+    obj.size = 100
+    obj.buildLevelsOfDetail()
+    return obj
+
+def getVoxelGrid(count: int) -> InstancedObject:
+    # A count^3 grid of cubes inside the unit cube, drawn as instances of one mesh and colored by position
+    cells = np.stack(np.meshgrid(*[np.arange(count)] * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+    matrices = np.tile(np.eye(4), (len(cells), 1, 1))
+    matrices[:, :3, :3] *= .8 / count
+    matrices[:, :3, 3] = (cells - (count - 1) / 2) * 2 / count
+    colors = (cells * 255 / max(count - 1, 1)).astype(np.uint8)
+    return InstancedObject(Vector3(WIDTH/2, HEIGHT/2, 0), objects_info.cube.vertices, objects_info.cube.faces,
+                           matrices, colors, size=400)
+
+def getMeshes() -> list[tuple[str, BaseObject]]:
+    # The cube, every bundled .obj file and spheres of increasing resolution
+    meshes = [("cube", Cube(Vector3(WIDTH/2, HEIGHT/2, 1), 200, faceColors=[RED, GREEN, BLUE, WHITE, YELLOW, ORANGE]))]
+    for filePath in sorted(glob.glob(os.path.join(pathFile, "objects_info", "*.obj"))):
+        meshes.append((os.path.basename(filePath), loadObject(filePath)))
+    for resolution in (25, 50, 100):
+        meshes.append((f"Sphere(resolution={resolution})", Sphere(Vector3(0, 0, 3), radius=150, resolution=resolution)))
+    for count in (5, 10):
+        meshes.append((f"voxels({count}x{count}x{count})", getVoxelGrid(count)))
+    return meshes
+
+def setCamera(rotation: Vector3) -> None:
+    rendering3d.camera.rotation = Vector3(rotation)
+
+def benchmark(obj: BaseObject, renderer: Renderer, frames: int=FRAMES, path: str="yaw") -> dict[str, float]:
+    '''
+    Renders the object for a number of frames along a camera path and returns the average milliseconds per frame
+    of each stage. The camera moves every frame, so nothing is served from the transform cache'''
+
+    orbit = CAMERA_PATHS[path]
+    # Warm up first: meshes, colors and buffers are built on the first frame
+    setCamera(Vector3(0, 0, 0))
+    renderer.render([obj], drawEdges=False, paintFaces=True)
+    renderer.resetTimings()
+    for frame in range(frames):
+        setCamera(orbit * (frame / frames))
+        renderer.surface.fill(WHITE)
+        renderer.render([obj], drawEdges=False, paintFaces=True)
+        renderer.present()
+    setCamera(Vector3(0, 0, 0))
+
+    timings = renderer.getFrameTimings()
+    timings["total"] = sum(timings.values())
+    return timings
+
+def getArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Renders every bundled mesh along orbiting camera paths and reports "
+                                                 "the average milliseconds per frame of each render stage as JSON")
+    parser.add_argument("--frames", type=int, default=FRAMES, help=f"frames per run (default {FRAMES})")
+    parser.add_argument("--backend", action="append", choices=rendering3d.BACKENDS,
+                        help="backend to run, can be repeated (default: all)")
+    parser.add_argument("--path", action="append", choices=list(CAMERA_PATHS),
+                        help="camera path to run, can be repeated (default: all)")
+    parser.add_argument("--mesh", action="append", help="only run meshes whose name contains this, can be repeated")
+    parser.add_argument("--no-lod", action="store_true", help="always draw the full meshes, without levels of detail")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--table", action="store_true", help="print a readable table instead of JSON")
+    return parser.parse_args()
+
+def main():
+    arguments = getArguments()
+    backends = arguments.backend or list(rendering3d.BACKENDS)
+    paths = arguments.path or list(CAMERA_PATHS)
+    rendering3d.levelOfDetail = not arguments.no_lod
+
+    surface = rendering3d.getWindow()
+    results: list[dict] = []
+    for name, obj in getMeshes():
+        if arguments.mesh and not any(part in name for part in arguments.mesh):
+            continue
+        for backend in backends:
+            renderer = Renderer(surface, backend)
+            for path in paths:
+                timings = benchmark(obj, renderer, arguments.frames, path)
+                # Faces of the level of detail that was drawn
+                results.append({"mesh": name, "faces": len(obj.faces), "backend": backend, "path": path, "ms": timings})
+
+    if arguments.table:
+        stages = list(Renderer.STAGES) + ["total"]
+        print(f"{'mesh':<24}{'faces':>7}{'backend':>9}{'path':>8}" + "".join(f"{stage:>11}" for stage in stages))
+        for result in results:
+            print(f"{result['mesh']:<24}{result['faces']:>7}{result['backend']:>9}{result['path']:>8}"
+                  + "".join(f"{result['ms'][stage]:>11.2f}" for stage in stages))
+        return
+
+    report = json.dumps({
+        "frames": arguments.frames,
+        "size": list(surface.get_size()),
+        "results": results,
+    }, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import pygame
+from pygame.math import Vector3
+from math import radians
+import numpy as np
+from matrix import Mat4, compose
+import sys
+sys.dont_write_bytecode = True
+
+# Closest distance from the camera that is drawn. Polygons and edges crossing it are clipped
+NEAR_PLANE = .05
+# Closest and farthest the camera zooms to
+MIN_DISTANCE = 1
+MAX_DISTANCE = 1e10
+
+class Camera:
+    '''
+    Point of view of a render: the rotation of the scene (Euler angles in degrees), the screen offset (x, y, pixels)
+    and distance (z) of the camera, and the projection. With a viewport, the image the camera would make of the whole
+    surface is scaled down into that part of it, so several cameras can share a surface.
+    The view and screen matrices are cached and only rebuilt when the camera changes'''
+
+    def __init__(self, position: Vector3=None, rotation: Vector3=None, orthographic: bool=False,
+                 viewport: pygame.Rect=None, near: float=NEAR_PLANE) -> None:
+        self.position = Vector3(position) if position is not None else Vector3(0, 0, 5)
+        self.rotation = Vector3(rotation) if rotation is not None else Vector3(0, 0, 0)
+        self.orthographic = orthographic
+        self.viewport = pygame.Rect(viewport) if viewport is not None else None
+        self.near = near
+        # Size of the surface being rendered, set by the renderer using the camera
+        self.surfaceSize: tuple[int, int] = None
+        self._viewKey: tuple = None
+        self._viewMatrix: Mat4 = None
+        self._screenKey: tuple = None
+        self._screenMatrix: Mat4 = None
+
+    def getKey(self) -> tuple:
+        # Everything projections depend on. Built from the values, so changing the vectors in place counts too
+        return (
+            self.position.x, self.position.y, self.position.z, self.rotation.x, self.rotation.y, self.rotation.z,
+            self.orthographic, tuple(self.viewport) if self.viewport is not None else None, self.surfaceSize, self.near
+        )
+
+    def translate(self, x: float, y: float, z: float) -> None:
+        self.position += Vector3(x, y, z)
+
+    def rotate(self, angleX: float, angleY: float, angleZ: float) -> None:
+        self.rotation += Vector3(angleX, angleY, angleZ)
+
+    def rotateX(self, angle: float) -> None:
+        self.rotation.x += angle
+
+    def rotateY(self, angle: float) -> None:
+        self.rotation.y += angle
+
+    def rotateZ(self, angle: float) -> None:
+        self.rotation.z += angle
+
+    def zoom(self, diff: float) -> None:
+        self.position.z = min(max(self.position.z - diff, MIN_DISTANCE), MAX_DISTANCE)
+
+    def getViewMatrix(self) -> Mat4:
+        # Rotation of the whole scene around the objects' positions
+        key = (self.rotation.x, self.rotation.y, self.rotation.z)
+        if key != self._viewKey:
+            self._viewMatrix = Mat4.fromEuler(radians(self.rotation.x), radians(self.rotation.y), radians(self.rotation.z))
+            self._viewKey = key
+        return self._viewMatrix
+
+    def getScale(self) -> float:
+        # How much the viewport shrinks the image of the whole surface
+        if self.viewport is None or self.surfaceSize is None:
+            return 1
+        width, height = self.surfaceSize
+        return min(self.viewport.width / width, self.viewport.height / height)
+
+    def getScreenMatrix(self) -> Mat4:
+        # Surface coordinates to viewport coordinates: the surface's center goes to the viewport's
+        key = (tuple(self.viewport) if self.viewport is not None else None, self.surfaceSize)
+        if key != self._screenKey:
+            if self.viewport is None or self.surfaceSize is None:
+                self._screenMatrix = Mat4.getIdentity()
+            else:
+                width, height = self.surfaceSize
+                scale = self.getScale()
+                self._screenMatrix = compose(Mat4.translation(self.viewport.centerx, self.viewport.centery, 0),
+                                             Mat4.scale(scale, scale, 1), Mat4.translation(-width / 2, -height / 2, 0))
+            self._screenKey = key
+        return self._screenMatrix
+
+    def toScreen(self, x: float, y: float) -> tuple[float, float]:
+        if self.viewport is None or self.surfaceSize is None:
+            return x, y
+        width, height = self.surfaceSize
+        scale = self.getScale()
+        return self.viewport.centerx + (x - width / 2) * scale, self.viewport.centery + (y - height / 2) * scale
+
+    def getViewportRect(self, surface: pygame.Surface) -> pygame.Rect:
+        return surface.get_rect() if self.viewport is None else self.viewport.clip(surface.get_rect())
+
+    def getProjectionMatrix(self, pos: Vector3, size: float) -> Mat4:
+        '''
+        View space to screen for an object at pos (pixels) drawn at size. Rows 0 and 1 give the screen position
+        once divided by row 3 (w, the distance from the camera), row 2 keeps the view space depth'''
+
+        if self.orthographic:
+            projection = Mat4.scale(size, size, 1)
+        else:
+            projection = Mat4((
+                size, 0, 0, 0,
+                0, size, 0, 0,
+                0, 0, 1, 0,
+                0, 0, 1, self.position.z,
+            ))
+        offset = Mat4.translation(pos.x + self.position.x, pos.y + self.position.y, 0)
+        return compose(self.getScreenMatrix(), offset, projection)
+
+def interpolateAtNear(a: np.ndarray, b: np.ndarray, near: float) -> np.ndarray:
+    # Points where the segments from a to b (homogeneous corners and attributes along the last axis) cross w = near
+    t = (near - a[..., 3]) / (b[..., 3] - a[..., 3])
+    return a + (b - a) * t[..., None]
+
+def clipPolygon(points: np.ndarray, near: float) -> np.ndarray:
+    # Part of a polygon of (K, 4) homogeneous points (x, y, depth, w) in front of the near plane (Sutherland-Hodgman)
+    inside = points[:, 3] >= near
+    clipped: list[np.ndarray] = []
+    for i in range(len(points)):
+        j = (i + 1) % len(points)
+        if inside[i]:
+            clipped.append(points[i])
+        if inside[i] != inside[j]:
+            clipped.append(interpolateAtNear(points[i], points[j], near))
+    return np.array(clipped).reshape(-1, points.shape[1])
+
+def clipSegments(starts: np.ndarray, ends: np.ndarray, near: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Segments between (E, 4) homogeneous points cut at the near plane, and which of them are in front of it at all
+    startBehind, endBehind = starts[:, 3] < near, ends[:, 3] < near
+    crossing = startBehind != endBehind
+    starts, ends = starts.copy(), ends.copy()
+    crossPoints = interpolateAtNear(starts[crossing], ends[crossing], near)
+    starts[crossing & startBehind] = crossPoints[startBehind[crossing]]
+    ends[crossing & endBehind] = crossPoints[endBehind[crossing]]
+    return starts, ends, ~(startBehind & endBehind)
+
+def clipTriangles(corners: np.ndarray, attributes: np.ndarray, near: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Clips (T, 3, 4) homogeneous triangles to the near plane. A triangle with one corner behind it becomes two, one
+    with two corners behind it gets smaller and one with all three is dropped. attributes (T, 3, A) are interpolated
+    along with the corners, which is perspective correct since it's done before dividing by w.
+    Returns the corners, the attributes and the index of the triangle every new one comes from'''
+
+    data = np.concatenate([corners, attributes], axis=2)
+    behind = corners[..., 3] < near
+    behindCount = behind.sum(axis=1)
+
+    def rotateCorners(triangles: np.ndarray, first: np.ndarray) -> np.ndarray:
+        # Same triangles starting at the given corner, keeping the winding
+        order = (first[:, None] + np.arange(3)) % 3
+        return np.take_along_axis(triangles, order[..., None], axis=1)
+
+    # One corner behind: the quad left in front of the plane, as two triangles
+    one = np.flatnonzero(behindCount == 1)
+    a, b, c = rotateCorners(data[one], np.argmax(behind[one], axis=1)).transpose(1, 0, 2)
+    ab, ac = interpolateAtNear(a, b, near), interpolateAtNear(a, c, near)
+    # Two corners behind: the corner in front and where its edges cross the plane
+    two = np.flatnonzero(behindCount == 2)
+    d, e, f = rotateCorners(data[two], np.argmin(behind[two], axis=1)).transpose(1, 0, 2)
+
+    clipped = np.concatenate([
+        np.stack([ab, b, c], axis=1),
+        np.stack([ab, c, ac], axis=1),
+        np.stack([d, interpolateAtNear(d, e, near), interpolateAtNear(d, f, near)], axis=1),
+    ]).reshape(-1, 3, data.shape[2])
+    sources = np.concatenate([one, one, two])
+    return clipped[..., :4], clipped[..., 4:], sources
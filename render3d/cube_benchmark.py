@@ -0,0 +1,55 @@
+import sys
+sys.dont_write_bytecode = True
+import argparse
+from time import perf_counter
+import numpy as np
+from cube_state import CubeState, applyMovesBatch, getInverseMoves, getMoveTable, getScramble, getSolvedStickers
+
+DIMENSIONS = (2, 3, 4, 5)
+BATCH = 10000
+LENGTH = 25
+
+def getArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measures how many moves per second the sticker model of the cube "
+                                                 "applies, one cube at a time and for a batch of cubes at once")
+    parser.add_argument("--dimensions", type=int, action="append", help=f"cube size, can be repeated (default {DIMENSIONS})")
+    parser.add_argument("--batch", type=int, default=BATCH, help=f"cubes scrambled at once (default {BATCH})")
+    parser.add_argument("--length", type=int, default=LENGTH, help=f"moves per scramble (default {LENGTH})")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+def timeSingle(dimensions: int, moves: np.ndarray) -> float:
+    # Moves per second applied one by one to a single cube
+    state = CubeState(dimensions)
+    start = perf_counter()
+    for move in moves.tolist():
+        state.apply(move)
+    return len(moves) / (perf_counter() - start)
+
+def timeBatch(dimensions: int, scrambles: np.ndarray) -> tuple[float, bool]:
+    # Moves per second scrambling the whole batch, and whether undoing every scramble solves every cube
+    stickers = np.tile(getSolvedStickers(dimensions), (len(scrambles), 1))
+    start = perf_counter()
+    scrambled = applyMovesBatch(dimensions, stickers, scrambles)
+    elapsed = perf_counter() - start
+    solved = applyMovesBatch(dimensions, scrambled, np.array([getInverseMoves(moves) for moves in scrambles]))
+    return scrambles.size / elapsed, bool((solved == stickers).all())
+
+def main():
+    arguments = getArguments()
+    rng = np.random.default_rng(arguments.seed)
+    print(f"{arguments.batch} cubes of {arguments.length} moves per batch")
+    print(f"{'cube':<8}{'stickers':>9}{'moves':>7}{'table ms':>10}{'single M/s':>12}{'batch M/s':>11}{'undone':>8}")
+    for dimensions in arguments.dimensions or DIMENSIONS:
+        start = perf_counter()
+        table = getMoveTable(dimensions)
+        tableTime = (perf_counter() - start) * 1000
+
+        single = timeSingle(dimensions, getScramble(dimensions, 100000, rng))
+        scrambles = np.array([getScramble(dimensions, arguments.length, rng) for _ in range(arguments.batch)])
+        batch, undone = timeBatch(dimensions, scrambles)
+        print(f"{f'{dimensions}x{dimensions}x{dimensions}':<8}{table.shape[1]:>9}{len(table):>7}{tableTime:>10.2f}"
+              f"{single / 1e6:>12.2f}{batch / 1e6:>11.2f}{str(undone):>8}")
+
+if __name__ == "__main__":
+    main()
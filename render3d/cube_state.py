@@ -0,0 +1,185 @@
+import numpy as np
+import sys
+sys.dont_write_bytecode = True
+
+# Outward normal of every face, in the face order of objects_info/cube.py (left, right, front, back, bottom, top)
+FACE_NORMALS = np.array([
+    (-1, 0, 0),
+    (1, 0, 0),
+    (0, 0, 1),
+    (0, 0, -1),
+    (0, -1, 0),
+    (0, 1, 0),
+])
+
+# Right-handed quarter turns around x, y and z, the same as Quaternion.fromAxisAngle(axis, radians(90))
+QUARTER_TURNS = np.array([
+    [(1, 0, 0), (0, 0, -1), (0, 1, 0)],
+    [(0, 0, 1), (0, 1, 0), (-1, 0, 0)],
+    [(0, -1, 0), (1, 0, 0), (0, 0, 1)],
+])
+
+def getStickerLayout(dimensions: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Grid position (x, y, z) of the cubie every sticker is on and the sticker's face, for the 6 * N * N stickers.
+    Stickers are ordered by face, then by the position along the other two axes'''
+
+    grid = np.arange(dimensions)
+    cubies: list[np.ndarray] = []
+    faces: list[np.ndarray] = []
+    for face, normal in enumerate(FACE_NORMALS):
+        axis = int(np.abs(normal).argmax())
+        layer = dimensions - 1 if normal[axis] > 0 else 0
+        a, b = np.meshgrid(grid, grid, indexing="ij")
+        positions = np.zeros((dimensions * dimensions, 3), dtype=np.intp)
+        positions[:, [i for i in range(3) if i != axis]] = np.stack([a.ravel(), b.ravel()], axis=1)
+        positions[:, axis] = layer
+        cubies.append(positions)
+        faces.append(np.full(dimensions * dimensions, face))
+    return np.concatenate(cubies), np.concatenate(faces)
+
+def getStickerIndexes(dimensions: int, cubies: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    # Sticker at each (cubie, outward normal) pair, the inverse of getStickerLayout
+    face = np.argmax((normals[:, None, :] == FACE_NORMALS[None]).all(axis=2), axis=1)
+    axes = np.abs(FACE_NORMALS).argmax(axis=1)
+    # The two axes that aren't the face's own, in increasing order
+    otherAxes = np.array([[i for i in range(3) if i != axis] for axis in range(3)])[axes[face]]
+    a = np.take_along_axis(cubies, otherAxes[:, :1], axis=1)[:, 0]
+    b = np.take_along_axis(cubies, otherAxes[:, 1:], axis=1)[:, 0]
+    return (face * dimensions + a) * dimensions + b
+
+# Move permutations by cube size, built once
+_moveTables: dict[int, np.ndarray] = {}
+
+def getMoveTable(dimensions: int) -> np.ndarray:
+    '''
+    (9 * N, 6 * N * N) sticker permutations of every move, so that stickers[table[move]] is the state after it.
+    Move (axis * N + index) * 3 + turns - 1 turns the slice at grid index along axis (0, 1, 2 for x, y, z)
+    by turns (1 to 3) quarter turns, right-handed'''
+
+    if dimensions in _moveTables:
+        return _moveTables[dimensions]
+
+    cubies, faces = getStickerLayout(dimensions)
+    normals = FACE_NORMALS[faces]
+    # Positions doubled and centered, so rotating them stays in integers
+    centered = 2 * cubies - (dimensions - 1)
+    stickerIds = np.arange(len(faces))
+
+    table = np.empty((9 * dimensions, len(faces)), dtype=np.intp)
+    for axis in range(3):
+        rotation = QUARTER_TURNS[axis]
+        for index in range(dimensions):
+            moving = cubies[:, axis] == index
+            rotatedCubies = (centered[moving] @ rotation.T + (dimensions - 1)) // 2
+            rotatedIds = getStickerIndexes(dimensions, rotatedCubies, normals[moving] @ rotation.T)
+            # Every spot of the slice gets the sticker that turns onto it
+            quarterTurn = stickerIds.copy()
+            quarterTurn[rotatedIds] = stickerIds[moving]
+            permutation = stickerIds
+            for turns in range(1, 4):
+                permutation = permutation[quarterTurn]
+                table[(axis * dimensions + index) * 3 + turns - 1] = permutation
+    _moveTables[dimensions] = table
+    return table
+
+def getMove(dimensions: int, axis: int, index: int, turns: int=1) -> int:
+    # Negative turns go the other way, e.g. -1 is the same as 3
+    return (axis * dimensions + index) * 3 + turns % 4 - 1
+
+def getInverseMove(move: int) -> int:
+    # Same slice, 4 - turns quarter turns
+    return move - move % 3 + 2 - move % 3
+
+def getInverseMoves(moves: np.ndarray) -> np.ndarray:
+    moves = np.asarray(moves)
+    return (moves - moves % 3 + 2 - moves % 3)[::-1]
+
+def getSolvedStickers(dimensions: int) -> np.ndarray:
+    # Every sticker has the color of the face it's on
+    return getStickerLayout(dimensions)[1].astype(np.uint8)
+
+def getScramble(dimensions: int, length: int, rng: np.random.Generator=None) -> np.ndarray:
+    # Random moves, never turning the same slice twice in a row
+    rng = rng or np.random.default_rng()
+    slices = np.empty(length, dtype=np.intp)
+    sliceCount = 3 * dimensions
+    previous = -1
+    for i in range(length):
+        # Drawn from the other slices when there is a previous one
+        choice = int(rng.integers(sliceCount if previous < 0 else sliceCount - 1))
+        slices[i] = choice + (previous >= 0 and choice >= previous)
+        previous = slices[i]
+    return slices * 3 + rng.integers(3, size=length)
+
+def composeMoves(dimensions: int, moves: np.ndarray) -> np.ndarray:
+    # A single permutation doing all the moves in order
+    table = getMoveTable(dimensions)
+    permutation = np.arange(table.shape[1])
+    for move in np.asarray(moves).tolist():
+        permutation = permutation[table[move]]
+    return permutation
+
+def applyMovesBatch(dimensions: int, stickers: np.ndarray, moves: np.ndarray) -> np.ndarray:
+    '''
+    Applies moves to many cubes at once: stickers are (B, S) states and moves (B, L), a sequence per cube.
+    Every step groups the cubes by the move they make and permutes each group with a single gather, which is
+    cheaper than gathering a (B, S) index array per step'''
+
+    table = getMoveTable(dimensions)
+    moves = np.asarray(moves).reshape(len(stickers), -1)
+    stickers = stickers.copy()
+    for step in range(moves.shape[1]):
+        order = np.argsort(moves[:, step], kind="stable")
+        bounds = np.searchsorted(moves[order, step], np.arange(len(table) + 1))
+        for move in np.flatnonzero(np.diff(bounds)).tolist():
+            cubes = order[bounds[move]:bounds[move + 1]]
+            stickers[cubes] = stickers[cubes][:, table[move]]
+    return stickers
+
+class CubeState:
+    '''
+    Logical state of an NxN Rubik's cube: one byte per sticker with its color (the index of the face it belongs to
+    when solved). Moves are precomputed sticker permutations (see getMoveTable), so turns are exact and never drift'''
+
+    def __init__(self, dimensions: int=3) -> None:
+        self.dimensions = dimensions
+        self.table = getMoveTable(dimensions)
+        self.stickers = getSolvedStickers(dimensions)
+
+    def copy(self) -> "CubeState":
+        state = CubeState.__new__(CubeState)
+        state.dimensions, state.table, state.stickers = self.dimensions, self.table, self.stickers.copy()
+        return state
+
+    def reset(self) -> None:
+        self.stickers = getSolvedStickers(self.dimensions)
+
+    def isSolved(self) -> bool:
+        # Every face a single color (the cube may be turned as a whole)
+        faces = self.stickers.reshape(6, -1)
+        return bool((faces == faces[:, :1]).all())
+
+    def apply(self, move: int) -> None:
+        self.stickers = self.stickers[self.table[move]]
+
+    def applyMoves(self, moves: np.ndarray) -> None:
+        self.stickers = self.stickers[composeMoves(self.dimensions, moves)]
+
+    def turn(self, axis: int, index: int, turns: int=1) -> None:
+        if turns % 4:
+            self.apply(getMove(self.dimensions, axis, index, turns))
+
+    def getFaceColors(self, cubies: np.ndarray) -> np.ndarray:
+        '''
+        Color index of the 6 faces (in FACE_NORMALS order) of the cubies at the given (C, 3) grid positions,
+        -1 for faces inside the cube'''
+
+        cubies = np.asarray(cubies, dtype=np.intp).reshape(-1, 3)
+        colors = np.full((len(cubies), 6), -1, dtype=np.intp)
+        for face, normal in enumerate(FACE_NORMALS):
+            axis = int(np.abs(normal).argmax())
+            outside = cubies[:, axis] == (self.dimensions - 1 if normal[axis] > 0 else 0)
+            ids = getStickerIndexes(self.dimensions, cubies[outside], np.tile(normal, (int(outside.sum()), 1)))
+            colors[outside, face] = self.stickers[ids]
+        return colors
@@ -0,0 +1,45 @@
+from pygame.math import Vector3
+import numpy as np
+import sys
+sys.dont_write_bytecode = True
+
+# "none" keeps the face colors as they are, "flat" lights each face by its normal and "gouraud" lights the vertices
+# and blends between them (the painter backend fills polygons with one color, so it uses the average of the face)
+SHADING_MODES = ("none", "flat", "gouraud")
+# Shades of each color in a palette, from ambient light only to fully lit
+SHADE_LEVELS = 32
+
+class DirectionalLight:
+    '''
+    Light coming from far away along a direction in view space (x right, y down, z away from the camera),
+    plus an ambient term so faces turned away from it aren't black'''
+
+    def __init__(self, direction: Vector3=None, color: tuple=(255, 255, 255), ambient: float=.25) -> None:
+        self.direction = Vector3(direction if direction is not None else (1, 1, 1)).normalize()
+        self.color = tuple(color)[:3]
+        self.ambient = ambient
+
+    def getKey(self) -> tuple:
+        return tuple(self.direction), self.color, self.ambient
+
+    def getShadeFactors(self) -> np.ndarray:
+        # (SHADE_LEVELS, 3) multipliers of a color for every shade
+        intensity = self.ambient + (1 - self.ambient) * np.linspace(0, 1, SHADE_LEVELS)
+        return intensity[:, None] * (np.array(self.color) / 255)
+
+def getShadeLevels(normals: np.ndarray, toLight: np.ndarray) -> np.ndarray:
+    # Lambert term of unit normals in [0, SHADE_LEVELS - 1], as floats so they can still be interpolated
+    return np.clip(normals @ toLight, 0, 1) * (SHADE_LEVELS - 1)
+
+def buildPalette(colors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Splits (F, 3) colors into the distinct colors and the index of each one among them,
+    so shading only has to be worked out per distinct color'''
+
+    colors, colorIds = np.unique(np.asarray(colors, dtype=np.uint8).reshape(-1, 3), axis=0, return_inverse=True)
+    return colors, colorIds.reshape(-1)
+
+def shadeColors(colors: np.ndarray, light: DirectionalLight) -> np.ndarray:
+    # (C, SHADE_LEVELS, 3) shaded versions of (C, 3) colors
+    shaded = colors[:, None, :].astype(np.float64) * light.getShadeFactors()[None]
+    return np.clip(shaded.round(), 0, 255).astype(np.uint8)
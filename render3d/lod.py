@@ -0,0 +1,108 @@
+from pygame.math import Vector3
+from math import ceil, pi, sqrt
+import numpy as np
+from mesh import loadMesh
+import sys
+sys.dont_write_bytecode = True
+
+# Levels are picked so every face covers about this many pixels on screen
+PIXELS_PER_FACE = 24
+# Relative band around each switching size where the current level is kept, so objects don't flicker between levels
+HYSTERESIS = .15
+
+def getUniqueEdges(triangles: np.ndarray) -> np.ndarray:
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    return np.unique(np.sort(edges, axis=1), axis=0)
+
+def collapseEdges(vertices: np.ndarray, triangles: np.ndarray, sources: np.ndarray,
+                  targetTriangles: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Edge-collapse simplification: repeatedly merges the two ends of the shortest edges into their midpoint,
+    many independent edges (no shared vertex) per pass, until at most targetTriangles are left.
+    sources maps each triangle to the face it came from and follows the surviving triangles'''
+
+    vertices = vertices.copy()
+    while len(triangles) > targetTriangles:
+        edges = getUniqueEdges(triangles)
+        lengths = ((vertices[edges[:, 0]] - vertices[edges[:, 1]]) ** 2).sum(axis=1)
+        # Each collapse removes the (usually two) triangles around the edge
+        needed = ceil((len(triangles) - targetTriangles) / 2)
+
+        used = np.zeros(len(vertices), dtype=bool)
+        remap = np.arange(len(vertices))
+        collapsed = 0
+        for a, b in edges[np.argsort(lengths, kind="stable")].tolist():
+            if used[a] or used[b]:
+                continue
+            used[a] = used[b] = True
+            vertices[a] = (vertices[a] + vertices[b]) / 2
+            remap[b] = a
+            collapsed += 1
+            if collapsed >= needed:
+                break
+        if collapsed == 0:
+            break
+
+        triangles = remap[triangles]
+        keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 2] != triangles[:, 0])
+        triangles, sources = triangles[keep], sources[keep]
+        # Collapses can fold two triangles onto the same vertices
+        _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+        first.sort()
+        triangles, sources = triangles[first], sources[first]
+
+    # Drop the vertices no triangle uses anymore
+    usedVertices, triangles = np.unique(triangles, return_inverse=True)
+    return vertices[usedVertices], triangles.reshape(-1, 3), sources
+
+def simplifyMesh(points: list[Vector3], faces: list[list[int]], ratio: float) -> tuple[list[Vector3], list[list[int]], list[int]]:
+    # Triangulated copy of the mesh with about ratio times its triangles, and the original face of each triangle
+    mesh = loadMesh(points, faces)
+    target = max(4, int(len(mesh.triangles) * ratio))
+    vertices, triangles, sources = collapseEdges(mesh.vertices, mesh.triangles.astype(np.intp),
+                                                 mesh.triangleFaces.astype(np.intp), target)
+    return [Vector3(x, y, z) for x, y, z in vertices.tolist()], triangles.tolist(), sources.tolist()
+
+class LevelOfDetail:
+    '''
+    Versions of a mesh from the most detailed to the coarsest, as (points, faces, faceSources) where faceSources maps
+    each face to the face of the first level it came from (None when the faces are the first level's own).
+    select() picks a level from the object's projected radius'''
+
+    def __init__(self, levels: list[tuple[list[Vector3], list[list[int]], list[int]]], thresholds: list[float]=None) -> None:
+        self.levels = levels
+        # Smallest screen radius (pixels) each level is used at; by default where its faces get about PIXELS_PER_FACE
+        # pixels each (only about half of the faces face the camera)
+        if thresholds is None:
+            thresholds = [sqrt(PIXELS_PER_FACE * len(faces) / 2 / pi) for _, faces, _ in levels]
+            thresholds[-1] = 0
+        self.thresholds = thresholds
+        self.current = 0
+
+    def select(self, screenRadius: float) -> int:
+        level = self.current
+        # Finer levels once the object is clearly big enough for them
+        while level > 0 and screenRadius >= self.thresholds[level - 1] * (1 + HYSTERESIS):
+            level -= 1
+        # Coarser levels once it's clearly too small for this one
+        while level < len(self.levels) - 1 and screenRadius < self.thresholds[level] * (1 - HYSTERESIS):
+            level += 1
+        self.current = level
+        return level
+
+    def getLevel(self, level: int=None) -> tuple[list[Vector3], list[list[int]], list[int]]:
+        return self.levels[self.current if level is None else level]
+
+    @staticmethod
+    def fromMesh(points: list[Vector3], faces: list[list[int]], levels: int=4, ratio: float=.5) -> "LevelOfDetail":
+        # The mesh itself, then levels-1 simplified versions each with about ratio times the triangles of the last
+        result = [(points, faces, None)]
+        triangles = len(loadMesh(points, faces).triangles)
+        for level in range(1, levels):
+            simplified = simplifyMesh(points, faces, ratio ** level)
+            # Stop once the mesh can't get any simpler
+            if len(simplified[1]) >= triangles:
+                break
+            result.append(simplified)
+            triangles = len(simplified[1])
+        return LevelOfDetail(result)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 from pygame.math import Vector2, Vector3
+from math import cos, sin
+import numpy as np
 import sys
 sys.dont_write_bytecode = True
 
@@ -129,6 +131,286 @@ class Matrix:
             [v.z]
         ])
 
+def _checkDeterminant(determinant: float) -> float:
+    if determinant == 0:
+        raise ValueError("Matrix is singular and has no inverse")
+    return 1 / determinant
+
+class Mat3:
+    '''
+    Fixed size 3x3 matrix stored as a flat row-major tuple, with unrolled operations.
+    Faster than Matrix for the small transforms done per object every frame'''
+
+    __slots__ = ("m",)
+
+    def __init__(self, values=None) -> None:
+        # 9 values, row-major. Nested rows and NumPy arrays are accepted too
+        if values is None:
+            self.m: tuple = (1., 0., 0., 0., 1., 0., 0., 0., 1.)
+        else:
+            values = tuple(values)
+            if len(values) != 9:
+                values = np.asarray(values, dtype=np.float64).reshape(9)
+            self.m: tuple = tuple(map(float, values))
+
+    @staticmethod
+    def _fromTuple(values: tuple) -> Mat3:
+        # Skips the conversions of __init__ for values that are already floats
+        matrix = Mat3.__new__(Mat3)
+        matrix.m = values
+        return matrix
+
+    def __getitem__(self, idx: tuple[int, int]) -> float:
+        row, col = idx
+        return self.m[row * 3 + col]
+
+    def __mul__(self, other) -> Mat3:
+        if isinstance(other, Mat3):
+            a00, a01, a02, a10, a11, a12, a20, a21, a22 = self.m
+            b00, b01, b02, b10, b11, b12, b20, b21, b22 = other.m
+            return Mat3._fromTuple((
+                a00*b00 + a01*b10 + a02*b20, a00*b01 + a01*b11 + a02*b21, a00*b02 + a01*b12 + a02*b22,
+                a10*b00 + a11*b10 + a12*b20, a10*b01 + a11*b11 + a12*b21, a10*b02 + a11*b12 + a12*b22,
+                a20*b00 + a21*b10 + a22*b20, a20*b01 + a21*b11 + a22*b21, a20*b02 + a21*b12 + a22*b22,
+            ))
+        elif isinstance(other, Vector3):
+            return self.transformVector(other)
+        elif type(other) in (int, float):
+            return Mat3._fromTuple(tuple(x * other for x in self.m))
+        return NotImplemented
+
+    __matmul__ = __mul__
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Mat3) and self.m == other.m
+
+    def __repr__(self) -> str:
+        return "\n".join(f"[{' '.join(str(x) for x in self.m[row*3:row*3+3])}]" for row in range(3))
+
+    def transformVector(self, v: Vector3) -> Vector3:
+        a00, a01, a02, a10, a11, a12, a20, a21, a22 = self.m
+        x, y, z = v
+        return Vector3(a00*x + a01*y + a02*z, a10*x + a11*y + a12*z, a20*x + a21*y + a22*z)
+
+    def transformPoints(self, points: np.ndarray) -> np.ndarray:
+        # (N, 3) points in, (N, 3) transformed points out, in one NumPy call
+        return np.asarray(points, dtype=np.float64) @ self.toArray().T
+
+    def transpose(self) -> Mat3:
+        a00, a01, a02, a10, a11, a12, a20, a21, a22 = self.m
+        return Mat3._fromTuple((a00, a10, a20, a01, a11, a21, a02, a12, a22))
+
+    def determinant(self) -> float:
+        a00, a01, a02, a10, a11, a12, a20, a21, a22 = self.m
+        return a00 * (a11*a22 - a12*a21) - a01 * (a10*a22 - a12*a20) + a02 * (a10*a21 - a11*a20)
+
+    def getInverse(self) -> Mat3:
+        a00, a01, a02, a10, a11, a12, a20, a21, a22 = self.m
+        # Cofactors of the first row, reused by the determinant
+        c00 = a11*a22 - a12*a21
+        c01 = a12*a20 - a10*a22
+        c02 = a10*a21 - a11*a20
+        inverse = _checkDeterminant(a00*c00 + a01*c01 + a02*c02)
+        return Mat3._fromTuple((
+            c00 * inverse, (a02*a21 - a01*a22) * inverse, (a01*a12 - a02*a11) * inverse,
+            c01 * inverse, (a00*a22 - a02*a20) * inverse, (a02*a10 - a00*a12) * inverse,
+            c02 * inverse, (a01*a20 - a00*a21) * inverse, (a00*a11 - a01*a10) * inverse,
+        ))
+
+    def toArray(self) -> np.ndarray:
+        return np.array(self.m).reshape(3, 3)
+
+    def toMatrix(self) -> Matrix:
+        return Matrix([list(self.m[row*3:row*3+3]) for row in range(3)])
+
+    @staticmethod
+    def getIdentity() -> Mat3:
+        return Mat3()
+
+    @staticmethod
+    def scale(x: float, y: float=None, z: float=None) -> Mat3:
+        y = x if y is None else y
+        z = x if z is None else z
+        return Mat3._fromTuple((float(x), 0., 0., 0., float(y), 0., 0., 0., float(z)))
+
+    # Rotations in radians, with the same conventions as rendering3d
+    @staticmethod
+    def rotationX(angle: float) -> Mat3:
+        c, s = cos(angle), sin(angle)
+        return Mat3._fromTuple((1., 0., 0., 0., c, -s, 0., s, c))
+
+    @staticmethod
+    def rotationY(angle: float) -> Mat3:
+        c, s = cos(angle), sin(angle)
+        return Mat3._fromTuple((c, 0., -s, 0., 1., 0., s, 0., c))
+
+    @staticmethod
+    def rotationZ(angle: float) -> Mat3:
+        c, s = cos(angle), sin(angle)
+        return Mat3._fromTuple((c, -s, 0., s, c, 0., 0., 0., 1.))
+
+    @staticmethod
+    def fromEuler(x: float, y: float, z: float) -> Mat3:
+        # Rotate by X, then Y, then Z
+        return Mat3.rotationZ(z) * Mat3.rotationY(y) * Mat3.rotationX(x)
+
+class Mat4:
+    '''
+    Fixed size 4x4 matrix stored as a flat row-major tuple, with unrolled operations.
+    Points are column vectors, so (a * b) applies b first'''
+
+    __slots__ = ("m",)
+
+    def __init__(self, values=None) -> None:
+        # 16 values, row-major. Nested rows and NumPy arrays are accepted too
+        if values is None:
+            self.m: tuple = (1., 0., 0., 0., 0., 1., 0., 0., 0., 0., 1., 0., 0., 0., 0., 1.)
+        else:
+            values = tuple(values)
+            if len(values) != 16:
+                values = np.asarray(values, dtype=np.float64).reshape(16)
+            self.m: tuple = tuple(map(float, values))
+
+    @staticmethod
+    def _fromTuple(values: tuple) -> Mat4:
+        matrix = Mat4.__new__(Mat4)
+        matrix.m = values
+        return matrix
+
+    def __getitem__(self, idx: tuple[int, int]) -> float:
+        row, col = idx
+        return self.m[row * 4 + col]
+
+    def __mul__(self, other) -> Mat4:
+        if isinstance(other, Mat4):
+            a00, a01, a02, a03, a10, a11, a12, a13, a20, a21, a22, a23, a30, a31, a32, a33 = self.m
+            b00, b01, b02, b03, b10, b11, b12, b13, b20, b21, b22, b23, b30, b31, b32, b33 = other.m
+            return Mat4._fromTuple((
+                a00*b00 + a01*b10 + a02*b20 + a03*b30, a00*b01 + a01*b11 + a02*b21 + a03*b31,
+                a00*b02 + a01*b12 + a02*b22 + a03*b32, a00*b03 + a01*b13 + a02*b23 + a03*b33,
+                a10*b00 + a11*b10 + a12*b20 + a13*b30, a10*b01 + a11*b11 + a12*b21 + a13*b31,
+                a10*b02 + a11*b12 + a12*b22 + a13*b32, a10*b03 + a11*b13 + a12*b23 + a13*b33,
+                a20*b00 + a21*b10 + a22*b20 + a23*b30, a20*b01 + a21*b11 + a22*b21 + a23*b31,
+                a20*b02 + a21*b12 + a22*b22 + a23*b32, a20*b03 + a21*b13 + a22*b23 + a23*b33,
+                a30*b00 + a31*b10 + a32*b20 + a33*b30, a30*b01 + a31*b11 + a32*b21 + a33*b31,
+                a30*b02 + a31*b12 + a32*b22 + a33*b32, a30*b03 + a31*b13 + a32*b23 + a33*b33,
+            ))
+        elif isinstance(other, Vector3):
+            return self.transformVector(other)
+        elif type(other) in (int, float):
+            return Mat4._fromTuple(tuple(x * other for x in self.m))
+        return NotImplemented
+
+    __matmul__ = __mul__
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Mat4) and self.m == other.m
+
+    def __repr__(self) -> str:
+        return "\n".join(f"[{' '.join(str(x) for x in self.m[row*4:row*4+4])}]" for row in range(4))
+
+    def transformVector(self, v: Vector3) -> Vector3:
+        # Point with w = 1, divided back by the resulting w
+        a00, a01, a02, a03, a10, a11, a12, a13, a20, a21, a22, a23, a30, a31, a32, a33 = self.m
+        x, y, z = v
+        w = a30*x + a31*y + a32*z + a33
+        w = 1 / w if w else 1
+        return Vector3((a00*x + a01*y + a02*z + a03) * w, (a10*x + a11*y + a12*z + a13) * w, (a20*x + a21*y + a22*z + a23) * w)
+
+    def transformPoints(self, points: np.ndarray) -> np.ndarray:
+        # (N, 3) points with an implicit w = 1 in, (N, 4) homogeneous points out (not divided by w)
+        matrix = self.toArray()
+        return np.asarray(points, dtype=np.float64) @ matrix[:, :3].T + matrix[:, 3]
+
+    def transpose(self) -> Mat4:
+        m = self.m
+        return Mat4._fromTuple((m[0], m[4], m[8], m[12], m[1], m[5], m[9], m[13],
+                                m[2], m[6], m[10], m[14], m[3], m[7], m[11], m[15]))
+
+    def _getMinors(self) -> tuple:
+        # 2x2 determinants of the top two rows (s) and of the bottom two rows (c)
+        a00, a01, a02, a03, a10, a11, a12, a13, a20, a21, a22, a23, a30, a31, a32, a33 = self.m
+        return (
+            a00*a11 - a01*a10, a00*a12 - a02*a10, a00*a13 - a03*a10,
+            a01*a12 - a02*a11, a01*a13 - a03*a11, a02*a13 - a03*a12,
+            a20*a31 - a21*a30, a20*a32 - a22*a30, a20*a33 - a23*a30,
+            a21*a32 - a22*a31, a21*a33 - a23*a31, a22*a33 - a23*a32,
+        )
+
+    def determinant(self) -> float:
+        s0, s1, s2, s3, s4, s5, c0, c1, c2, c3, c4, c5 = self._getMinors()
+        return s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0
+
+    def getInverse(self) -> Mat4:
+        a00, a01, a02, a03, a10, a11, a12, a13, a20, a21, a22, a23, a30, a31, a32, a33 = self.m
+        s0, s1, s2, s3, s4, s5, c0, c1, c2, c3, c4, c5 = self._getMinors()
+        i = _checkDeterminant(s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0)
+        return Mat4._fromTuple((
+            ( a11*c5 - a12*c4 + a13*c3) * i, (-a01*c5 + a02*c4 - a03*c3) * i,
+            ( a31*s5 - a32*s4 + a33*s3) * i, (-a21*s5 + a22*s4 - a23*s3) * i,
+            (-a10*c5 + a12*c2 - a13*c1) * i, ( a00*c5 - a02*c2 + a03*c1) * i,
+            (-a30*s5 + a32*s2 - a33*s1) * i, ( a20*s5 - a22*s2 + a23*s1) * i,
+            ( a10*c4 - a11*c2 + a13*c0) * i, (-a00*c4 + a01*c2 - a03*c0) * i,
+            ( a30*s4 - a31*s2 + a33*s0) * i, (-a20*s4 + a21*s2 - a23*s0) * i,
+            (-a10*c3 + a11*c1 - a12*c0) * i, ( a00*c3 - a01*c1 + a02*c0) * i,
+            (-a30*s3 + a31*s1 - a32*s0) * i, ( a20*s3 - a21*s1 + a22*s0) * i,
+        ))
+
+    def getRotation(self) -> Mat3:
+        # Upper left 3x3 block
+        m = self.m
+        return Mat3._fromTuple((m[0], m[1], m[2], m[4], m[5], m[6], m[8], m[9], m[10]))
+
+    def getTranslation(self) -> Vector3:
+        return Vector3(self.m[3], self.m[7], self.m[11])
+
+    def toArray(self) -> np.ndarray:
+        return np.array(self.m).reshape(4, 4)
+
+    def toMatrix(self) -> Matrix:
+        return Matrix([list(self.m[row*4:row*4+4]) for row in range(4)])
+
+    @staticmethod
+    def getIdentity() -> Mat4:
+        return Mat4()
+
+    @staticmethod
+    def fromMat3(rotation: Mat3, translation: Vector3=None) -> Mat4:
+        a00, a01, a02, a10, a11, a12, a20, a21, a22 = rotation.m
+        x, y, z = translation if translation is not None else (0., 0., 0.)
+        return Mat4._fromTuple((a00, a01, a02, float(x), a10, a11, a12, float(y), a20, a21, a22, float(z), 0., 0., 0., 1.))
+
+    @staticmethod
+    def translation(x: float, y: float, z: float) -> Mat4:
+        return Mat4._fromTuple((1., 0., 0., float(x), 0., 1., 0., float(y), 0., 0., 1., float(z), 0., 0., 0., 1.))
+
+    @staticmethod
+    def scale(x: float, y: float=None, z: float=None) -> Mat4:
+        return Mat4.fromMat3(Mat3.scale(x, y, z))
+
+    @staticmethod
+    def rotationX(angle: float) -> Mat4:
+        return Mat4.fromMat3(Mat3.rotationX(angle))
+
+    @staticmethod
+    def rotationY(angle: float) -> Mat4:
+        return Mat4.fromMat3(Mat3.rotationY(angle))
+
+    @staticmethod
+    def rotationZ(angle: float) -> Mat4:
+        return Mat4.fromMat3(Mat3.rotationZ(angle))
+
+    @staticmethod
+    def fromEuler(x: float, y: float, z: float) -> Mat4:
+        return Mat4.fromMat3(Mat3.fromEuler(x, y, z))
+
+def compose(*matrices):
+    # Product of the matrices, applied right to left: compose(T, R, S) scales, then rotates, then translates
+    result = matrices[0]
+    for matrix in matrices[1:]:
+        result = result * matrix
+    return result
+
 if __name__ == "__main__":
     # Null matrix
     c = 3
@@ -0,0 +1,64 @@
+import sys
+sys.dont_write_bytecode = True
+from timeit import Timer
+from math import cos, radians, sin
+import numpy as np
+from pygame.math import Vector3
+from matrix import Matrix, Mat3, Mat4
+
+# Points transformed in the batch cases, about the size of the monkey mesh
+POINTS = 500
+
+def measure(function) -> float:
+    # Best time per call in microseconds
+    timer = Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(3, number)) / number * 1e6
+
+def getCases() -> list[tuple[str, object, object]]:
+    '''
+    Each case is (name, Matrix version, Mat3/Mat4 version). Matrix only inverts 2x2 matrices,
+    so the inverses are compared against NumPy instead'''
+
+    rng = np.random.default_rng(0)
+    values3 = rng.normal(size=(3, 3))
+    values4 = rng.normal(size=(4, 4))
+    points = rng.normal(size=(POINTS, 3))
+
+    matrix3, other3 = Matrix(values3.tolist()), Matrix(rng.normal(size=(3, 3)).tolist())
+    matrix4, other4 = Matrix(values4.tolist()), Matrix(rng.normal(size=(4, 4)).tolist())
+    mat3, otherMat3 = Mat3(values3), Mat3(other3.matrix)
+    mat4, otherMat4 = Mat4(values4), Mat4(other4.matrix)
+
+    vector = Vector3(1, 2, 3)
+    column3 = Matrix.fromVector3(vector)
+    pointColumns = [Matrix([[x], [y], [z]]) for x, y, z in points.tolist()]
+    homogeneousColumns = [Matrix([[x], [y], [z], [1]]) for x, y, z in points.tolist()]
+
+    def rotationMatrix() -> Matrix:
+        # Composing a rotation with Matrix
+        x, y, z = radians(10), radians(20), radians(30)
+        rotationX = Matrix([[1, 0, 0], [0, cos(x), -sin(x)], [0, sin(x), cos(x)]])
+        rotationY = Matrix([[cos(y), 0, -sin(y)], [0, 1, 0], [sin(y), 0, cos(y)]])
+        rotationZ = Matrix([[cos(z), -sin(z), 0], [sin(z), cos(z), 0], [0, 0, 1]])
+        return rotationZ * rotationY * rotationX
+
+    return [
+        ("3x3 * 3x3", lambda: matrix3 * other3, lambda: mat3 * otherMat3),
+        ("4x4 * 4x4", lambda: matrix4 * other4, lambda: mat4 * otherMat4),
+        ("3x3 * vector", lambda: (matrix3 * column3).toVector3(), lambda: mat3.transformVector(vector)),
+        ("rotation from euler", rotationMatrix, lambda: Mat3.fromEuler(radians(10), radians(20), radians(30))),
+        (f"3x3 * {POINTS} points", lambda: [matrix3 * p for p in pointColumns], lambda: mat3.transformPoints(points)),
+        (f"4x4 * {POINTS} points", lambda: [matrix4 * p for p in homogeneousColumns], lambda: mat4.transformPoints(points)),
+        ("3x3 inverse (NumPy)", lambda: np.linalg.inv(values3), lambda: mat3.getInverse()),
+        ("4x4 inverse (NumPy)", lambda: np.linalg.inv(values4), lambda: mat4.getInverse()),
+    ]
+
+def main():
+    print(f"{'case':<24}{'Matrix us':>12}{'Mat us':>12}{'speedup':>10}")
+    for name, old, new in getCases():
+        oldTime, newTime = measure(old), measure(new)
+        print(f"{name:<24}{oldTime:>12.2f}{newTime:>12.2f}{oldTime / newTime:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
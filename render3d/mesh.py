@@ -0,0 +1,253 @@
+import numpy as np
+from pygame.math import Vector3
+import sys
+sys.dont_write_bytecode = True
+
+def getPolygonArea(points: np.ndarray) -> float:
+    # Signed area of a 2D polygon (shoelace formula)
+    x, y = points[:, 0], points[:, 1]
+    return .5 * float((x * np.roll(y, -1) - np.roll(x, -1) * y).sum())
+
+def isInsideTriangle(point: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> bool:
+    def cross(o, p, q):
+        return (p[0] - o[0]) * (q[1] - o[1]) - (p[1] - o[1]) * (q[0] - o[0])
+    d1, d2, d3 = cross(a, b, point), cross(b, c, point), cross(c, a, point)
+    return (d1 >= 0 and d2 >= 0 and d3 >= 0) or (d1 <= 0 and d2 <= 0 and d3 <= 0)
+
+def triangulatePolygon(points: np.ndarray) -> list[tuple[int, int, int]]:
+    '''
+    Ear clipping of a simple 2D polygon. Returns triangles as corner indexes, wound like the polygon'''
+
+    corners = list(range(len(points)))
+    if len(corners) < 3:
+        return []
+    if len(corners) == 3:
+        return [(0, 1, 2)]
+
+    # Convexity is tested against the polygon's own winding
+    orientation = 1 if getPolygonArea(points) >= 0 else -1
+    triangles: list[tuple[int, int, int]] = []
+    guard = 0
+    while len(corners) > 3 and guard < len(corners):
+        for i in range(len(corners)):
+            previous, current, following = corners[i-1], corners[i], corners[(i+1) % len(corners)]
+            a, b, c = points[previous], points[current], points[following]
+            convex = orientation * ((b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])) > 0
+            if not convex:
+                continue
+            if any(isInsideTriangle(points[other], a, b, c) for other in corners if other not in (previous, current, following)):
+                continue
+
+            triangles.append((previous, current, following))
+            corners.pop(i)
+            guard = 0
+            break
+        else:
+            # No ear found (degenerate polygon): fan what's left
+            guard = len(corners)
+
+    triangles.extend((corners[0], corners[i], corners[i+1]) for i in range(1, len(corners) - 1))
+    return triangles
+
+def normalizeRows(vectors: np.ndarray) -> np.ndarray:
+    # Unit length rows; zero rows stay zero
+    lengths = np.sqrt((vectors ** 2).sum(axis=1, keepdims=True))
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+
+def computeFaceNormals(vertices: np.ndarray, faceOffsets: np.ndarray, faceIndices: np.ndarray) -> np.ndarray:
+    # Newell's method, so n-gons work too. Empty faces get a zero normal
+    lengths = np.diff(faceOffsets)
+    normals = np.zeros((len(lengths), 3))
+    if len(faceIndices) == 0:
+        return normals
+    starts = faceOffsets[:-1]
+
+    # Index of the following corner of each face, wrapping around at the end of the face
+    following = np.arange(1, len(faceIndices) + 1)
+    nonEmpty = lengths > 0
+    following[(starts + lengths - 1)[nonEmpty]] = starts[nonEmpty]
+
+    p = vertices[faceIndices]
+    q = vertices[faceIndices[following]]
+    terms = np.stack([
+        (p[:, 1] - q[:, 1]) * (p[:, 2] + q[:, 2]),
+        (p[:, 2] - q[:, 2]) * (p[:, 0] + q[:, 0]),
+        (p[:, 0] - q[:, 0]) * (p[:, 1] + q[:, 1]),
+    ], axis=1)
+    normals[nonEmpty] = np.add.reduceat(terms, starts[nonEmpty], axis=0)
+    return normals
+
+class Mesh:
+    '''
+    Indexed mesh built once from a vertex list and polygon faces:
+    flattened faces (faceIndices[faceOffsets[i]:faceOffsets[i+1]]), n-gons triangulated into an int32 index buffer
+    and the unique edges of all faces, so wireframes draw each edge once'''
+
+    def __init__(self, vertices: np.ndarray, faces: list[list[int]]) -> None:
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.boundingRadius = float(np.sqrt((self.vertices ** 2).sum(axis=1).max())) if len(self.vertices) else 0
+
+        # Some faces repeat their first index to close the loop
+        cleanFaces = [indexes[:-1] if len(indexes) > 1 and indexes[-1] == indexes[0] else indexes for indexes in faces]
+        lengths = np.array([len(indexes) for indexes in cleanFaces], dtype=np.int32)
+        self.faceOffsets = np.zeros(len(cleanFaces) + 1, dtype=np.int32)
+        self.faceOffsets[1:] = np.cumsum(lengths)
+        self.faceIndices = np.array([i for indexes in cleanFaces for i in indexes], dtype=np.int32)
+        self.faceNormals = computeFaceNormals(self.vertices, self.faceOffsets, self.faceIndices)
+
+        # Unit normals for lighting. Newell normals are as long as twice the face area, so summing them around
+        # a vertex weights each face by its area
+        self.faceUnitNormals = normalizeRows(self.faceNormals)
+        vertexNormals = np.zeros_like(self.vertices)
+        np.add.at(vertexNormals, self.faceIndices, np.repeat(self.faceNormals, lengths, axis=0))
+        self.vertexNormals = normalizeRows(vertexNormals)
+
+        # Non-empty faces, and the corners averaged for their depth key (first and third)
+        self.faceIds = np.flatnonzero(lengths > 0)
+        self.depthIndexes = (
+            self.faceIndices[self.faceOffsets[self.faceIds]].astype(np.intp),
+            self.faceIndices[self.faceOffsets[self.faceIds] + np.minimum(2, lengths[self.faceIds] - 1)].astype(np.intp),
+        )
+
+        self.triangulate(cleanFaces)
+        self.buildEdges(cleanFaces)
+
+    def triangulate(self, faces: list[list[int]]) -> None:
+        triangleCorners: list[tuple[int, int, int]] = []
+        triangleFaces: list[int] = []
+        starts: list[int] = []
+        for faceId, indexes in enumerate(faces):
+            starts.append(len(triangleCorners))
+            if len(indexes) == 3:
+                corners = [(0, 1, 2)]
+            else:
+                # Ear clip in the plane of the face: drop the axis the normal points the most along
+                axis = int(np.abs(self.faceNormals[faceId]).argmax())
+                points = self.vertices[indexes][:, [i for i in range(3) if i != axis]]
+                corners = triangulatePolygon(points)
+            triangleCorners.extend(corners)
+            triangleFaces.extend([faceId] * len(corners))
+        starts.append(len(triangleCorners))
+
+        self.triangleCorners = np.array(triangleCorners, dtype=np.int32).reshape(-1, 3)
+        self.triangleFaces = np.array(triangleFaces, dtype=np.int32)
+        self.faceTriangleStarts = np.array(starts, dtype=np.int32)
+        self.triangles = self.faceIndices[self.faceOffsets[self.triangleFaces][:, None] + self.triangleCorners]
+
+    def buildEdges(self, faces: list[list[int]]) -> None:
+        # Every face side as a (min, max) vertex pair, then deduplicated
+        pairs: list[tuple[int, int]] = []
+        pairFaces: list[int] = []
+        for faceId, indexes in enumerate(faces):
+            sides = len(indexes) if len(indexes) > 2 else len(indexes) - 1
+            for i in range(max(sides, 0)):
+                a, b = indexes[i], indexes[(i+1) % len(indexes)]
+                pairs.append((min(a, b), max(a, b)))
+                pairFaces.append(faceId)
+
+        pairs = np.array(pairs, dtype=np.int32).reshape(-1, 2)
+        self.edges, self.pairEdges = np.unique(pairs, axis=0, return_inverse=True)
+        self.edges = self.edges.astype(np.int32)
+        self.pairEdges = self.pairEdges.reshape(-1).astype(np.intp)
+        self.pairFaces = np.array(pairFaces, dtype=np.intp)
+
+    def getFaceCount(self) -> int:
+        return len(self.faceOffsets) - 1
+
+    def getFace(self, faceId: int) -> np.ndarray:
+        return self.faceIndices[self.faceOffsets[faceId]:self.faceOffsets[faceId + 1]]
+
+    def getEdgeOwners(self, orderedFaceIds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        For faces drawn in the given order, returns the edges to draw with each face: every edge is drawn once,
+        with the last drawn face it belongs to. Returns the edge ids sorted by draw order and, for each face in the
+        order, where its edges start in that array (len(orderedFaceIds) + 1 offsets)'''
+
+        rank = np.full(self.getFaceCount(), -1, dtype=np.intp)
+        rank[orderedFaceIds] = np.arange(len(orderedFaceIds))
+        edgeRank = np.full(len(self.edges), -1, dtype=np.intp)
+        np.maximum.at(edgeRank, self.pairEdges, rank[self.pairFaces])
+
+        edgeIds = np.flatnonzero(edgeRank >= 0)
+        edgeIds = edgeIds[np.argsort(edgeRank[edgeIds], kind="stable")]
+        starts = np.searchsorted(edgeRank[edgeIds], np.arange(len(orderedFaceIds) + 1))
+        return edgeIds, starts
+
+    def transformCopies(self, matrices: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Vertices, face normals, unit face normals and vertex normals of a copy per (4, 4) matrix, concatenated
+        linear = matrices[:, :3, :3]
+        vertices = (np.einsum("ijk,vk->ivj", linear, self.vertices) + matrices[:, None, :3, 3]).reshape(-1, 3)
+        # Newell normals are as long as twice the face area, which grows with the square of the scale
+        scales = np.cbrt(np.linalg.det(linear))[:, None, None]
+        faceNormals = np.einsum("ijk,fk->ifj", linear * scales, self.faceNormals).reshape(-1, 3)
+        vertexNormals = normalizeRows(np.einsum("ijk,vk->ivj", linear, self.vertexNormals).reshape(-1, 3))
+        return vertices, faceNormals, normalizeRows(faceNormals), vertexNormals
+
+    def moveInstances(self, instanced: "Mesh", indexes: np.ndarray, matrices: np.ndarray) -> None:
+        '''
+        Updates, in place, copies of this mesh in a mesh made by instance(): copy indexes[i] gets matrices[i].
+        Only the moved copies are transformed'''
+
+        indexes = np.asarray(indexes, dtype=np.intp)
+        vertices, faceNormals, faceUnitNormals, vertexNormals = self.transformCopies(matrices.reshape(-1, 4, 4))
+        vertexRows = (indexes[:, None] * len(self.vertices) + np.arange(len(self.vertices))).ravel()
+        faceRows = (indexes[:, None] * self.getFaceCount() + np.arange(self.getFaceCount())).ravel()
+        instanced.vertices[vertexRows] = vertices
+        instanced.vertexNormals[vertexRows] = vertexNormals
+        instanced.faceNormals[faceRows] = faceNormals
+        instanced.faceUnitNormals[faceRows] = faceUnitNormals
+        instanced.boundingRadius = float(np.sqrt((instanced.vertices ** 2).sum(axis=1).max())) if len(instanced.vertices) else 0
+
+    def instance(self, matrices: np.ndarray) -> "Mesh":
+        '''
+        One mesh made of a copy of this one per (4, 4) matrix, copy i taking vertices [i*V, (i+1)*V) and faces
+        [i*F, (i+1)*F). The topology is tiled instead of rebuilt and vertices and normals are transformed in one batch,
+        so it's cheap to redo whenever the matrices change. Matrices are expected to scale uniformly'''
+
+        matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+        count = len(matrices)
+
+        def tile(indexes: np.ndarray, shift: int) -> np.ndarray:
+            # Copy i of the indexes, shifted by i * shift
+            shifts = (np.arange(count) * shift).astype(indexes.dtype).reshape(-1, *[1] * indexes.ndim)
+            return (indexes[None] + shifts).reshape(-1, *indexes.shape[1:])
+
+        instanced = Mesh.__new__(Mesh)
+        instanced.vertices, instanced.faceNormals, instanced.faceUnitNormals, instanced.vertexNormals = \
+            self.transformCopies(matrices)
+        instanced.boundingRadius = float(np.sqrt((instanced.vertices ** 2).sum(axis=1).max())) if len(instanced.vertices) else 0
+
+        vertexCount, faceCount, triangleCount = len(self.vertices), self.getFaceCount(), len(self.triangles)
+        instanced.faceOffsets = np.append(tile(self.faceOffsets[:-1], self.faceOffsets[-1]),
+                                          np.int32(count * self.faceOffsets[-1]))
+        instanced.faceIndices = tile(self.faceIndices, vertexCount)
+        instanced.faceIds = tile(self.faceIds, faceCount)
+        instanced.depthIndexes = tuple(tile(indexes, vertexCount) for indexes in self.depthIndexes)
+
+        instanced.triangleCorners = np.tile(self.triangleCorners, (count, 1))
+        instanced.triangleFaces = tile(self.triangleFaces, faceCount)
+        instanced.faceTriangleStarts = np.append(tile(self.faceTriangleStarts[:-1], triangleCount),
+                                                 np.int32(count * triangleCount))
+        instanced.triangles = tile(self.triangles, vertexCount)
+
+        # Copies don't share vertices, so they don't share edges either
+        instanced.edges = tile(self.edges, vertexCount)
+        instanced.pairEdges = tile(self.pairEdges, len(self.edges))
+        instanced.pairFaces = tile(self.pairFaces, faceCount)
+        return instanced
+
+# Meshes shared by every object using the same vertex and face lists.
+# The lists are kept in the entries so their ids can't be reused while cached
+MESH_CACHE_SIZE = 256
+_meshCache: dict[tuple, tuple[list, list, Mesh]] = {}
+
+def loadMesh(points: list[Vector3], faces: list[list[int]]) -> Mesh:
+    key = (id(points), len(points), id(faces), len(faces))
+    cached = _meshCache.get(key)
+    if cached is None:
+        if len(_meshCache) >= MESH_CACHE_SIZE:
+            _meshCache.pop(next(iter(_meshCache)))
+        vertices = np.array([(p.x, p.y, p.z) for p in points], dtype=np.float64).reshape(-1, 3)
+        cached = (points, faces, Mesh(vertices, faces))
+        _meshCache[key] = cached
+    return cached[2]
@@ -15,10 +15,10 @@ vertices: list[Vector3] = [
 ]
 
 faces: list[int] = [
-    [0, 3, 7, 4, 0],
+    [0, 4, 7, 3, 0],
     [1, 2, 6, 5, 1],
     [4, 5, 6, 7, 4],
-    [0, 1, 2, 3, 0],
+    [0, 3, 2, 1, 0],
     [4, 0, 1, 5, 4],
-    [7, 3, 2, 6, 7]
+    [7, 6, 2, 3, 7]
 ]
\ No newline at end of file
@@ -1,38 +1,233 @@
 from pygame.math import Vector3
+import numpy as np
+import hashlib
+import json
+import os
+import struct
 
-def readObj(filePath: str) -> tuple[list[Vector3], list[list[int]]]:
+# Binary cache written next to the .obj file
+CACHE_EXTENSION = ".cache"
+CACHE_MAGIC = b"OBJCACHE"
+CACHE_VERSION = 1
+# Arrays are aligned in the cache so they can be memory-mapped directly
+CACHE_ALIGNMENT = 16
+# Approximate amount of bytes parsed per chunk while streaming the file
+CHUNK_BYTES = 1 << 21
+
+class ObjMesh:
     '''
-    Receives file path, reads file content and returns list of vertices and list of face indexes'''
+    Mesh data of an .obj file in typed arrays.
+    Faces are stored flattened: the indexes of face i are faceVertices[faceOffsets[i]:faceOffsets[i+1]],
+    with faceUVs/faceNormals parallel to faceVertices (-1 where the face doesn't reference one).
+    triangles/triangleUVs/triangleNormals are the same faces fanned into triangles, triangleFaces maps them back'''
+
+    ARRAYS = ("vertices", "uvs", "normals", "faceOffsets", "faceVertices", "faceUVs", "faceNormals",
+              "triangles", "triangleUVs", "triangleNormals", "triangleFaces")
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self.vertices: np.ndarray = arrays["vertices"]
+        self.uvs: np.ndarray = arrays["uvs"]
+        self.normals: np.ndarray = arrays["normals"]
+        self.faceOffsets: np.ndarray = arrays["faceOffsets"]
+        self.faceVertices: np.ndarray = arrays["faceVertices"]
+        self.faceUVs: np.ndarray = arrays["faceUVs"]
+        self.faceNormals: np.ndarray = arrays["faceNormals"]
+        self.triangles: np.ndarray = arrays["triangles"]
+        self.triangleUVs: np.ndarray = arrays["triangleUVs"]
+        self.triangleNormals: np.ndarray = arrays["triangleNormals"]
+        self.triangleFaces: np.ndarray = arrays["triangleFaces"]
+
+    def getArrays(self) -> dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def getFaceCount(self) -> int:
+        return len(self.faceOffsets) - 1
+
+    def getFaces(self) -> list[list[int]]:
+        # Face index lists, in the format BaseObject uses
+        return [indexes.tolist() for indexes in np.split(self.faceVertices, self.faceOffsets[1:-1])]
+
+    def getVertices(self) -> list[Vector3]:
+        return [Vector3(x, y, z) for x, y, z in self.vertices.tolist()]
+
+def parseIndexes(tokens: list[str], counts: list[int]) -> np.ndarray:
+    # (n, 3) zero based v/vt/vn indexes of face tokens, -1 where missing. Relative (negative) indexes are
+    # resolved with counts, the amount of v/vt/vn defined before each token's face
+    parts = [(token.split("/") + ["", ""])[:3] for token in tokens]
+    indexes = np.array([[int(part) if part else 0 for part in token] for token in parts], dtype=np.int64).reshape(-1, 3)
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, 3)
+    return np.where(indexes > 0, indexes - 1, np.where(indexes < 0, counts + indexes, -1))
+
+def fanTriangles(faceOffsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Positions (into the flattened face arrays) of the triangle corners of every face, fanned from its first corner
+    lengths = np.diff(faceOffsets)
+    triangleCounts = np.maximum(lengths - 2, 0)
+    triangleFaces = np.repeat(np.arange(len(lengths)), triangleCounts)
+    # Index of each triangle inside its face
+    local = np.arange(len(triangleFaces)) - np.repeat(np.cumsum(triangleCounts) - triangleCounts, triangleCounts)
+    first = faceOffsets[:-1][triangleFaces]
+    corners = np.stack([first, first + local + 1, first + local + 2], axis=1)
+    return corners, triangleFaces
+
+def parseObj(filePath: str) -> ObjMesh:
+    '''
+    Streams the .obj file in chunks of lines, collecting the text of each kind of element and converting
+    it to arrays in bulk'''
+
+    vertexChunks: list[np.ndarray] = []
+    uvChunks: list[np.ndarray] = []
+    normalChunks: list[np.ndarray] = []
+    indexChunks: list[np.ndarray] = []
+    faceLengths: list[int] = []
+    counts = [0, 0, 0]
+
+    with open(filePath, "r") as f:
+        while True:
+            lines = f.readlines(CHUNK_BYTES)
+            if not lines:
+                break
 
-    vertices: list[Vector3] = []
-    faces: list[list[int]] = []
+            vertexText: list[str] = []
+            uvText: list[str] = []
+            normalText: list[str] = []
+            faceTokens: list[str] = []
+            tokenCounts: list[tuple[int, int, int]] = []
+            for line in lines:
+                if line.startswith("v "):
+                    # Drop optional w / vertex colors
+                    vertexText.extend(line.split()[1:4])
+                    counts[0] += 1
+                elif line.startswith("vt "):
+                    uvText.extend((line.split()[1:3] + ["0"])[:2])
+                    counts[1] += 1
+                elif line.startswith("vn "):
+                    normalText.extend(line.split()[1:4])
+                    counts[2] += 1
+                elif line.startswith("f "):
+                    tokens = line.split()[1:]
+                    faceTokens.extend(tokens)
+                    tokenCounts.extend([tuple(counts)] * len(tokens))
+                    faceLengths.append(len(tokens))
 
-    # Read file
-    with open(filePath, 'r') as f:
-        content: list[str] = f.readlines()
+            if vertexText:
+                vertexChunks.append(np.array(vertexText, dtype=np.float32).reshape(-1, 3))
+            if uvText:
+                uvChunks.append(np.array(uvText, dtype=np.float32).reshape(-1, 2))
+            if normalText:
+                normalChunks.append(np.array(normalText, dtype=np.float32).reshape(-1, 3))
+            if faceTokens:
+                indexChunks.append(parseIndexes(faceTokens, tokenCounts))
 
-    # Read all lines
-    for line in content:
-        line = line.replace('\n', '')
+    def concatenate(chunks: list[np.ndarray], shape: tuple, dtype) -> np.ndarray:
+        return np.concatenate(chunks).astype(dtype) if chunks else np.zeros(shape, dtype=dtype)
 
-        # Check for initials
-        split = line.split(" ")
-        if split[0] == 'v':
-            vertices.append(Vector3(float(split[1]), float(split[2]), float(split[3])))
-        elif split[0] == 'f':
-            indexes = []
+    indexes = concatenate(indexChunks, (0, 3), np.int32)
+    faceOffsets = np.zeros(len(faceLengths) + 1, dtype=np.int32)
+    faceOffsets[1:] = np.cumsum(faceLengths)
+    corners, triangleFaces = fanTriangles(faceOffsets)
 
-            for info in split[1:]:
-                idx = info.split("/")[0]
-                indexes.append(int(idx) - 1)
+    return ObjMesh({
+        "vertices": concatenate(vertexChunks, (0, 3), np.float32),
+        "uvs": concatenate(uvChunks, (0, 2), np.float32),
+        "normals": concatenate(normalChunks, (0, 3), np.float32),
+        "faceOffsets": faceOffsets,
+        "faceVertices": np.ascontiguousarray(indexes[:, 0]),
+        "faceUVs": np.ascontiguousarray(indexes[:, 1]),
+        "faceNormals": np.ascontiguousarray(indexes[:, 2]),
+        "triangles": indexes[corners, 0].reshape(-1, 3),
+        "triangleUVs": indexes[corners, 1].reshape(-1, 3),
+        "triangleNormals": indexes[corners, 2].reshape(-1, 3),
+        "triangleFaces": triangleFaces.astype(np.int32),
+    })
 
-            faces.append(indexes)
+def getFileHash(filePath: str) -> str:
+    digest = hashlib.sha1()
+    with open(filePath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-            # i0 = split[1].split('/')[0]
-            # i1 = split[2].split('/')[0]
-            # i2 = split[3].split('/')[0]
+def readCacheHeader(cachePath: str) -> tuple[dict, int]:
+    with open(cachePath, "rb") as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError(f"{cachePath} is not an obj cache")
+        headerLength, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(headerLength).decode("utf-8"))
+    return header, len(CACHE_MAGIC) + 4 + headerLength
 
-            # faces.append((int(i0) - 1, int(i1) - 1, int(i2) - 1))
+def writeCache(cachePath: str, mesh: ObjMesh, source: dict) -> None:
+    # Header first, then every array aligned to CACHE_ALIGNMENT. Written to a temporary file and renamed,
+    # so a reader never sees a partial cache
+    arrays = mesh.getArrays()
+    layout: dict[str, list] = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset += array.nbytes
+
+    header = dict(source, version=CACHE_VERSION, arrays=layout)
+    headerBytes = json.dumps(header).encode("utf-8")
+    # Pad the header so data starts aligned
+    dataStart = len(CACHE_MAGIC) + 4 + len(headerBytes)
+    headerBytes += b" " * (-dataStart % CACHE_ALIGNMENT)
+    dataStart = len(CACHE_MAGIC) + 4 + len(headerBytes)
+
+    temporaryPath = f"{cachePath}.{os.getpid()}.tmp"
+    with open(temporaryPath, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(struct.pack("<I", len(headerBytes)))
+        f.write(headerBytes)
+        for name, array in arrays.items():
+            f.seek(dataStart + layout[name][2])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temporaryPath, cachePath)
+
+def loadCache(cachePath: str, header: dict, dataStart: int) -> ObjMesh:
+    arrays: dict[str, np.ndarray] = {}
+    for name, (dtype, shape, offset) in header["arrays"].items():
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(cachePath, dtype=dtype, mode="r", offset=dataStart + offset, shape=tuple(shape))
+    return ObjMesh(arrays)
+
+def loadObj(filePath: str, useCache: bool=True) -> ObjMesh:
+    '''
+    Loads an .obj file into an ObjMesh. The parsed arrays are cached next to the file and later loads
+    memory-map the cache instead of parsing, as long as the file's mtime and size (or content hash) match'''
+
+    if not useCache:
+        return parseObj(filePath)
+
+    cachePath = filePath + CACHE_EXTENSION
+    stat = os.stat(filePath)
+    source = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+    try:
+        header, dataStart = readCacheHeader(cachePath)
+        if header.get("version") == CACHE_VERSION and header.get("size") == stat.st_size:
+            # A different mtime with the same content (e.g. after a checkout) still counts as a hit
+            if header.get("mtime") == stat.st_mtime_ns or header.get("sha1") == getFileHash(filePath):
+                return loadCache(cachePath, header, dataStart)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    mesh = parseObj(filePath)
+    try:
+        writeCache(cachePath, mesh, dict(source, sha1=getFileHash(filePath)))
+    except OSError:
+        # Read-only location: just don't cache
+        pass
+    return mesh
+
+def readObj(filePath: str) -> tuple[list[Vector3], list[list[int]]]:
+    '''
+    Receives file path, reads file content and returns list of vertices and list of face indexes'''
+
+    mesh = loadObj(filePath)
+    vertices: list[Vector3] = mesh.getVertices()
+    faces: list[list[int]] = mesh.getFaces()
 
     print(f"Vertices: {len(vertices)}")
     print(f"Faces: {len(faces)}")
@@ -44,5 +239,5 @@ if __name__ == "__main__":
 
     file = 'ico_sphere.obj'
     filePath = os.path.join(__file__, f'../{file}')
-    
-    readObj(filePath)
\ No newline at end of file
+
+    readObj(filePath)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+from pygame.math import Vector3
+from math import acos, cos, sin, sqrt
+from matrix import Mat3
+import sys
+sys.dont_write_bytecode = True
+
+class Quaternion:
+    '''
+    Unit quaternion orientation (w + xi + yj + zk). Angles are in radians and rotations are right-handed;
+    (a * b) rotates by b first, then by a'''
+
+    __slots__ = ("w", "x", "y", "z")
+
+    def __init__(self, w: float=1, x: float=0, y: float=0, z: float=0) -> None:
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __mul__(self, other: Quaternion) -> Quaternion:
+        w1, x1, y1, z1 = self.w, self.x, self.y, self.z
+        w2, x2, y2, z2 = other.w, other.x, other.y, other.z
+        return Quaternion(
+            w1*w2 - x1*x2 - y1*y2 - z1*z2,
+            w1*x2 + x1*w2 + y1*z2 - z1*y2,
+            w1*y2 - x1*z2 + y1*w2 + z1*x2,
+            w1*z2 + x1*y2 - y1*x2 + z1*w2,
+        )
+
+    def __repr__(self) -> str:
+        return f"Quaternion({self.w}, {self.x}, {self.y}, {self.z})"
+
+    def getLength(self) -> float:
+        return sqrt(self.w*self.w + self.x*self.x + self.y*self.y + self.z*self.z)
+
+    def normalize(self) -> Quaternion:
+        # Products of many rotations slowly drift away from unit length
+        length = self.getLength()
+        return Quaternion(self.w / length, self.x / length, self.y / length, self.z / length)
+
+    def conjugate(self) -> Quaternion:
+        # Inverse rotation, for unit quaternions
+        return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+    def dot(self, other: Quaternion) -> float:
+        return self.w*other.w + self.x*other.x + self.y*other.y + self.z*other.z
+
+    def rotate(self, v: Vector3) -> Vector3:
+        # v' = v + 2w(q x v) + 2q x (q x v), without building the matrix
+        x, y, z = v
+        tx = 2 * (self.y*z - self.z*y)
+        ty = 2 * (self.z*x - self.x*z)
+        tz = 2 * (self.x*y - self.y*x)
+        return Vector3(
+            x + self.w*tx + self.y*tz - self.z*ty,
+            y + self.w*ty + self.z*tx - self.x*tz,
+            z + self.w*tz + self.x*ty - self.y*tx,
+        )
+
+    def toMat3(self) -> Mat3:
+        w, x, y, z = self.w, self.x, self.y, self.z
+        xx, yy, zz = x*x, y*y, z*z
+        xy, xz, yz = x*y, x*z, y*z
+        wx, wy, wz = w*x, w*y, w*z
+        return Mat3._fromTuple((
+            1 - 2*(yy + zz), 2*(xy - wz), 2*(xz + wy),
+            2*(xy + wz), 1 - 2*(xx + zz), 2*(yz - wx),
+            2*(xz - wy), 2*(yz + wx), 1 - 2*(xx + yy),
+        ))
+
+    def slerp(self, other: Quaternion, t: float) -> Quaternion:
+        # Constant speed interpolation along the shortest arc
+        d = self.dot(other)
+        if d < 0:
+            other = Quaternion(-other.w, -other.x, -other.y, -other.z)
+            d = -d
+        if d > .9995:
+            # Nearly parallel: a normalized lerp is accurate enough and avoids dividing by sin(~0)
+            return Quaternion(
+                self.w + (other.w - self.w) * t, self.x + (other.x - self.x) * t,
+                self.y + (other.y - self.y) * t, self.z + (other.z - self.z) * t,
+            ).normalize()
+        theta = acos(d)
+        a = sin((1 - t) * theta) / sin(theta)
+        b = sin(t * theta) / sin(theta)
+        return Quaternion(a*self.w + b*other.w, a*self.x + b*other.x, a*self.y + b*other.y, a*self.z + b*other.z)
+
+    @staticmethod
+    def fromAxisAngle(axis: Vector3, angle: float) -> Quaternion:
+        axis = Vector3(axis).normalize()
+        s = sin(angle / 2)
+        return Quaternion(cos(angle / 2), axis.x * s, axis.y * s, axis.z * s)
+
+    @staticmethod
+    def fromEuler(x: float, y: float, z: float) -> Quaternion:
+        # Same orientation as Mat3.fromEuler (whose Y rotation turns the other way)
+        return (Quaternion.fromAxisAngle(Vector3(0, 0, 1), z) * Quaternion.fromAxisAngle(Vector3(0, 1, 0), -y)
+                * Quaternion.fromAxisAngle(Vector3(1, 0, 0), x))
@@ -0,0 +1,489 @@
+import numpy as np
+import pygame
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import weakref
+import sys
+sys.dont_write_bytecode = True
+
+# Triangles are grouped by the size of their bounding box, and each group is evaluated as a batch of square tiles
+TILE_SIZES = (2, 4, 8, 16, 32, 64)
+# Upper bound for the amount of pixels evaluated at once, to keep memory in check
+BATCH_PIXELS = 1 << 21
+# Pools TiledZBuffer can rasterize its tiles in: threads share the buffers directly (NumPy releases the GIL in its
+# array loops), processes share them through shared memory
+EXECUTORS = ("thread", "process")
+
+class PixelFormat:
+    def __init__(self, surface: pygame.Surface=None) -> None:
+        # Format of a regular 32 bit surface when no surface is given
+        self.shifts = (16, 8, 0)
+        self.losses = (0, 0, 0)
+        self.alphaMask = 0
+        if surface:
+            self.shifts = surface.get_shifts()[:3]
+            self.losses = surface.get_losses()[:3]
+            self.alphaMask = surface.get_masks()[3]
+
+    def getKey(self) -> tuple:
+        return self.shifts, self.losses, self.alphaMask
+
+    def mapColors(self, colors: np.ndarray) -> np.ndarray:
+        # Vectorized Surface.map_rgb: (..., 3) RGB values to mapped pixels
+        colors = np.asarray(colors, dtype=np.uint32)
+        mapped = np.full(colors.shape[:-1], self.alphaMask, dtype=np.uint32)
+        for channel in range(3):
+            mapped |= (colors[..., channel] >> self.losses[channel]) << self.shifts[channel]
+        return mapped
+
+def getClip(surface: pygame.Surface) -> tuple[int, int, int, int]:
+    # The surface's clip rect as (left, top, right, bottom), right and bottom excluded
+    clip = surface.get_clip()
+    return clip.left, clip.top, clip.right, clip.bottom
+
+class ZBuffer:
+    '''
+    Color and depth buffers in pygame.surfarray layout (x first).
+    Colors are stored as mapped pixels of the target surface, so loading and blitting are plain 2D copies.
+    Depth stores a "closeness" key: bigger is closer. Only pixels inside clip are drawn, loaded and blitted'''
+
+    def __init__(self, size: tuple[int, int], color: np.ndarray=None, depth: np.ndarray=None) -> None:
+        # Buffers can be given, e.g. views of shared memory
+        self.width, self.height = size
+        self.color = np.zeros((self.width, self.height), dtype=np.uint32) if color is None else color
+        self.depth = np.full((self.width, self.height), -np.inf) if depth is None else depth
+        self.format = PixelFormat()
+        self.clip = (0, 0, self.width, self.height)
+
+    def getSize(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def mapColors(self, colors: np.ndarray) -> np.ndarray:
+        return self.format.mapColors(colors)
+
+    def clear(self, color: tuple=(0, 0, 0)) -> None:
+        self.color.fill(self.mapColors(color[:3]))
+        self.clearDepth()
+
+    def clearDepth(self) -> None:
+        self.depth.fill(-np.inf)
+
+    def getClipRegion(self) -> tuple[slice, slice]:
+        left, top, right, bottom = self.clip
+        return slice(left, right), slice(top, bottom)
+
+    def load(self, surface: pygame.Surface) -> None:
+        # Start from what is already on the surface, so the buffer can be drawn over a background
+        self.format = PixelFormat(surface)
+        self.clip = getClip(surface)
+        region = self.getClipRegion()
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+            self.color[region] = pixels[region]
+            del pixels
+        except ValueError:
+            # 24 bit surfaces can't be referenced directly
+            self.color[region] = pygame.surfarray.array2d(surface)[region]
+        self.clearDepth()
+
+    def blit(self, surface: pygame.Surface) -> None:
+        region = self.getClipRegion()
+        if self.clip == (0, 0, self.width, self.height):
+            pygame.surfarray.blit_array(surface, self.color)
+            return
+        # blit_array ignores the clip, so only the clipped region is copied
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+            pixels[region] = self.color[region]
+            del pixels
+        except ValueError:
+            pixels = pygame.surfarray.array2d(surface)
+            pixels[region] = self.color[region]
+            pygame.surfarray.blit_array(surface, pixels)
+
+# Shared memory blocks attached by this (worker) process, by name
+_attachedBuffers: dict[str, tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+def getSharedArray(name: str, shape: tuple[int, ...], dtype: type) -> np.ndarray:
+    if name not in _attachedBuffers:
+        # Workers share the creating process' resource tracker, which unregisters the block when it's unlinked there
+        memory = shared_memory.SharedMemory(name=name)
+        _attachedBuffers[name] = memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    return _attachedBuffers[name][1]
+
+def rasterizeTile(buffers: tuple, size: tuple[int, int], pixelFormat: PixelFormat, clip: tuple[int, int, int, int],
+                  commands: list[tuple[str, tuple, tuple]]) -> None:
+    '''
+    Runs recorded draw calls into the tile of the buffers inside clip. buffers are the color and depth arrays, or the
+    names of the shared memory blocks holding them when running in another process'''
+
+    color, depth = buffers
+    if isinstance(color, str):
+        color = getSharedArray(color, size, np.uint32)
+        depth = getSharedArray(depth, size, np.float64)
+    target = ZBuffer(size, color, depth)
+    target.format = pixelFormat
+    target.clip = clip
+    for name, triangleArgs, sharedArgs in commands:
+        globals()[name](target, *triangleArgs, *sharedArgs)
+
+class TiledZBuffer(ZBuffer):
+    '''
+    ZBuffer rasterized in parallel: the clip rect is split into vertical strips (contiguous in the x-first layout).
+    Draw calls are recorded instead of run, and flush() bins their triangles by strip and rasterizes every strip in a
+    thread or process pool, each worker clipped to its strip. With processes the color and depth buffers live in
+    shared memory, so workers write straight into them and the frame is still blitted once'''
+
+    def __init__(self, size: tuple[int, int], tiles: int, executor: str="thread", workers: int=None) -> None:
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor \"{executor}\", expected one of {', '.join(EXECUTORS)}")
+        width, height = size
+        self.tiles = tiles
+        self.executor = executor
+        self._memories: list[shared_memory.SharedMemory] = []
+        color = depth = None
+        if executor == "process":
+            color = self.createSharedArray((width, height), np.uint32)
+            depth = self.createSharedArray((width, height), np.float64)
+            depth.fill(-np.inf)
+        super().__init__(size, color, depth)
+
+        self.pool: Executor = (ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor)(workers or tiles)
+        # Recorded draw calls as (function name, per-triangle arrays, other arguments)
+        self.commands: list[tuple[str, tuple, tuple]] = []
+        self._finalizer = weakref.finalize(self, TiledZBuffer.release, self.pool, self._memories)
+
+    def createSharedArray(self, shape: tuple[int, ...], dtype: type) -> np.ndarray:
+        memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self._memories.append(memory)
+        return np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    @staticmethod
+    def release(pool: Executor, memories: list[shared_memory.SharedMemory]) -> None:
+        pool.shutdown()
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    def close(self) -> None:
+        # Stops the workers and frees the shared memory; the buffer can't be used afterwards
+        self.color = self.depth = None
+        self._finalizer()
+
+    def record(self, name: str, triangleArgs: tuple, sharedArgs: tuple=()) -> None:
+        self.commands.append((name, tuple(np.asarray(values) for values in triangleArgs), sharedArgs))
+
+    def getTileClips(self) -> list[tuple[int, int, int, int]]:
+        left, top, right, bottom = self.clip
+        edges = np.linspace(left, right, self.tiles + 1).round().astype(int).tolist()
+        return [(edges[i], top, edges[i+1], bottom) for i in range(self.tiles) if edges[i] < edges[i+1]]
+
+    def flush(self) -> None:
+        # Rasterize the recorded draw calls, each tile getting only the triangles whose bounding box reaches it
+        clips = self.getTileClips()
+        tileCommands: list[list[tuple[str, tuple, tuple]]] = [[] for _ in clips]
+        for name, triangleArgs, sharedArgs in self.commands:
+            points = triangleArgs[0]
+            with np.errstate(invalid="ignore"):
+                minX, maxX = points[:, :, 0].min(axis=1), points[:, :, 0].max(axis=1)
+            for commands, (left, _, right, _) in zip(tileCommands, clips):
+                ids = np.flatnonzero((maxX >= left - 1) & (minX <= right))
+                if len(ids):
+                    commands.append((name, tuple(values[ids] for values in triangleArgs), sharedArgs))
+        self.commands = []
+
+        tasks = [(clip, commands) for clip, commands in zip(clips, tileCommands) if commands]
+        if not tasks:
+            return
+        if self.executor == "process":
+            buffers = tuple(memory.name for memory in self._memories)
+        else:
+            buffers = self.color, self.depth
+        results = [self.pool.submit(rasterizeTile, buffers, self.getSize(), self.format, clip, commands)
+                   for clip, commands in tasks]
+        for result in results:
+            # Raises the worker's exception, if any
+            result.result()
+
+    def load(self, surface: pygame.Surface) -> None:
+        self.commands = []
+        super().load(surface)
+
+    def blit(self, surface: pygame.Surface) -> None:
+        self.flush()
+        super().blit(surface)
+
+class SurfacePixels:
+    '''
+    Writes straight into the pixels of a surface, without a depth buffer: for drawing in painter's order.
+    The surface stays locked (no blits onto it) until the context exits; pygame.draw still works on it.
+    Like pygame.draw, only pixels inside the surface's clip rect are written'''
+
+    def __init__(self, surface: pygame.Surface) -> None:
+        self.surface = surface
+        self.width, self.height = surface.get_size()
+        self.format = PixelFormat(surface)
+        self.clip = getClip(surface)
+        self.color: np.ndarray = None
+        self.depth: np.ndarray = None
+
+    def mapColors(self, colors: np.ndarray) -> np.ndarray:
+        return self.format.mapColors(colors)
+
+    def __enter__(self) -> "SurfacePixels":
+        self.color = pygame.surfarray.pixels2d(self.surface)
+        return self
+
+    def __exit__(self, *args) -> None:
+        # Dropping the reference unlocks the surface
+        self.color = None
+
+class Texture:
+    '''
+    Texture with its mip levels, prepared once at load time'''
+
+    def __init__(self, surface: pygame.Surface) -> None:
+        level = pygame.surfarray.array3d(surface)
+        self.levels: list[np.ndarray] = [level]
+
+        # Halve the size with a 2x2 box filter until one of the sides reaches one pixel
+        while level.shape[0] > 1 and level.shape[1] > 1:
+            width, height = level.shape[0] // 2 * 2, level.shape[1] // 2 * 2
+            level = level[:width, :height].astype(np.uint16)
+            level = ((level[0::2, 0::2] + level[1::2, 0::2] + level[0::2, 1::2] + level[1::2, 1::2] + 2) // 4).astype(np.uint8)
+            self.levels.append(level)
+
+        self._mappedLevels: dict[tuple, list[np.ndarray]] = {}
+
+    def getSize(self) -> tuple[int, int]:
+        return self.levels[0].shape[:2]
+
+    def getMappedLevels(self, pixelFormat: PixelFormat) -> list[np.ndarray]:
+        # Levels converted to the pixel format of the target, once per format
+        key = pixelFormat.getKey()
+        if key not in self._mappedLevels:
+            self._mappedLevels[key] = [pixelFormat.mapColors(level) for level in self.levels]
+        return self._mappedLevels[key]
+
+def getSignedAreas(triangles: np.ndarray) -> np.ndarray:
+    # Twice the signed area of (T, 3, 2) triangles
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    return (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+
+def getEdgeFunctions(points: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Receives (T, 3, 2) screen triangles and returns the coefficients (A, B, C) of the three edge functions,
+    normalised by the triangle area so they evaluate to barycentric coordinates, and the signed areas'''
+
+    a, b, c = points[:, 0], points[:, 1], points[:, 2]
+    area = getSignedAreas(points)
+    safeArea = np.where(area == 0, 1, area)
+
+    # Barycentric weight of vertex i is the edge function of the opposite edge
+    starts = np.stack([b, c, a], axis=1)
+    ends = np.stack([c, a, b], axis=1)
+    A = -(ends[:, :, 1] - starts[:, :, 1]) / safeArea[:, None]
+    B = (ends[:, :, 0] - starts[:, :, 0]) / safeArea[:, None]
+    C = -(A * starts[:, :, 0] + B * starts[:, :, 1])
+    return A, B, C, area
+
+def getBoundingBoxes(points: np.ndarray, clip: tuple[int, int, int, int]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Range of pixels whose centers can be covered, clipped to the (left, top, right, bottom) clip rect
+    left, top, right, bottom = clip
+    with np.errstate(invalid="ignore"):
+        minX = np.maximum(np.ceil(points[:, :, 0].min(axis=1) - .5), left)
+        maxX = np.minimum(np.floor(points[:, :, 0].max(axis=1) - .5), right - 1)
+        minY = np.maximum(np.ceil(points[:, :, 1].min(axis=1) - .5), top)
+        maxY = np.minimum(np.floor(points[:, :, 1].max(axis=1) - .5), bottom - 1)
+    finite = np.isfinite(points).all(axis=(1, 2))
+    return tuple(np.where(finite, bound, 0).astype(np.int64) for bound in (minX, maxX, minY, maxY))
+
+def getFragments(width: int, height: int, points: np.ndarray, valid: np.ndarray=None,
+                 clip: tuple[int, int, int, int]=None):
+    '''
+    Generator over the fragments of (T, 3, 2) screen triangles inside the clip rect (the whole buffer by default),
+    in batches of (triangle ids, flat pixel indexes, (3, n) barycentric weights, whether a pixel can repeat in the batch)'''
+
+    A, B, C, area = getEdgeFunctions(points)
+    minX, maxX, minY, maxY = getBoundingBoxes(points, clip or (0, 0, width, height))
+
+    # Skip degenerate triangles and the ones that don't cover any pixel center on the buffer
+    usable = (area != 0) & (minX <= maxX) & (minY <= maxY) & np.isfinite(points).all(axis=(1, 2))
+    if valid is not None:
+        usable &= valid
+    size = np.maximum(maxX - minX, maxY - minY) + 1
+
+    previous = 0
+    for tileSize in TILE_SIZES:
+        batch = np.flatnonzero(usable & (size > previous) & (size <= tileSize))
+        previous = tileSize
+
+        # Split the batch so it never evaluates more than BATCH_PIXELS at once
+        step = max(1, BATCH_PIXELS // (tileSize * tileSize))
+        offsets = np.arange(tileSize)
+        for start in range(0, len(batch), step):
+            ids = batch[start:start + step]
+
+            # Evaluate every triangle over a tileSize x tileSize tile anchored at its bounding box, all at once
+            x = minX[ids, None, None] + offsets[None, None, :]
+            y = minY[ids, None, None] + offsets[None, :, None]
+            inside = (x <= maxX[ids, None, None]) & (y <= maxY[ids, None, None])
+            weights = []
+            for i in range(3):
+                weight = A[ids, i, None, None] * (x + .5) + B[ids, i, None, None] * (y + .5) + C[ids, i, None, None]
+                inside &= weight >= 0
+                weights.append(weight)
+
+            triangle, row, col = np.nonzero(inside)
+            pixels = (minX[ids][triangle] + col) * height + (minY[ids][triangle] + row)
+            yield ids[triangle], pixels, np.stack([weight[triangle, row, col] for weight in weights]), True
+
+    # Bigger triangles are evaluated one at a time over their bounding box, in column strips
+    for i in np.flatnonzero(usable & (size > previous)).tolist():
+        columns = maxY[i] - minY[i] + 1
+        step = max(1, BATCH_PIXELS // columns)
+        y = np.arange(minY[i], maxY[i] + 1)
+        for startX in range(minX[i], maxX[i] + 1, step):
+            x = np.arange(startX, min(startX + step, maxX[i] + 1))[:, None]
+            inside = np.ones((len(x), columns), dtype=bool)
+            weights = []
+            for j in range(3):
+                weight = A[i, j] * (x + .5) + B[i, j] * (y + .5) + C[i, j]
+                inside &= weight >= 0
+                weights.append(weight)
+
+            col, row = np.nonzero(inside)
+            pixels = (startX + col) * height + (minY[i] + row)
+            # A single triangle can't overlap itself
+            yield np.full(len(pixels), i), pixels, np.stack([weight[col, row] for weight in weights]), False
+
+def writeFragments(target, pixels: np.ndarray, keys: np.ndarray, colors: np.ndarray, repeats: bool) -> None:
+    '''
+    Writes mapped colors into the target. With a depth buffer, fragments are depth tested and, when a pixel
+    can repeat in the batch, only the closest fragment of each pixel is kept'''
+
+    if target.depth is None:
+        # Surface pixel views aren't contiguous, so they are indexed in 2D
+        target.color[pixels // target.height, pixels % target.height] = colors
+        return
+
+    depth = target.depth.reshape(-1)
+    closer = keys > depth[pixels]
+    pixels, keys, colors = pixels[closer], keys[closer], colors[closer]
+    if len(pixels) == 0:
+        return
+
+    if repeats:
+        # Sort by pixel, then by depth, and keep the last (closest) fragment of each pixel
+        order = np.lexsort((keys, pixels))
+        sortedPixels = pixels[order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = sortedPixels[1:] != sortedPixels[:-1]
+        order = order[last]
+        pixels, keys, colors = pixels[order], keys[order], colors[order]
+
+    depth[pixels] = keys
+    target.color.reshape(-1)[pixels] = colors
+
+def interpolate(values: np.ndarray, triangles: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    # Barycentric interpolation of (T, 3, ...) per-vertex values at each fragment
+    result = values[triangles, 0] * (weights[0] if values.ndim == 2 else weights[0, :, None])
+    for i in (1, 2):
+        result = result + values[triangles, i] * (weights[i] if values.ndim == 2 else weights[i, :, None])
+    return result
+
+def drawTriangles(target, points: np.ndarray, keys: np.ndarray, colors: np.ndarray) -> None:
+    '''
+    Rasterizes (T, 3, 2) screen triangles into a ZBuffer or SurfacePixels target.
+    keys are (T, 3) per-vertex depth keys (bigger is closer, must be affine in screen space, e.g. 1/w)
+    and colors are (T, 3) flat RGB triangle colors'''
+
+    if len(points) == 0:
+        return
+    if isinstance(target, TiledZBuffer):
+        target.record("drawTriangles", (np.asarray(points, dtype=np.float64), keys, colors))
+        return
+    points = np.asarray(points, dtype=np.float64)
+    keys = np.asarray(keys, dtype=np.float64)
+    colors = target.mapColors(colors)
+
+    valid = np.isfinite(keys).all(axis=1)
+    for triangles, pixels, weights, repeats in getFragments(target.width, target.height, points, valid, target.clip):
+        writeFragments(target, pixels, interpolate(keys, triangles, weights), colors[triangles], repeats)
+
+def getMipLevels(points: np.ndarray, uvs: np.ndarray, texture: Texture) -> np.ndarray:
+    # Pick the level whose texels are closest to one pixel: log4 of the texel / pixel area ratio of each triangle
+    width, height = texture.getSize()
+    screenArea = np.abs(getSignedAreas(points))
+    uvArea = np.abs(getSignedAreas(uvs)) * width * height
+    with np.errstate(divide="ignore", invalid="ignore"):
+        levels = np.floor(.5 * np.log2(uvArea / screenArea))
+    levels = np.nan_to_num(levels, nan=0, posinf=len(texture.levels) - 1, neginf=0)
+    return np.clip(levels, 0, len(texture.levels) - 1).astype(np.intp)
+
+def drawTexturedTriangles(target, points: np.ndarray, keys: np.ndarray, inverseW: np.ndarray, uvs: np.ndarray,
+                          texture: Texture) -> None:
+    '''
+    Rasterizes (T, 3, 2) screen triangles sampling a texture.
+    uvs are (T, 3, 2) texture coordinates in [0, 1] and inverseW the (T, 3) 1/w of each vertex, used to interpolate
+    them perspective-correctly (all ones for orthographic projection). Only covered pixels are written'''
+
+    if len(points) == 0:
+        return
+    if isinstance(target, TiledZBuffer):
+        target.record("drawTexturedTriangles", (np.asarray(points, dtype=np.float64), keys, inverseW, uvs), (texture,))
+        return
+    points = np.asarray(points, dtype=np.float64)
+    keys = np.asarray(keys, dtype=np.float64)
+    uvs = np.asarray(uvs, dtype=np.float64)
+
+    # u/w, v/w and 1/w are affine in screen space, u and v are not
+    inverseW = np.asarray(inverseW, dtype=np.float64)
+    uvsOverW = uvs * inverseW[:, :, None]
+
+    mappedLevels = texture.getMappedLevels(target.format)
+    mipLevels = getMipLevels(points, uvs, texture)
+    valid = np.isfinite(keys).all(axis=1) & np.isfinite(inverseW).all(axis=1)
+
+    for triangles, pixels, weights, repeats in getFragments(target.width, target.height, points, valid, target.clip):
+        uv = interpolate(uvsOverW, triangles, weights) / interpolate(inverseW, triangles, weights)[:, None]
+
+        # Nearest texel of the level chosen for each triangle
+        colors = np.empty(len(pixels), dtype=np.uint32)
+        fragmentLevels = mipLevels[triangles]
+        for level in np.unique(fragmentLevels).tolist():
+            texels = mappedLevels[level]
+            inLevel = fragmentLevels == level
+            u = np.clip((uv[inLevel, 0] * texels.shape[0]).astype(np.intp), 0, texels.shape[0] - 1)
+            v = np.clip((uv[inLevel, 1] * texels.shape[1]).astype(np.intp), 0, texels.shape[1] - 1)
+            colors[inLevel] = texels[u, v]
+
+        writeFragments(target, pixels, interpolate(keys, triangles, weights), colors, repeats)
+
+def drawShadedTriangles(target, points: np.ndarray, keys: np.ndarray, inverseW: np.ndarray, levels: np.ndarray,
+                        paletteIds: np.ndarray, palette: np.ndarray) -> None:
+    '''
+    Rasterizes (T, 3, 2) screen triangles with Gouraud shading.
+    levels are (T, 3) per-vertex shade levels, interpolated perspective-correctly like texture coordinates,
+    and every fragment takes the color of its rounded level from row paletteIds[t] of the (C, L, 3) palette'''
+
+    if len(points) == 0:
+        return
+    if isinstance(target, TiledZBuffer):
+        target.record("drawShadedTriangles", (np.asarray(points, dtype=np.float64), keys, inverseW, levels, paletteIds),
+                      (palette,))
+        return
+    points = np.asarray(points, dtype=np.float64)
+    keys = np.asarray(keys, dtype=np.float64)
+    inverseW = np.asarray(inverseW, dtype=np.float64)
+    levelsOverW = np.asarray(levels, dtype=np.float64) * inverseW
+
+    # Mapped once per call, fragments only index into it
+    mappedPalette = target.mapColors(palette)
+    valid = np.isfinite(keys).all(axis=1) & np.isfinite(inverseW).all(axis=1)
+
+    for triangles, pixels, weights, repeats in getFragments(target.width, target.height, points, valid, target.clip):
+        level = interpolate(levelsOverW, triangles, weights) / interpolate(inverseW, triangles, weights)
+        level = np.clip(np.rint(level).astype(np.intp), 0, mappedPalette.shape[1] - 1)
+        writeFragments(target, pixels, interpolate(keys, triangles, weights), mappedPalette[paletteIds[triangles], level],
+                       repeats)
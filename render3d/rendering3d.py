@@ -3,19 +3,37 @@ from pygame.locals import *
 import sys
 sys.dont_write_bytecode = True
 from pygame.math import Vector2, Vector3
-from matrix import Matrix
+from matrix import Matrix, Mat3, Mat4, compose
+from scene_graph import Node
+import rasterizer
+import lighting
+from lighting import DirectionalLight, SHADING_MODES
+from mesh import Mesh, loadMesh
+from lod import LevelOfDetail
+from camera import Camera, clipPolygon, clipSegments, clipTriangles
 import objects_info.cube
 from random import randint
 from math import cos, pi, sin, radians, inf
 import os.path
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+import weakref
+import numpy as np
 
 pathFile = os.path.dirname(__file__)
 
+# Headless mode (RENDER3D_HEADLESS=1) renders without a display, through SDL's dummy video driver.
+# It has to be chosen before pygame is initialized
+HEADLESS = os.environ.get("RENDER3D_HEADLESS", "0") not in ("", "0")
+if HEADLESS:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
 # Init pygame
 pygame.init()
 WIDTH = 800
 HEIGHT = 800
-window = pygame.display.set_mode((WIDTH, HEIGHT))
+# The window is only opened when something draws to it (see getWindow), so importing this module doesn't open one
+window: pygame.Surface = None
 clock = pygame.time.Clock()
 FPS = 6000
 
@@ -40,21 +58,91 @@ def clamp(n, minVal, maxVal):
         return maxVal
     return n
 
+def getWindow() -> pygame.Surface:
+    global window
+    if window is None:
+        window = pygame.display.get_surface() or pygame.display.set_mode((WIDTH, HEIGHT))
+    return window
+
 def drawText(text: str, pos: Vector2, fontSize: int=18, fontType: str="comicsans", bold: bool=False,
              italic: bool=False, antiAlias: bool=False, textColor: tuple=BLACK, bgColor: tuple=None,
-             centerX: float=0, centerY: float=0, surface: pygame.Surface=window):
+             centerX: float=0, centerY: float=0, surface: pygame.Surface=None):
+    surface = surface or getWindow()
     font = pygame.font.SysFont(fontType, fontSize, bold, italic)
     textSurface = font.render(str(text), antiAlias, textColor, bgColor)
     textRect = textSurface.get_rect()
     surface.blit(textSurface, [pos.x + (textRect.width/2) * centerX, pos.y + (textRect.height/2) * centerY])
 
 def sortMidpoints(zPoints: list):
-  for i in range(len(zPoints)):
-    for j in range(0, len(zPoints) - i - 1):
-      if zPoints[j][1] < zPoints[j + 1][1]:
-        temp = zPoints[j]
-        zPoints[j] = zPoints[j+1]
-        zPoints[j+1] = temp
+    # Farthest first; list.sort is stable, so equal depths keep their order
+    zPoints.sort(key=lambda zPoint: zPoint[1], reverse=True)
+
+def sortFaces(faceDepths: np.ndarray) -> np.ndarray:
+    # Depth sort stage of the painter's algorithm: returns the face permutation, farthest first
+    return np.argsort(-faceDepths, kind="stable")
+
+# Available draw backends: the painter's algorithm issues one pygame draw call per face,
+# the z-buffer rasterizes all triangles into NumPy buffers and blits them once
+BACKENDS = ("painter", "zbuffer")
+
+_zBuffer: rasterizer.ZBuffer = None
+
+def getZBuffer(surface: pygame.Surface) -> rasterizer.ZBuffer:
+    # Shared buffers, recreated only when the surface size or the tiling changes
+    global _zBuffer
+    tiling = (rasterTiles, rasterExecutor) if rasterTiles > 1 else None
+    current = (_zBuffer.tiles, _zBuffer.executor) if isinstance(_zBuffer, rasterizer.TiledZBuffer) else None
+    if _zBuffer is None or _zBuffer.getSize() != surface.get_size() or tiling != current:
+        if isinstance(_zBuffer, rasterizer.TiledZBuffer):
+            _zBuffer.close()
+        if tiling is None:
+            _zBuffer = rasterizer.ZBuffer(surface.get_size())
+        else:
+            _zBuffer = rasterizer.TiledZBuffer(surface.get_size(), rasterTiles, rasterExecutor)
+    return _zBuffer
+
+def checkBackend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend \"{backend}\", expected one of {', '.join(BACKENDS)}")
+
+# Textures are loaded, converted and mipmapped once per file
+_textureCache: dict[str, tuple[pygame.Surface, rasterizer.Texture]] = {}
+
+def loadTexture(fileName: str) -> tuple[pygame.Surface, rasterizer.Texture]:
+    if fileName not in _textureCache:
+        surface = pygame.image.load(os.path.join(pathFile, fileName))
+        # Converting needs a display mode, which headless renderers may not have set
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        _textureCache[fileName] = surface, rasterizer.Texture(surface)
+    return _textureCache[fileName]
+
+def getDefaultUVs(corners: int) -> list[tuple[float, float]]:
+    # Quads get the whole texture, other polygons are inscribed in it
+    if corners == 4:
+        return [(0, 0), (1, 0), (1, 1), (0, 1)]
+    return [(.5 + .5 * cos(2*pi * i / corners - 3*pi/4), .5 + .5 * sin(2*pi * i / corners - 3*pi/4)) for i in range(corners)]
+
+class ProjectedVertices:
+    '''
+    An object's vertices as projected by one camera: (N, 4) homogeneous points (x, y, depth, w) before the perspective
+    divide, the (N, 2) screen points and the (N,) view space depths, and the transform key they were made with.
+    Vertices behind the camera's near plane are marked in behind (None if there are none); their screen points are
+    only placeholders and the faces and edges using them are clipped'''
+
+    def __init__(self, key: tuple, homogeneous: np.ndarray, camera: Camera) -> None:
+        self.key = key
+        self.homogeneous = homogeneous
+        w = homogeneous[:, 3]
+        behind = np.zeros(len(w), dtype=bool) if camera.orthographic else w < camera.near
+        self.behind = behind if behind.any() else None
+        self.projected = homogeneous[:, :2] / np.maximum(w, camera.near)[:, None] if self.behind is not None else \
+            homogeneous[:, :2] / w[:, None]
+        self.depths = homogeneous[:, 2]
+        # Cached arrays are shared between callers, so don't let them be modified in place
+        for array in (self.homogeneous, self.projected, self.depths):
+            array.flags.writeable = False
+        self.points: list[Vector2] = None
 
 class Face:
     def __init__(self, id: str, vertices: list[Vector2], color: tuple=BLACK) -> None:
@@ -70,176 +158,536 @@ class BaseObject:
         self.edgeThickness = edgeThickness
         self.cornerThickness = cornerThickness
         self.rotation = Vector3(0, 0, 0)
+        # Optional scene graph node. When set, its world matrix places the object relative to pos
+        # (in vertex units) and replaces the Euler rotation
+        self.node: Node = None
         self.faces = faces or []
         self.faceColors: list[tuple] = faceColors or []
         self.faceTextures: list[pygame.Surface] = []
+        # Mipmapped copies of faceTextures, sampled by the rasterizer
+        self.textures: list[rasterizer.Texture] = []
         if faceTextures:
             for faceId, spriteName in enumerate(faceTextures):
-                self.faceTextures.append(pygame.image.load(os.path.join(pathFile, f"{spriteName}")).convert())
+                textureSurface, texture = loadTexture(spriteName)
+                self.faceTextures.append(textureSurface)
+                self.textures.append(texture)
+        # Optional per-face list of (u, v) for each face index; faces without one use getDefaultUVs
+        self.faceUVs: list[list[tuple[float, float]]] = []
         self.size = 1
         self.points: list[Vector3] = []
+        # Optional simpler versions of the mesh, swapped into points and faces every frame by updateLevelOfDetail.
+        # Simplified faces map back to the face they came from, for colors and textures
+        self.levelsOfDetail: LevelOfDetail = None
+        self._faceSources: list[int] = None
+        # Projected vertices per camera, so objects seen by several cameras are projected once by each
+        self._projections: weakref.WeakKeyDictionary[Camera, ProjectedVertices] = weakref.WeakKeyDictionary()
+        # Faces crossing the near plane in the current frame, drawn clipped by the painter
+        self._nearFaces: set[int] = set()
+        self._triangleUVMesh: Mesh = None
+        self._triangleUVs: np.ndarray = None
+        # Edges to outline with each face, set for the current draw order by prepareEdges
+        self._faceEdges: dict[int, list[list[int]]] = {}
+        self._faceColorKey: tuple = None
+        self._faceColorArray: np.ndarray = None
+        # Shaded palette of the distinct face colors, and the palette row of every face
+        self._paletteKey: tuple = None
+        self._palette: np.ndarray = None
+        self._faceColorIds: np.ndarray = None
+        # Shade levels of the current frame (see updateShading)
+        self._shadeKey: tuple = None
+        self._faceLevels: np.ndarray = None
+        self._vertexLevels: np.ndarray = None
+        self._faceShades: list[list[int]] = None
+        # Closed meshes can skip the faces pointing away from the camera
+        self.backFaceCulling = True
 
     def rotateX(self, angle) -> None:
+        if self.node is not None:
+            self.node.rotateX(angle)
+            return
         self.rotation.x += radians(angle)
+        self.invalidateTransform()
 
     def rotateY(self, angle) -> None:
+        if self.node is not None:
+            # Euler Y rotations turn the other way (see Mat3.rotationY)
+            self.node.rotateY(-angle)
+            return
         self.rotation.y += radians(angle)
+        self.invalidateTransform()
 
     def rotateZ(self, angle) -> None:
+        if self.node is not None:
+            self.node.rotateZ(angle)
+            return
         self.rotation.z += radians(angle)
+        self.invalidateTransform()
+
+    def invalidateTransform(self) -> None:
+        self._projections.clear()
+
+    def getTransformKey(self) -> tuple:
+        # Everything the projected vertices depend on; if it didn't change, the cached frame is reused
+        nodeVersion = 0
+        if self.node is not None:
+            # Brings a dirty node up to date first, so its version is current
+            self.node.getWorldMatrix()
+            nodeVersion = self.node.worldVersion
+        return (
+            self.rotation.x, self.rotation.y, self.rotation.z,
+            self.pos.x, self.pos.y, self.pos.z, self.size,
+            getCamera().getKey(), transformVersion, id(self.getMesh()), nodeVersion
+        )
+
+    def getMesh(self) -> Mesh:
+        # Built once per point and face list, and shared by every object using the same lists
+        return loadMesh(self.points, self.faces)
+
+    def getVertexArray(self) -> np.ndarray:
+        return self.getMesh().vertices
+
+    def getBoundingRadius(self) -> float:
+        # Radius of the bounding sphere around the object's origin, in vertex units
+        return self.getMesh().boundingRadius
+
+    def getScreenCircle(self) -> tuple[float, float, float]:
+        '''
+        Projects the bounding sphere and returns the screen center and radius of a circle containing it.
+        The radius is inf when the camera is inside the sphere and negative when it's entirely behind the camera'''
+
+        camera = getCamera()
+        modelView = self.getModelViewMatrix()
+        center = modelView.getTranslation()
+        # Uniform scale of the model view, from the length of its first column
+        radius = self.getBoundingRadius() * Vector3(modelView[0, 0], modelView[1, 0], modelView[2, 0]).length()
+        x, y = camera.toScreen(self.pos.x + camera.position.x, self.pos.y + camera.position.y)
+        if camera.orthographic:
+            screenRadius = radius * self.size
+            scale = self.size
+        else:
+            distance = camera.position.z + center.z
+            if distance + radius <= camera.near:
+                return x, y, -1
+            if distance - radius <= camera.near:
+                return x, y, inf
+            screenRadius = radius * self.size / (distance - radius)
+            scale = self.size / distance
+
+        # The viewport scales everything the camera sees
+        viewportScale = camera.getScale()
+        return x + center.x * scale * viewportScale, y + center.y * scale * viewportScale, screenRadius * viewportScale
+
+    def isInFrustum(self, surface: pygame.Surface) -> bool:
+        # Check if the projected bounding sphere overlaps the camera's part of the surface at all
+        centerX, centerY, screenRadius = self.getScreenCircle()
+        if screenRadius < 0:
+            return False
+        viewport = getCamera().getViewportRect(surface)
+        return (centerX + screenRadius >= viewport.left and centerX - screenRadius <= viewport.right and
+                centerY + screenRadius >= viewport.top and centerY - screenRadius <= viewport.bottom)
+
+    def buildLevelsOfDetail(self, levels: int=4, ratio: float=.5) -> None:
+        # Simplified versions of the current mesh, each with about ratio times the triangles of the last
+        self.levelsOfDetail = LevelOfDetail.fromMesh(self.points, self.faces, levels, ratio)
+
+    def setLevelOfDetail(self, level: int) -> None:
+        points, faces, faceSources = self.levelsOfDetail.getLevel(level)
+        if self.points is not points:
+            self.points, self.faces, self._faceSources = points, faces, faceSources
+
+    def updateLevelOfDetail(self) -> None:
+        # Switch to the level that fits the object's size on screen (the full mesh if levels of detail are off)
+        if self.levelsOfDetail is None:
+            return
+        if not levelOfDetail:
+            self.setLevelOfDetail(0)
+            return
+        _, _, screenRadius = self.getScreenCircle()
+        self.setLevelOfDetail(self.levelsOfDetail.select(screenRadius))
+
+    def getSourceFace(self, faceId: int) -> int:
+        # Face of the full mesh a face of the current level comes from
+        return faceId if self._faceSources is None else self._faceSources[faceId]
+
+    def getFaceNormals(self) -> np.ndarray:
+        # Local space normals of the non-empty faces, computed once per mesh
+        mesh = self.getMesh()
+        return mesh.faceNormals[mesh.faceIds]
+
+    def getFrontFaceMask(self) -> np.ndarray:
+        # True for the non-empty faces that point towards the camera.
+        # Done in local space: only the camera is rotated into the object's frame, not every normal
+        first, _ = self.getMesh().depthIndexes
+        normals = self.getFaceNormals()
+        camera = getCamera()
+        inverseModelView = self.getModelViewMatrix().getInverse()
+        if camera.orthographic:
+            viewDirection = np.array(inverseModelView.getRotation().transformVector(Vector3(0, 0, 1)))
+            return normals @ viewDirection < 0
+        eye = np.array(inverseModelView.transformVector(Vector3(0, 0, -camera.position.z)))
+        return (normals * (self.getVertexArray()[first] - eye)).sum(axis=1) < 0
+
+    def getRotationMatrix(self) -> Mat3:
+        # Same order as rotating by X, then Y, then Z
+        rotation = getCamera().rotation
+        return Mat3.fromEuler(self.rotation.x + radians(rotation.x),
+                              self.rotation.y + radians(rotation.y),
+                              self.rotation.z + radians(rotation.z))
+
+    def getModelViewMatrix(self) -> Mat4:
+        # Vertex units to view space (before projection), centered on pos
+        if self.node is None:
+            return Mat4.fromMat3(self.getRotationMatrix())
+        # The scene rotation turns the whole graph around pos, not each object around its own origin
+        return getCamera().getViewMatrix() * self.node.getWorldMatrix()
+
+    def getTransformMatrix(self) -> Mat4:
+        # Model view, projection, scale and screen offset composed into a single 4x4 matrix (see Camera.getProjectionMatrix)
+        return getCamera().getProjectionMatrix(self.pos, self.size) * self.getModelViewMatrix()
+
+    def getProjection(self) -> ProjectedVertices:
+        # The vertices as projected by the current camera, projected again only after something they depend on changed
+        camera = getCamera()
+        key = self.getTransformKey()
+        projection = self._projections.get(camera)
+        if projection is None or projection.key != key:
+            projection = ProjectedVertices(key, self.getTransformMatrix().transformPoints(self.getVertexArray()), camera)
+            self._projections[camera] = projection
+        return projection
+
+    def transformVertices(self) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Transforms all vertices at once and returns the projected (N, 2) screen points and the (N,) rotated depths'''
+
+        projection = self.getProjection()
+        return projection.projected, projection.depths
+
+    def getScreenRect(self, surface: pygame.Surface) -> pygame.Rect:
+        # Bounding box of the projected vertices on the surface, with room for the outlines
+        viewport = getCamera().getViewportRect(surface)
+        projection = self.getProjection()
+        projected = projection.projected
+        if len(projected) == 0:
+            return pygame.Rect(0, 0, 0, 0)
+        if projection.behind is not None:
+            # Clipped faces can reach anywhere
+            return viewport
+        with np.errstate(invalid="ignore"):
+            left, top = np.floor(np.nan_to_num(projected.min(axis=0))).tolist()
+            right, bottom = np.ceil(np.nan_to_num(projected.max(axis=0))).tolist()
+        margin = self.edgeThickness + 1
+        # Clipping first keeps huge coordinates (vertices close to the camera) out of the Rect
+        left, top = max(left, viewport.left - margin), max(top, viewport.top - margin)
+        right, bottom = min(right, viewport.right + margin), min(bottom, viewport.bottom + margin)
+        rect = pygame.Rect(left - margin, top - margin, max(right - left + 2*margin, 0), max(bottom - top + 2*margin, 0))
+        return rect.clip(viewport)
+
+    def getDrawKey(self) -> tuple:
+        # Everything the object's pixels depend on; the renderer redraws it only when this changes
+        return (self.getTransformKey(), id(self.getFaceColorArray()), tuple(self.color), self.edgeThickness,
+                shading, light.getKey() if shading != "none" else None)
 
     def getRotated(self) -> list[Matrix]:
-        # Create rotation matrices
-        cosX = cos(self.rotation.x + radians(GLOBAL_ROTATION.x))
-        sinX = sin(self.rotation.x + radians(GLOBAL_ROTATION.x))
-        cosY = cos(self.rotation.y + radians(GLOBAL_ROTATION.y))
-        sinY = sin(self.rotation.y + radians(GLOBAL_ROTATION.y))
-        cosZ = cos(self.rotation.z + radians(GLOBAL_ROTATION.z))
-        sinZ = sin(self.rotation.z + radians(GLOBAL_ROTATION.z))
-        rotationX: Matrix = Matrix([
-            [1, 0, 0],
-            [0, cosX, -sinX],
-            [0, sinX,  cosX],
-        ])
-        rotationY: Matrix = Matrix([
-            [cosY, 0, -sinY],
-            [0, 1, 0],
-            [sinY, 0, cosY],
-        ])
-        rotationZ: Matrix = Matrix([
-            [cosZ, -sinZ, 0],
-            [sinZ,  cosZ, 0],
-            [0, 0, 1]
-        ])
-
-        # Save the projected points
-        rotatedPoints: list[Matrix] = []
-
-        # Calculate all vertex positions
-        for point in self.points:
-            # Rotate
-            rotated = rotationX * Matrix.fromVector3(point)
-            rotated = rotationY * rotated
-            rotated = rotationZ * rotated
-
-            rotatedPoints.append(rotated)
-
-        return rotatedPoints
+        # Compatibility wrapper around the batched path
+        rotated = self.getModelViewMatrix().transformPoints(self.getVertexArray())[:, :3]
+        return [Matrix([[x], [y], [z]]) for x, y, z in rotated.tolist()]
 
     def getPoints(self) -> list[Vector2]:
-        # Save the projected points
-        rotatedPoints = self.getRotated()
-        projectedPoints: list = []
-
-        # Calculate all vertex positions
-        for point in rotatedPoints:
-            # Calculate projected
-            if orthographicProjection:
-                z = 1
+        # Compatibility wrapper around the batched path
+        projection = self.getProjection()
+        if projection.points is None:
+            projection.points = [Vector2(x, y) for x, y in projection.projected.tolist()]
+        return projection.points
+
+    def getTriangleUVs(self) -> np.ndarray:
+        # (T, 3, 2) texture coordinates of every triangle, built once per mesh
+        mesh = self.getMesh()
+        if self._triangleUVMesh is not mesh:
+            uvs = np.zeros((len(mesh.triangleFaces), 3, 2))
+            for triangle, (faceId, corners) in enumerate(zip(mesh.triangleFaces.tolist(), mesh.triangleCorners.tolist())):
+                sourceFace = self.getSourceFace(faceId)
+                # Simplified faces don't keep the corners their UVs were given for
+                if self._faceSources is None and sourceFace < len(self.faceUVs) and self.faceUVs[sourceFace]:
+                    faceUVs = self.faceUVs[sourceFace]
+                else:
+                    faceUVs = getDefaultUVs(len(mesh.getFace(faceId)))
+                uvs[triangle] = [faceUVs[corner] for corner in corners]
+            self._triangleUVs = uvs
+            self._triangleUVMesh = mesh
+        return self._triangleUVs
+
+    def getTextureTable(self) -> tuple[list[rasterizer.Texture], np.ndarray]:
+        # Distinct textures of the object and the index of each face's texture among them (-1 if untextured)
+        textures = list(dict.fromkeys(texture for texture in self.textures if texture))
+        faceTextureIds = np.full(len(self.faces), -1, dtype=np.intp)
+        for faceId in range(len(self.faces)):
+            texture = self.getTexture(faceId)
+            if texture:
+                faceTextureIds[faceId] = textures.index(texture)
+        return textures, faceTextureIds
+
+    def getTexture(self, faceId: int) -> rasterizer.Texture:
+        try:
+            return self.textures[self.getSourceFace(faceId)]
+        except IndexError:
+            return None
+
+    def getFaceDepths(self, depths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Depth key of every face: midpoint between its first and third vertex
+        mesh = self.getMesh()
+        first, third = mesh.depthIndexes
+        return mesh.faceIds, (depths[first] + depths[third]) / 2
+
+    def getFaceColor(self, faceId: int) -> tuple:
+        # Try getting the color of the current face
+        try:
+            return self.faceColors[self.getSourceFace(faceId)]
+        except IndexError:
+            return self.color
+
+    def getFaceColorArray(self) -> np.ndarray:
+        # (F, 3) colors of every face, rebuilt only when the colors change
+        key = (id(self.faceColors), len(self.faceColors), id(self.faces), len(self.faces), tuple(self.color))
+        if key != self._faceColorKey:
+            self._faceColorArray = np.array([tuple(self.getFaceColor(faceId))[:3] for faceId in range(len(self.faces))],
+                                            dtype=np.uint8).reshape(-1, 3)
+            self._faceColorKey = key
+        return self._faceColorArray
+
+    def getPalette(self) -> tuple[np.ndarray, np.ndarray]:
+        # (C, SHADE_LEVELS, 3) shades of the distinct face colors and the (F,) palette row of every face,
+        # rebuilt only when the colors or the light change
+        colors = self.getFaceColorArray()
+        key = (id(colors), light.getKey())
+        if key != self._paletteKey:
+            distinctColors, self._faceColorIds = lighting.buildPalette(colors)
+            self._palette = lighting.shadeColors(distinctColors, light)
+            self._paletteKey = key
+        return self._palette, self._faceColorIds
+
+    def getLightDirection(self) -> np.ndarray:
+        # Unit vector towards the light in local space, so the mesh normals can be used as they are
+        inverseRotation = self.getModelViewMatrix().getInverse().getRotation()
+        toLight = inverseRotation.transformVector(-light.direction)
+        return np.array(toLight.normalize() if toLight.length_squared() > 0 else toLight)
+
+    def updateShading(self, paintFaces: bool) -> None:
+        '''
+        Evaluates the light for the current frame in one pass over the mesh normals: a shade level per face
+        and, for Gouraud shading, per vertex'''
+
+        if shading not in SHADING_MODES:
+            raise ValueError(f"Unknown shading \"{shading}\", expected one of {', '.join(SHADING_MODES)}")
+        if shading == "none" or not paintFaces:
+            self._faceShades = None
+            return
+
+        key = (self.getTransformKey(), light.getKey(), shading, id(self.getFaceColorArray()))
+        if key == self._shadeKey:
+            return
+
+        mesh = self.getMesh()
+        toLight = self.getLightDirection()
+        if shading == "flat":
+            faceLevels = lighting.getShadeLevels(mesh.faceUnitNormals, toLight)
+            self._vertexLevels = None
+        else:
+            self._vertexLevels = lighting.getShadeLevels(mesh.vertexNormals, toLight)
+            # Polygons are filled with a single color, so the painter uses the average of the face's vertices
+            faceLevels = np.zeros(mesh.getFaceCount())
+            lengths = np.diff(mesh.faceOffsets)[mesh.faceIds]
+            faceLevels[mesh.faceIds] = np.add.reduceat(self._vertexLevels[mesh.faceIndices],
+                                                       mesh.faceOffsets[mesh.faceIds]) / lengths
+        self._faceLevels = np.rint(faceLevels).astype(np.intp)
+
+        palette, faceColorIds = self.getPalette()
+        # Plain lists, which pygame.draw takes as colors without building a Color per face
+        self._faceShades = palette[faceColorIds, self._faceLevels].tolist()
+        self._shadeKey = key
+
+    def getInverseW(self) -> np.ndarray:
+        # Per-vertex 1/w, which is affine in screen space so the rasterizer can interpolate it linearly.
+        # Vertices behind the near plane get NaN (getTriangles clips the triangles using them)
+        projection = self.getProjection()
+        if getCamera().orthographic:
+            return np.ones(len(projection.depths))
+        w = projection.homogeneous[:, 3]
+        if projection.behind is None:
+            return 1 / w
+        with np.errstate(divide="ignore"):
+            return np.where(projection.behind, np.nan, 1 / w)
+
+    def getDepthKeys(self) -> np.ndarray:
+        # Per-vertex closeness keys for the z-buffer
+        if getCamera().orthographic:
+            _, depths = self.transformVertices()
+            return -depths
+        return self.getInverseW()
+
+    def getTriangles(self, triangleIds: np.ndarray, attributes: np.ndarray=None) -> tuple[np.ndarray, ...]:
+        '''
+        Screen corners (T, 3, 2), depth keys and 1/w (T, 3) of the given triangles of the mesh, with the triangles
+        crossing the near plane clipped to it and the ones behind it dropped. Per corner attributes (T, 3, A) are
+        interpolated along; the last array returned is the index in triangleIds every triangle comes from'''
+
+        triangles = self.getMesh().triangles[triangleIds]
+        projection = self.getProjection()
+        keys, inverseW = self.getDepthKeys(), self.getInverseW()
+        attributes = np.zeros((len(triangles), 3, 0)) if attributes is None else attributes
+        if projection.behind is None:
+            return projection.projected[triangles], keys[triangles], inverseW[triangles], attributes, np.arange(len(triangles))
+
+        behindCount = projection.behind[triangles].sum(axis=1)
+        front = np.flatnonzero(behindCount == 0)
+        crossing = np.flatnonzero((behindCount > 0) & (behindCount < 3))
+        corners, clippedAttributes, sources = clipTriangles(projection.homogeneous[triangles[crossing]],
+                                                            attributes[crossing], getCamera().near)
+        # Only perspective projections have vertices behind the camera, so the keys are 1/w as well
+        w = corners[..., 3]
+        return (
+            np.concatenate([projection.projected[triangles[front]], corners[..., :2] / w[..., None]]),
+            np.concatenate([keys[triangles[front]], 1 / w]),
+            np.concatenate([inverseW[triangles[front]], 1 / w]),
+            np.concatenate([attributes[front], clippedAttributes]),
+            np.concatenate([front, crossing[sources]]),
+        )
+
+    def rasterize(self, zBuffer: rasterizer.ZBuffer, faceIds: np.ndarray, paintFaces: bool, drawTextures: bool) -> None:
+        '''
+        Rasterizes the given (visible) faces into the z-buffer'''
+
+        if not (paintFaces or drawTextures) or len(faceIds) == 0:
+            return
+
+        # Keep the triangles of the faces that survived culling
+        mesh = self.getMesh()
+        triangles, triangleFaces = mesh.triangles, mesh.triangleFaces
+        visible = np.zeros(len(self.faces), dtype=bool)
+        visible[faceIds] = True
+        keep = visible[triangleFaces]
+
+        # Textured triangles, grouped by texture
+        textured = np.zeros(len(triangleFaces), dtype=bool)
+        if drawTextures and self.textures:
+            textures, faceTextureIds = self.getTextureTable()
+            triangleTextures = faceTextureIds[triangleFaces]
+            textured = keep & (triangleTextures >= 0)
+
+            uvs = self.getTriangleUVs()
+            for textureId, texture in enumerate(textures):
+                ids = np.flatnonzero(textured & (triangleTextures == textureId))
+                if len(ids):
+                    points, keys, inverseW, clippedUVs, _ = self.getTriangles(ids, uvs[ids])
+                    rasterizer.drawTexturedTriangles(zBuffer, points, keys, inverseW, clippedUVs, texture)
+
+        if paintFaces:
+            ids = np.flatnonzero(keep & ~textured)
+            if self._faceShades is None:
+                points, keys, _, _, sources = self.getTriangles(ids)
+                rasterizer.drawTriangles(zBuffer, points, keys, self.getFaceColorArray()[triangleFaces[ids[sources]]])
+            elif self._vertexLevels is None:
+                palette, faceColorIds = self.getPalette()
+                points, keys, _, _, sources = self.getTriangles(ids)
+                faces = triangleFaces[ids[sources]]
+                rasterizer.drawTriangles(zBuffer, points, keys, palette[faceColorIds[faces], self._faceLevels[faces]])
             else:
-                try:
-                    z = 1 / (GLOBAL_POSITION.z + point.toVector3().z)
-                except ZeroDivisionError:
-                    z = 1e-10
-
-            projection: Matrix = Matrix([
-                [z, 0, 0],
-                [0, z, 0],
-                [0, 0, z]
-            ])
-            # Add offset and scale
-            projected = Matrix.toVector2(projection * point)
-            pos = Vector2(self.pos.x + GLOBAL_POSITION.x + projected.x * self.size, self.pos.y + GLOBAL_POSITION.y + projected.y * self.size)
-            projectedPoints.append(pos)
-        
-        return projectedPoints
-
-    def draw(self, surface: pygame.Surface=window, drawEdges: bool=True, paintFaces: bool=False,
-             drawTextures: bool=False) -> None:
-        # Get points
-        projectedPoints: list[Vector2] = self.getPoints()
-
-        # Paint faces
-        zPoints = []
-        faces: list[Face] = []
-        # Calculate color and vertices for each face
-        for faceId, indexes in enumerate(self.faces):
-            if len(indexes) == 0: continue
-
-            # Try getting the color of the current face
-            try:
-                color = self.faceColors[faceId]
-            except IndexError:
-                color = self.color
-
-            rotatedPoints = self.getRotated()
-            midPoint = Matrix.toVector3(rotatedPoints[indexes[0]]).lerp(Matrix.toVector3(rotatedPoints[indexes[2]]), .5)
-            zPoints.append((faceId, midPoint.z))
-
-            faceList: list = [projectedPoints[i] for i in indexes]
-            
-            faces.append(Face(faceId, faceList, color))
-
-        # Sort mid points for correct face drawing
-        sortMidpoints(zPoints)
-
-        # Draw faces
-        for f in zPoints:
-            face: Face = None
-
-            # Get face for given name
-            for f1 in faces:
-                if f1.id == f[0]:
-                    face = f1
-                    break
-
-            # Draw face
-            if paintFaces:
-                pygame.draw.polygon(surface, face.color, face.vertices)
-
-            # Draw texture
-            textureSurface = None
-            try:
-                textureSurface: pygame.Surface = self.faceTextures[face.id]
-                if not textureSurface and drawTextures:
-                    continue
-            except IndexError:
-                pass
-            if drawTextures and textureSurface:
-                minX, maxX = WIDTH, 0
-                minY, maxY = HEIGHT, 0
-                for vertex in face.vertices:
-                    if vertex.x < minX:
-                        minX = vertex.x
-                    if vertex.x > maxX:
-                        maxX = vertex.x
-                    if vertex.y < minY:
-                        minY = vertex.y
-                    if vertex.y > maxY:
-                        maxY = vertex.y
-
-                # Set size and scale texture
-                size = Vector2(maxX - minX, maxY - minY)
-                textureSurface = pygame.transform.scale(textureSurface, size)
-
-                # Polygon surf
-                polygonSurf = pygame.Surface(size, BLEND_RGBA_MAX).convert_alpha()
-                polygonSurf.fill((255, 255, 255, 0))
-
-                # Polygon mask
-                pygame.draw.polygon(polygonSurf, BLACK, [(point.x - minX, point.y - minY) for point in face.vertices])
-                polygonMask = pygame.mask.from_surface(polygonSurf)
-                polygonMask.invert()
-                newPolygonSurf = polygonMask.to_surface()
-                newPolygonSurf.set_colorkey(BLACK)
-                
-                # Draw surfaces
-                window.blit(textureSurface, (minX, minY))
-                window.blit(newPolygonSurf, (minX, minY))
-
-            # Draw outlines
-            if drawEdges:
-                pygame.draw.lines(surface, self.color, False, face.vertices, self.edgeThickness)
+                palette, faceColorIds = self.getPalette()
+                points, keys, inverseW, levels, sources = self.getTriangles(ids, self._vertexLevels[triangles[ids]][..., None])
+                rasterizer.drawShadedTriangles(zBuffer, points, keys, inverseW, levels[..., 0],
+                                               faceColorIds[triangleFaces[ids[sources]]], palette)
+
+    def drawTexture(self, pixels: rasterizer.SurfacePixels, faceId: int) -> None:
+        # Rasterize the face's triangles straight into the surface pixels, sampling the texture per pixel
+        mesh = self.getMesh()
+        start, end = mesh.faceTriangleStarts[faceId], mesh.faceTriangleStarts[faceId + 1]
+        if start == end:
+            return
+        points, keys, inverseW, uvs, _ = self.getTriangles(np.arange(start, end), self.getTriangleUVs()[start:end])
+        rasterizer.drawTexturedTriangles(pixels, points, keys, inverseW, uvs, self.getTexture(faceId))
+
+    def getSceneFaces(self, surface: pygame.Surface, paintFaces: bool, drawTextures: bool) -> tuple[np.ndarray, np.ndarray]:
+        # Face ids and their depth in scene units, so faces of different objects can be sorted together
+        if frustumCulling and not self.isInFrustum(surface):
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+
+        projection = self.getProjection()
+        faceIds, faceDepths = self.getFaceDepths(projection.depths)
+
+        # Back faces are only hidden when faces are opaque, wireframes still show them
+        if backFaceCulling and self.backFaceCulling and (paintFaces or drawTextures):
+            frontFaces = self.getFrontFaceMask()
+            faceIds, faceDepths = faceIds[frontFaces], faceDepths[frontFaces]
+
+        # Faces entirely behind the near plane are dropped, the ones crossing it are clipped when drawn
+        self._nearFaces = set()
+        if projection.behind is not None and len(faceIds):
+            mesh = self.getMesh()
+            # Corners of every face behind the plane, from the running count over the flattened faces
+            behindSoFar = np.concatenate([[0], np.cumsum(projection.behind[mesh.faceIndices])])
+            behindCorners = behindSoFar[mesh.faceOffsets[faceIds + 1]] - behindSoFar[mesh.faceOffsets[faceIds]]
+            corners = np.diff(mesh.faceOffsets)[faceIds]
+            self._nearFaces = set(faceIds[(behindCorners > 0) & (behindCorners < corners)].tolist())
+            inFront = behindCorners < corners
+            faceIds, faceDepths = faceIds[inFront], faceDepths[inFront]
+
+        return faceIds, self.pos.z + faceDepths * self.size
+
+    def prepareEdges(self, orderedFaceIds: np.ndarray) -> None:
+        # Shared edges are outlined once, with the last drawn face they belong to, so they still end up on top
+        mesh = self.getMesh()
+        edgeIds, starts = mesh.getEdgeOwners(orderedFaceIds)
+        lines = self.getEdgeLines(mesh.edges[edgeIds])
+        starts = starts.tolist()
+        self._faceEdges = {faceId: [line for line in lines[starts[rank]:starts[rank+1]] if line is not None]
+                           for rank, faceId in enumerate(orderedFaceIds.tolist()) if starts[rank] != starts[rank+1]}
+
+    def getEdgeLines(self, edges: np.ndarray) -> list:
+        # Screen end points of (E, 2) vertex pairs, cut at the near plane (None for the ones entirely behind it)
+        projection = self.getProjection()
+        if projection.behind is None:
+            return projection.projected[edges].tolist()
+        starts, ends, inFront = clipSegments(projection.homogeneous[edges[:, 0]], projection.homogeneous[edges[:, 1]],
+                                             getCamera().near)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lines = np.stack([starts[:, :2] / starts[:, 3:], ends[:, :2] / ends[:, 3:]], axis=1).tolist()
+        return [line if keep else None for line, keep in zip(lines, inFront.tolist())]
+
+    def getFacePolygon(self, faceId: int, projectedPoints: list[Vector2]) -> list:
+        # Screen corners of a face, clipped to the near plane if it crosses it
+        if faceId not in self._nearFaces:
+            return [projectedPoints[i] for i in self.faces[faceId]]
+        polygon = clipPolygon(self.getProjection().homogeneous[self.faces[faceId]], getCamera().near)
+        return (polygon[:, :2] / polygon[:, 3:]).tolist()
+
+    def drawFace(self, surface: pygame.Surface, faceId: int, projectedPoints: list[Vector2], drawEdges: bool,
+                 paintFaces: bool, drawTextures: bool, pixels: rasterizer.SurfacePixels=None) -> None:
+        # Draw texture, or paint the face
+        if drawTextures and pixels and self.getTexture(faceId):
+            self.drawTexture(pixels, faceId)
+        elif paintFaces:
+            color = self.getFaceColor(faceId) if self._faceShades is None else self._faceShades[faceId]
+            pygame.draw.polygon(surface, color, self.getFacePolygon(faceId, projectedPoints))
+
+        # Draw the outlines this face owns (see prepareEdges)
+        if drawEdges:
+            for start, end in self._faceEdges.get(faceId, ()):
+                pygame.draw.line(surface, self.color, start, end, self.edgeThickness)
+
+    def drawWireframe(self, surface: pygame.Surface, faceIds: np.ndarray) -> None:
+        # Every edge of the given faces, once
+        mesh = self.getMesh()
+        edgeIds, _ = mesh.getEdgeOwners(faceIds)
+        for line in self.getEdgeLines(mesh.edges[edgeIds]):
+            if line is not None:
+                pygame.draw.line(surface, self.color, line[0], line[1], self.edgeThickness)
+
+    def drawOverlay(self, surface: pygame.Surface, drawEdges: bool) -> None:
+        # Drawn on top of the sorted faces; nothing by default
+        pass
+
+    def draw(self, surface: pygame.Surface=None, drawEdges: bool=True, paintFaces: bool=False,
+             drawTextures: bool=False, backend: str="painter") -> None:
+        Renderer(surface or getWindow(), backend).render([self], drawEdges, paintFaces, drawTextures)
 
 class Cube(BaseObject):
     def __init__(self, pos: Vector3=None, size: float=50, color: tuple=BLACK, edgeThickness: int=1,
@@ -247,90 +695,13 @@ class Cube(BaseObject):
         super().__init__(pos, color, edgeThickness, cornerThickness, faceColors=faceColors, faceTextures=faceTextures)
         self.size = size
         self.points: list[Vector3] = objects_info.cube.vertices
+        self.faces = objects_info.cube.faces
 
-    def draw(self, surface: pygame.Surface=window, drawEdges: bool=True, paintFaces: bool=False,
-             drawTextures: bool=False) -> None:
-        # Get points
-        projectedPoints: list = self.getPoints()
-
-        # Paint faces
-        zPoints = []
-        faces: list[Face] = []
-        # Calculate color and vertices for each face
-        for faceId, indexes in enumerate(objects_info.cube.faces):
-            if len(indexes) == 0: continue
-            color = self.faceColors[faceId]
-
-            rotatedPoints = self.getRotated()
-            # midPoint = sum([Matrix.toVector3(rotatedPoints[index]).z for index in indexes]) / len(indexes)
-            midPoint = Matrix.toVector3(rotatedPoints[indexes[0]]).lerp(Matrix.toVector3(rotatedPoints[indexes[len(indexes)//2]]), .5).z
-            zPoints.append((faceId, midPoint))
-
-            faceList: list = [projectedPoints[i] for i in indexes]
-            
-            faces.append(Face(faceId, faceList, color))
-
-        # Sort mid points for correct face drawing
-        sortMidpoints(zPoints)
-
-        # Draw faces
-        for f in zPoints:
-            face: Face = None
-
-            # Get face for given name
-            for f1 in faces:
-                if f1.id == f[0]:
-                    face = f1
-                    break
-
-            # Draw face
-            if paintFaces:
-                pygame.draw.polygon(surface, face.color, face.vertices)
-
-            # Draw texture
-            textureSurface = None
-            try:
-                textureSurface: pygame.Surface = self.faceTextures[face.id]
-            except IndexError:
-                pass
-            if textureSurface and drawTextures:
-                minX, maxX = WIDTH, 0
-                minY, maxY = HEIGHT, 0
-                for vertex in face.vertices:
-                    if vertex.x < minX:
-                        minX = vertex.x
-                    if vertex.x > maxX:
-                        maxX = vertex.x
-                    if vertex.y < minY:
-                        minY = vertex.y
-                    if vertex.y > maxY:
-                        maxY = vertex.y
-
-                # Set size and scale texture
-                size = Vector2(maxX - minX, maxY - minY)
-                textureSurface = pygame.transform.scale(textureSurface, size)
-
-                # Polygon surf
-                polygonSurf = pygame.Surface(size, BLEND_RGBA_MAX | SRCALPHA).convert_alpha()
-                polygonSurf.fill((0, 0, 0, 0))
-
-                # Polygon mask
-                pygame.draw.polygon(polygonSurf, BLACK, [(point.x - minX, point.y - minY) for point in face.vertices])
-                polygonMask = pygame.mask.from_surface(polygonSurf)
-                polygonMask.invert()
-                newPolygonSurf = polygonMask.to_surface()
-                newPolygonSurf.set_colorkey(BLACK)
-                newPolygonSurf = newPolygonSurf.convert()
-                
-                # Draw surfaces
-                window.blit(textureSurface, (minX, minY))
-                window.blit(newPolygonSurf, (minX, minY))
-
-            # Draw outlines
-            if drawEdges:
-                pygame.draw.lines(surface, self.color, False, face.vertices, self.edgeThickness)
 
 class Sphere(BaseObject):
+    # Coarsest grid the sphere's levels of detail go down to
+    MIN_RESOLUTION = 6
+
     def __init__(self, pos: Vector3=None, radius: float=50, resolution: int=15, color: tuple=BLACK, edgeThickness: int=1,
                  cornerThickness: int=1, faceColors: list=None) -> None:
         super().__init__(pos, color, edgeThickness, cornerThickness, faceColors)
@@ -338,7 +709,18 @@ class Sphere(BaseObject):
         self.radius = radius
         self.resolution = resolution
 
+        # The full grid, then grids of half the resolution down to MIN_RESOLUTION as levels of detail
+        self.resolutions = [resolution]
+        while (self.resolutions[-1] + 1) // 2 >= self.MIN_RESOLUTION:
+            self.resolutions.append((self.resolutions[-1] + 1) // 2)
+        levels = [self.getGrid(levelResolution) + (None,) for levelResolution in self.resolutions]
+        self.points, self.faces, _ = levels[0]
+        self.levelsOfDetail = LevelOfDetail(levels)
+        self._faceHues: dict[int, list[pygame.Color]] = {}
+
+    def getGrid(self, resolution: int) -> tuple[list[Vector3], list[list[int]]]:
         # Calculate points
+        points: list[Vector3] = []
         for i in range(resolution):
             lat = map(i, 0, resolution-1, 0, 2*pi)
             for j in range(resolution):
@@ -347,78 +729,414 @@ class Sphere(BaseObject):
                 x = self.pos.x + sin(lon) * cos(lat)
                 y = self.pos.y + sin(lon) * sin(lat)
                 z = self.pos.z + cos(lon)
-                self.points.append(Vector3(x, y, z))
+                points.append(Vector3(x, y, z))
 
         # Create faces
-        self.faces: list[list[int]] = []
-        for i in range(self.resolution-1):
-            for j in range(self.resolution-1):
-                i0 = i + j * self.resolution
-                i1 = (i+1) + j * self.resolution
-                i2 = i + (j+1) * self.resolution
-                i3 = (i+1) + (j+1) * self.resolution
-                self.faces.append([i0, i1, i3, i2, i0])
-
-    def draw(self, surface: pygame.Surface=window, drawEdges: bool=True, paintFaces: bool=False,
-             drawTextures: bool=False) -> None:
-        # Get points
-        projectedPoints = self.getPoints()
-        rotatedPoints = self.getRotated()
-
-        zPoints: list[tuple[int, float]] = []
-        faces: list[Face] = []
-        if paintFaces:
-            for faceId, indexes in enumerate(self.faces):
-                midPoint = Matrix.toVector3(rotatedPoints[indexes[0]]).lerp(Matrix.toVector3(rotatedPoints[indexes[2]]), .5)
-                zPoints.append((faceId, midPoint.z))
-
-                faceList: list = [projectedPoints[i] for i in indexes]
-                
+        faces: list[list[int]] = []
+        for i in range(resolution-1):
+            for j in range(resolution-1):
+                i0 = i + j * resolution
+                i1 = (i+1) + j * resolution
+                i2 = i + (j+1) * resolution
+                i3 = (i+1) + (j+1) * resolution
+                faces.append([i0, i1, i3, i2, i0])
+        return points, faces
+
+    def setLevelOfDetail(self, level: int) -> None:
+        super().setLevelOfDetail(level)
+        # The grid lines of the overlay follow the level's grid
+        self.resolution = self.resolutions[level]
+
+    def getFaceColor(self, faceId: int) -> tuple:
+        # Color faces along the hue wheel, computed once per sphere and level of detail
+        hues = self._faceHues.get(len(self.faces))
+        if hues is None:
+            hues = self._faceHues[len(self.faces)] = []
+            for i in range(len(self.faces)):
                 color = pygame.Color(0, 0, 0)
-                color.hsla = (faceId / len(self.faces) * 360, 100, 50)
-                faces.append(Face(faceId, faceList, color))
-
-        # Sort mid points for correct face drawing
-        sortMidpoints(zPoints)
-
-        # Draw faces
-        for f in zPoints:
-            face: Face = None
-
-            # Get face for given name
-            for f1 in faces:
-                if f1.id == f[0]:
-                    face = f1
-                    break
+                color.hsla = (i / len(self.faces) * 360, 100, 50)
+                hues.append(color)
+        return hues[faceId]
+
+    def getSceneFaces(self, surface: pygame.Surface, paintFaces: bool, drawTextures: bool) -> tuple[np.ndarray, np.ndarray]:
+        # Without painted faces only the grid lines are drawn
+        if not paintFaces:
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        return super().getSceneFaces(surface, paintFaces, drawTextures)
+
+    def drawOverlay(self, surface: pygame.Surface, drawEdges: bool) -> None:
+        if drawEdges and (not frustumCulling or self.isInFrustum(surface)):
+            # Horizontal and vertical grid line from every grid point but the last row and column
+            i, j = np.meshgrid(np.arange(self.resolution - 1), np.arange(self.resolution - 1), indexing="ij")
+            idx = (i + j * self.resolution).ravel()
+            lines = self.getEdgeLines(np.stack([idx, idx + self.resolution, idx, idx + 1], axis=1).reshape(-1, 2))
+            for line in lines:
+                if line is not None:
+                    pygame.draw.line(surface, BLACK, line[0], line[1], self.edgeThickness)
+
+class InstancedObject(BaseObject):
+    '''
+    One mesh drawn many times, with a (4, 4) matrix (in vertex units, relative to pos) and optionally a color per
+    instance. All copies are transformed in one batch and culled, sorted and rasterized as a single mesh, so thousands
+    of instances cost about as much as one mesh with as many faces, not thousands of objects'''
 
-            # Draw face
-            if paintFaces:
-                pygame.draw.polygon(surface, face.color, face.vertices)
+    # Moves remembered for projecting only the instances that moved (see moveInstances)
+    MOVE_HISTORY = 64
 
-            # Draw outlines
+    def __init__(self, pos: Vector3, points: list[Vector3], faces: list[list[int]], matrices: np.ndarray=None,
+                 colors: np.ndarray=None, size: float=1, color: tuple=BLACK, edgeThickness: int=1, cornerThickness: int=1,
+                 faceColors: list=None, faceTextures: dict=None) -> None:
+        super().__init__(pos, color, edgeThickness, cornerThickness, faceColors=faceColors, faceTextures=faceTextures)
+        self.size = size
+        self.points = points
+        # Faces of a single instance; self.faces holds the faces of every instance
+        self.instanceFaces = faces
+        self.matrices: np.ndarray = None
+        self.colors: np.ndarray = None
+        self._instanceMesh: Mesh = None
+        # Bumped when the instance colors are replaced, and when instances move
+        self._colorVersion = 0
+        self._matrixVersion = 0
+        # Instances moved by every moveInstances call since the last setInstances, with the version after each
+        self._moves: list[tuple[int, np.ndarray]] = []
+        self._faceColorList: list[list[int]] = None
+        self.setInstances(np.eye(4)[None] if matrices is None else matrices, colors)
+
+    def setInstances(self, matrices: np.ndarray, colors: np.ndarray=None) -> None:
+        '''
+        Replaces the instances: an (I, 4, 4) array of matrices and an (I, 3) array of colors, one per instance, or
+        (I, F, 3) with one per face of every instance. Without colors, every instance uses faceColors'''
+
+        # A copy, since moveInstances writes into it
+        matrices = np.array(matrices, dtype=np.float64).reshape(-1, 4, 4)
+        if self.matrices is None or len(matrices) != len(self.matrices):
+            # Same faces as the combined mesh, for the code that goes through the face lists
+            vertexCount = len(self.points)
+            self.faces = [[index + instance * vertexCount for index in face]
+                          for instance in range(len(matrices)) for face in self.instanceFaces]
+        self.matrices = matrices
+        if colors is not None or self.colors is not None:
+            self.colors = None if colors is None else np.asarray(colors, dtype=np.uint8)
+            self._colorVersion += 1
+        self._instanceMesh = None
+        self._matrixVersion += 1
+        self._moves = []
+
+    def moveInstances(self, indexes: np.ndarray, matrices: np.ndarray) -> None:
+        '''
+        Gives new (4, 4) matrices to some of the instances. Only those are transformed again and projected on the
+        next frame; the others keep their cached vertices'''
+
+        indexes = np.asarray(indexes, dtype=np.intp).ravel()
+        matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+        self.matrices[indexes] = matrices
+        if self._instanceMesh is not None:
+            loadMesh(self.points, self.instanceFaces).moveInstances(self._instanceMesh, indexes, matrices)
+        self._matrixVersion += 1
+        self._moves.append((self._matrixVersion, indexes))
+        # Cameras that haven't projected for this many moves project everything again
+        if len(self._moves) > self.MOVE_HISTORY:
+            self._moves.pop(0)
+
+    def getInstanceCount(self) -> int:
+        return len(self.matrices)
+
+    def getTransformKey(self) -> tuple:
+        return super().getTransformKey() + (self._matrixVersion,)
+
+    def getProjection(self) -> ProjectedVertices:
+        camera = getCamera()
+        key = self.getTransformKey()
+        projection = self._projections.get(camera)
+        if projection is not None and projection.key != key and projection.key[:-1] == key[:-1]:
+            # Only instances moved since this camera's last projection: project their vertices and keep the others
+            version = projection.key[-1]
+            if self._moves and self._moves[0][0] <= version + 1:
+                moved = np.unique(np.concatenate([indexes for moveVersion, indexes in self._moves if moveVersion > version]))
+                vertexCount = len(self.points)
+                rows = (moved[:, None] * vertexCount + np.arange(vertexCount)).ravel()
+                homogeneous = projection.homogeneous.copy()
+                homogeneous[rows] = self.getTransformMatrix().transformPoints(self.getVertexArray()[rows])
+                self._projections[camera] = ProjectedVertices(key, homogeneous, camera)
+        return super().getProjection()
+
+    def getMesh(self) -> Mesh:
+        # Rebuilt from the shared mesh only when the instances change
+        if self._instanceMesh is None:
+            self._instanceMesh = loadMesh(self.points, self.instanceFaces).instance(self.matrices)
+        return self._instanceMesh
+
+    def getSourceFace(self, faceId: int) -> int:
+        # Every instance uses the colors, textures and UVs of the faces of the single mesh
+        return faceId % len(self.instanceFaces)
+
+    def getFaceColorArray(self) -> np.ndarray:
+        key = (self.getInstanceCount(), self._colorVersion, id(self.faceColors), len(self.faceColors), tuple(self.color))
+        if key != self._faceColorKey:
+            faceCount = len(self.instanceFaces)
+            if self.colors is None:
+                colors = np.array([tuple(BaseObject.getFaceColor(self, faceId))[:3] for faceId in range(faceCount)], dtype=np.uint8)
+                colors = np.tile(colors.reshape(-1, 3), (self.getInstanceCount(), 1))
+            elif self.colors.ndim == 2:
+                colors = np.repeat(self.colors, faceCount, axis=0)
+            else:
+                colors = self.colors.reshape(-1, 3)
+            self._faceColorArray = colors
+            self._faceColorList = None
+            self._faceColorKey = key
+        return self._faceColorArray
+
+    def getFaceColor(self, faceId: int) -> tuple:
+        # Plain lists for the painter, built from the color array when it changes
+        colors = self.getFaceColorArray()
+        if self._faceColorList is None:
+            self._faceColorList = colors.tolist()
+        return self._faceColorList[faceId]
+
+class Scene:
+    '''
+    Render queue: collects the faces of every object into one buffer, sorts them once and draws them in a single pass,
+    so faces of different objects occlude each other correctly'''
+
+    def __init__(self, objects: list[BaseObject]=None) -> None:
+        self.objects: list[BaseObject] = list(objects or [])
+
+    def add(self, obj: BaseObject) -> None:
+        self.objects.append(obj)
+
+    def remove(self, obj: BaseObject) -> None:
+        self.objects.remove(obj)
+
+    def getFaceBuffer(self, surface: pygame.Surface, paintFaces: bool, drawTextures: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Object index, face id and scene depth of every face, concatenated over all objects
+        objectIds: list[np.ndarray] = []
+        faceIds: list[np.ndarray] = []
+        faceDepths: list[np.ndarray] = []
+        for objectId, obj in enumerate(self.objects):
+            ids, depths = obj.getSceneFaces(surface, paintFaces, drawTextures)
+            objectIds.append(np.full(len(ids), objectId, dtype=np.intp))
+            faceIds.append(ids)
+            faceDepths.append(depths)
+
+        if not self.objects:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+        return np.concatenate(objectIds), np.concatenate(faceIds), np.concatenate(faceDepths)
+
+    def draw(self, surface: pygame.Surface=None, drawEdges: bool=True, paintFaces: bool=False,
+             drawTextures: bool=False, backend: str="painter") -> None:
+        Renderer(surface or getWindow(), backend).render(self, drawEdges, paintFaces, drawTextures)
+
+class Renderer:
+    '''
+    Draws a Scene (or a list of objects) into a surface, which doesn't have to be the display, as seen by a camera
+    (the module's camera by default). Renderers with cameras on different viewports can share a surface and a scene:
+    objects keep their projected vertices per camera, so nothing is projected twice for the same camera.
+    Keeps the time spent in each stage of the frame: transform (projecting vertices), shade (lighting),
+    sort (culling and depth sorting), raster (faces, edges and overlays) and blit (z-buffer transfers and presenting
+    the frame)'''
+
+    STAGES = ("transform", "shade", "sort", "raster", "blit")
+
+    def __init__(self, surface: pygame.Surface, backend: str="painter", camera: Camera=None) -> None:
+        checkBackend(backend)
+        self.surface = surface
+        self.backend = backend
+        self.camera = camera
+        self.frames = 0
+        self.timings: dict[str, float] = dict.fromkeys(self.STAGES, 0.)
+        # Draw key and screen area of every object at its last draw, and the settings used, for renderDirty
+        self._drawStates: dict[int, tuple[tuple, pygame.Rect, BaseObject]] = {}
+        self._drawSettings: tuple = None
+
+    def resetTimings(self) -> None:
+        self.frames = 0
+        self.timings = dict.fromkeys(self.STAGES, 0.)
+
+    @contextmanager
+    def timeStage(self, stage: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += perf_counter() - start
+
+    def getCamera(self) -> Camera:
+        return self.camera if self.camera is not None else camera
+
+    @contextmanager
+    def viewportClip(self):
+        # Keeps drawing inside the camera's viewport
+        previousClip = self.surface.get_clip()
+        self.surface.set_clip(previousClip.clip(self.getCamera().getViewportRect(self.surface)))
+        try:
+            yield
+        finally:
+            self.surface.set_clip(previousClip)
+
+    def getFrameTimings(self) -> dict[str, float]:
+        # Average milliseconds per frame of every stage
+        frames = max(self.frames, 1)
+        return {stage: total / frames * 1000 for stage, total in self.timings.items()}
+
+    def render(self, objects, drawEdges: bool=True, paintFaces: bool=False, drawTextures: bool=False) -> None:
+        scene = objects if isinstance(objects, Scene) else Scene(objects)
+        with useCamera(self.getCamera(), self.surface), self.viewportClip():
+            self.renderScene(scene, drawEdges, paintFaces, drawTextures)
+
+    def renderScene(self, scene: Scene, drawEdges: bool, paintFaces: bool, drawTextures: bool) -> None:
+        # Draws the scene with the camera already in use (see render)
+        surface = self.surface
+
+        # Project every object once; later stages reuse the cached vertices
+        with self.timeStage("transform"):
+            for obj in scene.objects:
+                obj.updateLevelOfDetail()
+            projectedPoints = [obj.getPoints() for obj in scene.objects]
+        with self.timeStage("shade"):
+            for obj in scene.objects:
+                obj.updateShading(paintFaces)
+
+        if self.backend == "zbuffer":
+            with self.timeStage("sort"):
+                faceIds = [obj.getSceneFaces(surface, paintFaces, drawTextures)[0] for obj in scene.objects]
+
+            # Rasterize every object into the same buffers and blit them once
+            zBuffer = getZBuffer(surface)
+            with self.timeStage("blit"):
+                zBuffer.load(surface)
+            with self.timeStage("raster"):
+                for obj, ids in zip(scene.objects, faceIds):
+                    obj.rasterize(zBuffer, ids, paintFaces, drawTextures)
+            with self.timeStage("blit"):
+                zBuffer.blit(surface)
+
+            # Edges are drawn over the rasterized faces
+            with self.timeStage("raster"):
+                if drawEdges:
+                    for obj, ids in zip(scene.objects, faceIds):
+                        obj.drawWireframe(surface, ids)
+                for obj in scene.objects:
+                    obj.drawOverlay(surface, drawEdges)
+            self.frames += 1
+            return
+
+        with self.timeStage("sort"):
+            objectIds, faceIds, faceDepths = scene.getFaceBuffer(surface, paintFaces, drawTextures)
+            order = sortFaces(faceDepths)
+            objectIds, faceIds = objectIds[order], faceIds[order]
             if drawEdges:
-                pygame.draw.lines(surface, self.color, False, face.vertices, self.edgeThickness)
-
-        if drawEdges:
-            for i in range(self.resolution-1):
-                for j in range(self.resolution-1):
-                    idx = i + j * self.resolution
-                    idx1 = i + (j+1) * self.resolution
-                    # Horizontal
-                    pygame.draw.line(surface, BLACK, projectedPoints[idx], projectedPoints[idx1], self.edgeThickness)
-                    # Vertical
-                    pygame.draw.line(surface, BLACK, projectedPoints[idx], projectedPoints[idx+1], self.edgeThickness)
+                # Each object's faces, in the order they are drawn
+                for objectId, obj in enumerate(scene.objects):
+                    obj.prepareEdges(faceIds[objectIds == objectId])
+
+        # Draw all faces farthest first. Textures are written straight into the surface pixels
+        with self.timeStage("raster"):
+            textured = drawTextures and any(obj.textures for obj in scene.objects)
+            with rasterizer.SurfacePixels(surface) if textured else nullcontext() as pixels:
+                for objectId, faceId in zip(objectIds.tolist(), faceIds.tolist()):
+                    scene.objects[objectId].drawFace(surface, faceId, projectedPoints[objectId], drawEdges, paintFaces,
+                                                     drawTextures, pixels)
+
+            for obj in scene.objects:
+                obj.drawOverlay(surface, drawEdges)
+        self.frames += 1
+
+    def getDirtyRects(self, scene: Scene, settings: tuple, extraRects: list[pygame.Rect]) -> list[pygame.Rect]:
+        '''
+        Screen areas that changed since the last call: the old and new bounding boxes of every object whose draw key
+        changed, plus the ones of added and removed objects, merged where they overlap.
+        The whole surface is dirty on the first call and when the draw settings change'''
+
+        surface = self.surface
+        states: dict[int, tuple[tuple, pygame.Rect, BaseObject]] = {}
+        rects = [pygame.Rect(rect) for rect in extraRects]
+        for obj in scene.objects:
+            obj.updateLevelOfDetail()
+            key = obj.getDrawKey()
+            previous = self._drawStates.get(id(obj))
+            if previous is not None and previous[0] == key:
+                states[id(obj)] = previous
+                continue
+            rect = obj.getScreenRect(surface)
+            states[id(obj)] = (key, rect, obj)
+            rects.append(rect)
+            if previous is not None:
+                rects.append(previous[1])
+        # Removed objects leave their last area behind
+        rects.extend(rect for objectId, (_, rect, _) in self._drawStates.items() if objectId not in states)
+
+        full = settings != self._drawSettings
+        self._drawStates = states
+        self._drawSettings = settings
+        if full:
+            return [getCamera().getViewportRect(surface)]
+
+        # Merge overlapping areas until none are left, so no pixel is drawn twice
+        merged: list[pygame.Rect] = []
+        for rect in rects:
+            if rect.width == 0 or rect.height == 0:
+                continue
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect = rect.union(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def renderDirty(self, objects, background: tuple, drawEdges: bool=True, paintFaces: bool=False,
+                    drawTextures: bool=False, extraRects: list[pygame.Rect]=()) -> list[pygame.Rect]:
+        '''
+        Incremental version of render: only the areas of objects that moved or changed since the last call are cleared
+        to the background and redrawn (with every object overlapping them), clipped to those areas. extraRects are
+        redrawn too, e.g. under overlays drawn on top afterwards.
+        Returns the redrawn areas for present or pygame.display.update; nothing is drawn if the scene didn't change'''
+
+        scene = objects if isinstance(objects, Scene) else Scene(objects)
+        surface = self.surface
+        settings = (surface.get_size(), tuple(background), drawEdges, paintFaces, drawTextures, self.backend)
+        with self.timeStage("transform"), useCamera(self.getCamera(), surface):
+            rects = self.getDirtyRects(scene, settings, extraRects)
+
+        previousClip = surface.get_clip()
+        for rect in rects:
+            surface.set_clip(rect)
+            surface.fill(background)
+            overlapping = [obj for obj in scene.objects if self._drawStates[id(obj)][1].colliderect(rect)]
+            if overlapping:
+                self.render(overlapping, drawEdges, paintFaces, drawTextures)
+        surface.set_clip(previousClip)
+        return rects
+
+    def present(self, rects: list[pygame.Rect]=None) -> None:
+        # Show the frame, copying it to the display first when rendering offscreen.
+        # With rects (see renderDirty) only those areas are updated, and nothing at all when the list is empty
+        with self.timeStage("blit"):
+            display = pygame.display.get_surface()
+            if display is None or rects == []:
+                return
+            if display is not self.surface:
+                for rect in rects or [self.surface.get_rect()]:
+                    display.blit(self.surface, rect, rect)
+            pygame.display.update(rects)
 
 # Modes
-orthographicProjection = False         # If false, Perspective Projection will be used
 addRotation = False
 addPosition = False
 autoResetGlobalPosition = False
 autoResetGlobalRotation = False
+backFaceCulling = True                 # Skip faces pointing away from the camera (objects can opt out with obj.backFaceCulling)
+frustumCulling = True                  # Skip objects whose bounding sphere is outside the surface
+shading = "none"                       # "none", "flat" or "gouraud" (see lighting.SHADING_MODES)
+light = DirectionalLight()             # Used when shading
+rasterTiles = 1                        # Strips the z-buffer backend rasterizes in parallel (see rasterizer.TiledZBuffer)
+rasterExecutor = "thread"              # "thread" or "process" pool for the strips
+levelOfDetail = True                   # Draw objects with levels of detail using the one that fits their size on screen
 
 # Movement
-GLOBAL_POSITION = Vector3(0, 0, 5)
-GLOBAL_ROTATION = Vector3(0, 0, 0)
+# Default camera: used by renderers without one of their own, and moved by the functions below
+camera = Camera()
+# Camera of the render in progress (see useCamera)
+_activeCamera: Camera = None
 positionResetLerp = .005
 rotationResetLerp = .002
 positionAdd = Vector3(0, 0, 0)
@@ -427,35 +1145,53 @@ positionAddCapLerp = .003
 rotationAddCapLerp = .001
 zoomStep = .1
 
-# Public methods for moving and rotating the scene
+# Bumped to invalidate every cached object transform. Cameras don't need it: transforms are keyed on their values
+transformVersion = 0
+
+def invalidateTransforms() -> None:
+    global transformVersion
+    transformVersion += 1
+
+def getCamera() -> Camera:
+    # The camera objects are projected with: the one of the render in progress, otherwise the default one
+    return _activeCamera if _activeCamera is not None else camera
+
+@contextmanager
+def useCamera(renderCamera: Camera, surface: pygame.Surface):
+    # Projects objects with the camera, for rendering into the surface, until the block ends
+    global _activeCamera
+    previous = _activeCamera
+    renderCamera.surfaceSize = surface.get_size()
+    _activeCamera = renderCamera
+    try:
+        yield renderCamera
+    finally:
+        _activeCamera = previous
+
+# Public methods for moving and rotating the scene, through the default camera
 def translate(x: float, y: float, z: float) -> None:
-    global GLOBAL_POSITION
-    GLOBAL_POSITION += Vector3(x, y, z)
+    camera.translate(x, y, z)
 
 def rotateX(angle: float) -> None:
-    global GLOBAL_ROTATION
-    GLOBAL_ROTATION.x += angle
+    camera.rotateX(angle)
 
 def rotateY(angle: float) -> None:
-    global GLOBAL_ROTATION
-    GLOBAL_ROTATION.y += angle
+    camera.rotateY(angle)
 
 def rotateZ(angle: float) -> None:
-    global GLOBAL_ROTATION
-    GLOBAL_ROTATION.z += angle
+    camera.rotateZ(angle)
 
 def rotate(angleX: float, angleY: float, angleZ: float) -> None:
-    global GLOBAL_ROTATION
-    GLOBAL_ROTATION += Vector3(angleX, angleY, angleZ)
+    camera.rotate(angleX, angleY, angleZ)
 
 def changeZoom(diff: float) -> None:
-    global GLOBAL_POSITION
-    GLOBAL_POSITION.z = clamp(GLOBAL_POSITION.z - diff * zoomStep, 1, 1e10)
+    camera.zoom(diff * zoomStep)
 
 def main():
-    global positionAdd, rotationAdd, GLOBAL_ROTATION, GLOBAL_POSITION
+    global positionAdd, rotationAdd
+    window = getWindow()
     # Objects
-    objects: list[BaseObject] = []
+    scene = Scene()
     faceColors = [
         RED,
         GREEN,
@@ -480,8 +1216,8 @@ def main():
         "images/lagarta.jpg",
         "images/lagarta.jpg",
     ]
-    # objects.append(Cube(Vector3(WIDTH/2, HEIGHT/2, 1), 400, BLACK, edgeThickness=2, faceColors=faceColors, faceTextures=lagartaTextures))
-    # objects.append(Sphere(color=RED, pos=Vector3(0, 0, 3), radius=150, resolution=25, edgeThickness=1))
+    # scene.add(Cube(Vector3(WIDTH/2, HEIGHT/2, 1), 400, BLACK, edgeThickness=2, faceColors=faceColors, faceTextures=lagartaTextures))
+    # scene.add(Sphere(color=RED, pos=Vector3(0, 0, 3), radius=150, resolution=25, edgeThickness=1))
 
     # Import shape info
     import objects_info.shape
@@ -502,7 +1238,7 @@ def main():
     ]
 
     # Add to list
-    # objects.append(shapeObj)
+    # scene.add(shapeObj)
 
     # Read vertex data from .obj file
     from objects_info.read_obj import readObj
@@ -520,12 +1256,15 @@ def main():
     fileObject = BaseObject(Vector3(WIDTH/2, HEIGHT/2, 3), color=RED, faces=faces, faceColors=faceColorsFile)
     fileObject.points = vertices
     fileObject.size = 100
+    fileObject.buildLevelsOfDetail()
 
-    objects.append(fileObject)
+    scene.add(fileObject)
 
     # States
     leftButtonDown = False
     rightButtonDown = False
+    # Keeps what was drawn last frame, so only what changed is redrawn
+    renderer = Renderer(window)
 
     dt = 1000/FPS
     while True:
@@ -542,16 +1281,16 @@ def main():
             elif event.type == MOUSEBUTTONUP:
                 mouseDown = False
             elif event.type == MOUSEWHEEL:
-                GLOBAL_POSITION.z = clamp(GLOBAL_POSITION.z - event.y * zoomStep, 1, 1e10)
+                changeZoom(event.y)
             elif event.type == MOUSEMOTION:
                 if leftButtonDown:
                     # If left button is pressed, move position
                     positionAdd = Vector3(event.rel[0], event.rel[1], 0)
-                    GLOBAL_POSITION += Vector3(event.rel[0], event.rel[1], 0)
+                    camera.translate(event.rel[0], event.rel[1], 0)
                 if rightButtonDown:
                     # If right button is pressed, rotate world
                     rotationAdd = Vector3(event.rel[1], -event.rel[0], 0)
-                    GLOBAL_ROTATION += Vector3(event.rel[1], event.rel[0], 0)
+                    camera.rotate(event.rel[1], event.rel[0], 0)
             else:
                 # Reset position and rotation adds
                 positionAdd, rotationAdd = Vector3(0, 0, 0), Vector3(0, 0, 0)
@@ -560,8 +1299,6 @@ def main():
         left, middle, right = pygame.mouse.get_pressed()
         leftButtonDown, rightButtonDown = left, right
 
-        window.fill(WHITE)
-
         # Lerp global position and rotation offsets towards zero
         # Position
         if positionAdd.length_squared() < .01:
@@ -576,32 +1313,31 @@ def main():
 
         # Add global position and rotation
         if addPosition and not autoResetGlobalPosition and not leftButtonDown and not rightButtonDown and positionAdd.length_squared() > 0:
-            GLOBAL_POSITION += positionAdd * .1
+            camera.position += positionAdd * .1
         if addRotation and not autoResetGlobalRotation and not rightButtonDown and not leftButtonDown and rotationAdd.length_squared() > 0:
-            GLOBAL_ROTATION += rotationAdd * .1
+            camera.rotation += rotationAdd * .1
 
         # Reset global position and rotation
-        if not leftButtonDown and autoResetGlobalPosition and GLOBAL_POSITION != Vector3(0, 0, 0):
-            if GLOBAL_POSITION.length_squared() < 1:
-                GLOBAL_POSITION = Vector3(0, 0, GLOBAL_POSITION.z)
+        if not leftButtonDown and autoResetGlobalPosition and camera.position != Vector3(0, 0, 0):
+            if camera.position.length_squared() < 1:
+                camera.position = Vector3(0, 0, camera.position.z)
             else:
-                GLOBAL_POSITION = GLOBAL_POSITION.lerp(Vector3(0, 0, GLOBAL_POSITION.z), positionResetLerp)
+                camera.position = camera.position.lerp(Vector3(0, 0, camera.position.z), positionResetLerp)
 
-        if not rightButtonDown and autoResetGlobalRotation and GLOBAL_ROTATION != Vector3(0, 0, 0):
-            if GLOBAL_ROTATION.length_squared() < .5:
-                GLOBAL_ROTATION = Vector3(0, 0, 0)
+        if not rightButtonDown and autoResetGlobalRotation and camera.rotation != Vector3(0, 0, 0):
+            if camera.rotation.length_squared() < .5:
+                camera.rotation = Vector3(0, 0, 0)
             else:
-                GLOBAL_ROTATION = GLOBAL_ROTATION.lerp(Vector3(0, 0, 0), rotationResetLerp)
+                camera.rotation = camera.rotation.lerp(Vector3(0, 0, 0), rotationResetLerp)
 
-        # Draw objects
-        for obj in objects:
-            obj.draw(paintFaces=True, drawEdges=False, drawTextures=False)
+        # Draw the objects that changed
+        rects = renderer.renderDirty(scene, WHITE, paintFaces=True, drawEdges=False, drawTextures=False)
 
         # Show FPS
         pygame.display.set_caption(f"3D Rendering | FPS: {clock.get_fps():.0f}")
 
-        # Update screen
-        pygame.display.update()
+        # Update the changed areas of the screen, if any
+        renderer.present(rects)
         clock.tick(FPS)
 
     '''
@@ -6,9 +6,15 @@ from pygame.math import Vector2, Vector3
 from random import randint
 from math import cos, pi, sin, radians, inf
 from time import time
+from collections import deque
+import numpy as np
 import rendering3d
+import objects_info.cube
+from scene_graph import Node
+from quaternion import Quaternion
+from cube_state import CubeState
 
-rendering3d.orthographicProjection = False
+rendering3d.camera.orthographic = False
 
 pygame.init()
 WIDTH = 800
@@ -25,29 +31,55 @@ GREEN = (0, 255, 0)
 YELLOW = (255, 255, 0)
 ORANGE = (255, 127, 0)
 
-def sortcubes(cubes: list[rendering3d.Cube]):
-    for i in range(len(cubes)):
-        for j in range(0, len(cubes) - i - 1):
-            if cubes[j].pos.z < cubes[j + 1].pos.z:
-                temp = cubes[j]
-                cubes[j] = cubes[j+1]
-                cubes[j+1] = temp
-
 def drawText(text: str, pos: Vector2, fontSize: int=18, fontType: str="comicsans", bold: bool=False,
              italic: bool=False, antiAlias: bool=False, textColor: tuple=BLACK, bgColor: tuple=None,
-             centerX: float=0, centerY: float=0, surface: pygame.Surface=window):
+             centerX: float=0, centerY: float=0, surface: pygame.Surface=window) -> pygame.Rect:
     font = pygame.font.SysFont(fontType, fontSize, bold, italic)
     textSurface = font.render(str(text), antiAlias, textColor, bgColor)
     textRect = textSurface.get_rect()
-    surface.blit(textSurface, [pos.x + (textRect.width/2) * centerX, pos.y + (textRect.height/2) * centerY])
+    return surface.blit(textSurface, [pos.x + (textRect.width/2) * centerX, pos.y + (textRect.height/2) * centerY])
+
+def smoothStep(t: float) -> float:
+    # Eases in and out of every turn
+    return t * t * (3 - 2 * t)
+
+def getShortestTurns(turns: int) -> int:
+    # Same turn in -1, 0, 1 or 2 quarter turns
+    return (turns + 1) % 4 - 1
 
 class RubiksCube:
+    '''
+    The cube's state is a CubeState (the color of every sticker), changed only by whole quarter turns, and the
+    cubies are drawn from it: every cubie stays at its grid position and gets the colors of the stickers on it.
+    Cubies are scene graph nodes under the cube's root node; while a slice is turning, its cubies are moved under a
+    pivot node and only that pivot rotates. The turn is applied to the state, and the cubies moved back, once the
+    slice is at a quarter turn or another slice turns.
+    Queued moves (see queueMove) are animated by update, one after the other'''
+
+    # Space between neighbouring cubies, relative to a cubie's width
+    CUBIE_GAP = .05
+    # Seconds an animated quarter turn takes
+    TURN_TIME = .2
+
     def __init__(self, pos: Vector3, cubieSize: float, dimensions: int=3) -> None:
         self.pos = pos
         self.cubieSize = cubieSize
         self.dimensions = dimensions
         self.rotation = Vector3(0, 0, 0)
-        self.cubes: list[list[list[rendering3d.Cube]]] = []
+        self.state = CubeState(dimensions)
+
+        # Cubies are 2 units wide (see objects_info/cube.py). The root scales the whole cube down to about the same
+        # size as a single cube, and the cubies are drawn at dimensions times the size to make up for it
+        self.spacing = 2 * (1 + self.CUBIE_GAP)
+        self.root = Node(scale=1 / self.dimensions)
+        self.pivot = Node(parent=self.root)
+        # Axis, index and angle (degrees) of the slice currently parented to the pivot
+        self.activeSlice: tuple[int, int] = None
+        self.sliceAngle = 0
+        # Moves waiting to be animated as [axis, index, turns], and the one being animated as
+        # [axis, index, turns, start angle, elapsed seconds]
+        self.moveQueue: deque[list[int]] = deque()
+        self.animation: list = None
 
         self.faceColors = [
             RED,
@@ -57,99 +89,194 @@ class RubiksCube:
             YELLOW,
             ORANGE,
         ]
-        for x in range(self.dimensions):
-            xList: list[list[rendering3d.Cube]] = []
-            for y in range(self.dimensions):
-                yList: list[rendering3d.Cube] = []
-                for z in range(self.dimensions):
-                    cubePos = Vector3(self.pos.x - self.cubieSize/2 + x * self.cubieSize/2, self.pos.y - self.cubieSize/2 +  y * self.cubieSize/2, self.pos.z - self.cubieSize/2 +  z * self.cubieSize/2)
-                    cube = rendering3d.Cube(cubePos, self.cubieSize, faceColors=self.faceColors)
-                    yList.append(cube)
-                    #self.cubes.append(cube)
-                xList.append(yList)
-            self.cubes.append(xList)
+        # Sticker colors by color index, with the inside of the cube last (for index -1)
+        self.palette = np.array(self.faceColors + [BLACK], dtype=np.uint8)
+
+        # Grid position of every cubie, x major, and the node placing it inside the cube
+        grid = np.arange(self.dimensions)
+        self.grid = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1).reshape(-1, 3)
+        self.cubies = [Node(self.getCubiePosition(x, y, z), parent=self.root) for x, y, z in self.grid.tolist()]
+
+        # All cubies are drawn as instances of one cube mesh, placed by their nodes' world matrices
+        self.instances = rendering3d.InstancedObject(Vector3(self.pos), objects_info.cube.vertices, objects_info.cube.faces,
+                                                     size=self.cubieSize * self.dimensions, faceColors=self.faceColors)
+        self._instanceVersions: tuple[int, ...] = None
+        self._instanceStickers: np.ndarray = None
+
+    def getCubiePosition(self, x: int, y: int, z: int) -> Vector3:
+        center = (self.dimensions - 1) / 2
+        return Vector3(x - center, y - center, z - center) * self.spacing
 
     def rotateCubeX(self, angle: float) -> None:
-        pass
+        self.root.rotateX(angle)
 
     def rotateCubeY(self, angle: float) -> None:
-        pass
+        self.root.rotateY(angle)
 
     def rotateCubeZ(self, angle: float) -> None:
-        pass
+        self.root.rotateZ(angle)
+
+    def releaseSlice(self) -> None:
+        # Apply the turn to the state, snapped to whole quarter turns, and put the cubies back in place
+        if self.activeSlice is not None:
+            axis, index = self.activeSlice
+            self.state.turn(axis, index, round(self.sliceAngle / 90))
+            for node in list(self.pivot.children):
+                node.orientation = Quaternion()
+                self.root.addChild(node)
+
+        self.pivot.orientation = Quaternion()
+        self.activeSlice = None
+        self.sliceAngle = 0
+
+    def grabSlice(self, axis: int, index: int) -> None:
+        # Parents the slice's cubies to the pivot, releasing the last slice first
+        if self.activeSlice != (axis, index):
+            self.releaseSlice()
+            for cubie in np.flatnonzero(self.grid[:, axis] == index).tolist():
+                self.pivot.addChild(self.cubies[cubie])
+            self.activeSlice = (axis, index)
+
+    def setSliceAngle(self, angle: float) -> None:
+        # Set from the total angle rather than added up, so the pivot doesn't drift
+        axis, _ = self.activeSlice
+        self.pivot.orientation = Quaternion.fromAxisAngle(Vector3([1 if i == axis else 0 for i in range(3)]), radians(angle))
+        self.sliceAngle = angle
+
+    def rotateSlice(self, axis: int, index: int, angle: float) -> None:
+        '''
+        Turns the slice at the given grid index along an axis (0, 1, 2 for x, y, z) by angle degrees, right away
+        (queued moves are finished first). Turning the same slice again only updates the pivot, until it reaches
+        a quarter turn'''
+
+        self.finishMoves()
+        self.grabSlice(axis, index)
+        self.setSliceAngle(self.sliceAngle + angle)
+        if self.sliceAngle % 90 == 0:
+            self.releaseSlice()
+
+    def queueMove(self, axis: int, index: int, turns: int=1) -> None:
+        '''
+        Queues an animated turn of a slice by quarter turns (negative turns go the other way).
+        Moves of the same slice in a row are merged into one, e.g. two quarter turns into a half turn, and a move
+        cancelling the last one removes both'''
+
+        turns = getShortestTurns(turns)
+        if self.moveQueue and self.moveQueue[-1][:2] == [axis, index]:
+            self.moveQueue[-1][2] = getShortestTurns(self.moveQueue[-1][2] + turns)
+            if self.moveQueue[-1][2] == 0:
+                self.moveQueue.pop()
+        elif not self.moveQueue and self.animation is not None and self.animation[:2] == [axis, index]:
+            # The slice is already turning: turn on to the new target from where it is now
+            self.animation[2] = getShortestTurns(self.animation[2] + turns)
+            self.animation[3] = self.sliceAngle
+            self.animation[4] = 0
+        elif turns != 0:
+            self.moveQueue.append([axis, index, turns])
+
+    def isAnimating(self) -> bool:
+        return self.animation is not None or len(self.moveQueue) > 0
+
+    def update(self, dt: float) -> None:
+        '''
+        Advances the queued moves by dt seconds. Time left over when a move ends goes to the next one, so the
+        animation keeps the same speed whatever the frame rate'''
+
+        while dt > 0 and self.isAnimating():
+            if self.animation is None:
+                axis, index, turns = self.moveQueue.popleft()
+                self.grabSlice(axis, index)
+                self.animation = [axis, index, turns, self.sliceAngle, 0]
+
+            _, _, turns, startAngle, elapsed = self.animation
+            target = turns * 90
+            duration = self.TURN_TIME * max(abs(target - startAngle) / 90, .5)
+            elapsed += dt
+            if elapsed < duration:
+                self.setSliceAngle(startAngle + (target - startAngle) * smoothStep(elapsed / duration))
+                self.animation[4] = elapsed
+                break
+
+            self.setSliceAngle(target)
+            self.releaseSlice()
+            self.animation = None
+            dt = elapsed - duration
+
+    def finishMoves(self) -> None:
+        # Applies the move being animated and every queued move at once
+        if self.animation is not None:
+            self.setSliceAngle(self.animation[2] * 90)
+            self.releaseSlice()
+            self.animation = None
+        while self.moveQueue:
+            axis, index, turns = self.moveQueue.popleft()
+            self.state.turn(axis, index, turns)
 
     def rotateRowX(self, angle: float, xIdx: int=0) -> None:
         self.rotation.x += angle
-        # Update all cubes
-        cosA = cos(radians(angle))
-        sinA = sin(radians(angle))
-        for y in range(self.dimensions):
-            for z in range(self.dimensions):
-                cube = self.cubes[xIdx][y][z]
-                cube.rotateX(angle)
-                posY = cosA * (cube.pos.y - self.pos.y) - sinA * (cube.pos.z - self.pos.z) + self.pos.y
-                posZ = sinA * (cube.pos.y - self.pos.y) + cosA * (cube.pos.z - self.pos.z) + self.pos.z
-                cube.pos.y = posY
-                cube.pos.z = posZ
+        self.rotateSlice(0, xIdx, angle)
 
     def rotateRowY(self, angle: float, yIdx: int=0) -> None:
         self.rotation.y += angle
-        # Update all cubes
-        cosA = cos(radians(angle))
-        sinA = sin(radians(angle))
-        for x in range(self.dimensions):
-            for z in range(self.dimensions):
-                cube = self.cubes[x][yIdx][z]
-                cube.rotateY(-angle)
-                posX = sinA * (cube.pos.x - self.pos.x) - cosA * (cube.pos.z - self.pos.z) + self.pos.x
-                posZ = cosA * (cube.pos.x - self.pos.x) + sinA * (cube.pos.z - self.pos.z) + self.pos.z
-                cube.pos.x = posX
-                cube.pos.z = posZ
+        self.rotateSlice(1, yIdx, angle)
 
     def rotateRowZ(self, angle: float, zIdx: int=0) -> None:
         self.rotation.z += angle
-        # Update all cubes
-        cosA = cos(radians(angle))
-        sinA = sin(radians(angle))
-        for x in range(self.dimensions):
-            for y in range(self.dimensions):
-                cube = self.cubes[x][y][zIdx]
-                cube.rotateZ(angle)
-                posX = cosA * (cube.pos.x - self.pos.x) - sinA * (cube.pos.y - self.pos.y) + self.pos.x
-                posY = sinA * (cube.pos.x - self.pos.x) + cosA * (cube.pos.y - self.pos.y) + self.pos.y
-                cube.pos.x = posX
-                cube.pos.y = posY
+        self.rotateSlice(2, zIdx, angle)
 
     def updateCubes(self) -> None:
-        for x in range(self.dimensions):
-            for y in range(self.dimensions):
-                for z in range(self.dimensions):
-                    self.cubes[x][y][z].pos = Vector3(self.pos.x - self.cubieSize/2 + x * self.cubieSize/2, self.pos.y - self.cubieSize/2 +  y * self.cubieSize/2, self.pos.z +  z * self.cubieSize/2)
-
-    def getCubes(self) -> list[rendering3d.Cube]:
-        cubes: list[rendering3d.Cube] = []
-        for x in range(self.dimensions):
-            for y in range(self.dimensions):
-                for z in range(self.dimensions):
-                    cubes.append(self.cubes[x][y][z])
-        return cubes
+        # Back to the solved state
+        self.moveQueue.clear()
+        self.animation = None
+        self.releaseSlice()
+        self.state.reset()
+
+    def updateInstances(self) -> None:
+        '''
+        Rebuilds the instances after the stickers changed, otherwise only moves the cubies whose nodes changed,
+        e.g. the slice being turned; the others keep their transformed and projected vertices'''
+
+        matrices = [node.getWorldMatrix() for node in self.cubies]
+        versions = tuple(node.worldVersion for node in self.cubies)
+        # Moves replace the sticker array, so holding on to it is enough to notice them
+        if self._instanceStickers is not self.state.stickers:
+            self.instances.setInstances(np.array([matrix.toArray() for matrix in matrices]),
+                                        self.palette[self.state.getFaceColors(self.grid)])
+            self._instanceStickers = self.state.stickers
+        elif versions != self._instanceVersions:
+            moved = [i for i, (version, last) in enumerate(zip(versions, self._instanceVersions)) if version != last]
+            self.instances.moveInstances(moved, np.array([matrices[i].toArray() for i in moved]))
+        self._instanceVersions = versions
+
+    def getCubies(self) -> list[Node]:
+        return self.cubies
 
     def draw(self, surface: pygame.Surface=window, drawEdges: bool=True) -> None:
         # self.rotateRowX(1, 0)
         # self.rotateRowY(1, 0)
         # self.rotateRowZ(1, 0)
 
-        cubes = self.getCubes()
-        sortcubes(cubes)
+        self.updateInstances()
+        self.instances.draw(surface, drawEdges=drawEdges, paintFaces=True)
 
-        for cube in cubes:
-            cube.draw(surface, drawEdges=drawEdges, paintFaces=True)
+    def redraw(self, renderer: rendering3d.Renderer, background: tuple, drawEdges: bool=True,
+               extraRects: list[pygame.Rect]=()) -> list[pygame.Rect]:
+        # Redraws the cube only if it changed since the last call (see Renderer.renderDirty)
+        self.updateInstances()
+        return renderer.renderDirty([self.instances], background, drawEdges=drawEdges, paintFaces=True,
+                                    extraRects=extraRects)
 
 rubiksCube = RubiksCube(Vector3(WIDTH/2, HEIGHT/2, 0), 150)
 #rubiksCube.rotateRowX(5, 0)
 #rubiksCube.rotateRowX(5, 1)
 #rubiksCube.rotateRowX(5, 2)
 
+# Keeps what was drawn last frame, so only what changed is redrawn
+renderer = rendering3d.Renderer(window)
+fpsText = ""
+fpsRect = pygame.Rect(0, 0, 0, 0)
+dt = 0
+
 while True:
     # Mouse input
     left, middle, right = pygame.mouse.get_pressed()
@@ -170,36 +297,35 @@ while True:
                 rendering3d.rotate(event.rel[1], event.rel[0], 0)
         elif event.type == KEYDOWN:
             if event.key == K_q:
-                rubiksCube.rotateRowX(90, 0)
+                rubiksCube.queueMove(0, 0)
             elif event.key == K_w:
-                rubiksCube.rotateRowX(90, 1)
+                rubiksCube.queueMove(0, 1)
             elif event.key == K_e:
-                rubiksCube.rotateRowX(90, 2)
+                rubiksCube.queueMove(0, 2)
             elif event.key == K_a:
-                rubiksCube.rotateRowZ(90, 0)
+                rubiksCube.queueMove(2, 0)
             elif event.key == K_s:
-                rubiksCube.rotateRowZ(90, 1)
+                rubiksCube.queueMove(2, 1)
             elif event.key == K_d:
-                rubiksCube.rotateRowZ(90, 2)
+                rubiksCube.queueMove(2, 2)
             elif event.key == K_z:
-                rubiksCube.rotateRowY(90, 0)
+                rubiksCube.queueMove(1, 0)
             elif event.key == K_x:
-                rubiksCube.rotateRowY(90, 1)
+                rubiksCube.queueMove(1, 1)
             elif event.key == K_c:
-                rubiksCube.rotateRowY(90, 2)
+                rubiksCube.queueMove(1, 2)
 
-    window.fill(WHITE)
-    
-    rubiksCube.draw(surface=window, drawEdges=True)
+    rubiksCube.update(dt)
 
-    # Show FPS
-    drawText(f"FPS: {clock.get_fps():.0f}", Vector2(), fontSize=15)
+    # The area under the FPS text is redrawn when the text changes
+    text = f"FPS: {clock.get_fps():.0f}"
+    rects = rubiksCube.redraw(renderer, WHITE, drawEdges=True, extraRects=[fpsRect] if text != fpsText else [])
 
-    pygame.display.update()
-    clock.tick(FPS)
+    # Show FPS, again if the cube was redrawn under it
+    if text != fpsText or fpsRect.collidelist(rects) != -1:
+        fpsText = text
+        fpsRect = drawText(fpsText, Vector2(), fontSize=15)
+        rects.append(fpsRect)
 
-'''
-TODO:
- - Botar pra funcionar com orthographic projection (aumentar o espaçamento entre os cubies)
- - Aplicar rotação do próprio rubiksCube para cada cubo
-'''
\ No newline at end of file
+    renderer.present(rects)
+    dt = clock.tick(FPS) / 1000
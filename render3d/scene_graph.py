@@ -0,0 +1,119 @@
+from __future__ import annotations
+from pygame.math import Vector3
+from math import radians
+from itertools import count
+from matrix import Mat4, compose
+from quaternion import Quaternion
+import sys
+sys.dont_write_bytecode = True
+
+# Every recomputed world matrix gets a new version, so objects can tell if their node moved
+_worldVersions = count(1)
+
+class Node:
+    '''
+    Scene graph node: a position, quaternion orientation and uniform scale relative to its parent.
+    World matrices are cached and only recomputed after the node or one of its ancestors changed'''
+
+    def __init__(self, position: Vector3=None, orientation: Quaternion=None, scale: float=1, parent: Node=None) -> None:
+        self.parent: Node = None
+        self.children: list[Node] = []
+        self._position = Vector3(position) if position is not None else Vector3(0, 0, 0)
+        self._orientation = orientation or Quaternion()
+        self._scale = scale
+        self._localMatrix: Mat4 = None
+        self._worldMatrix: Mat4 = None
+        self._dirty = True
+        self.worldVersion = 0
+        if parent is not None:
+            parent.addChild(self)
+
+    @property
+    def position(self) -> Vector3:
+        # A copy, so changes have to go through the setter
+        return Vector3(self._position)
+
+    @position.setter
+    def position(self, position: Vector3) -> None:
+        self._position = Vector3(position)
+        self.invalidateLocal()
+
+    @property
+    def orientation(self) -> Quaternion:
+        return self._orientation
+
+    @orientation.setter
+    def orientation(self, orientation: Quaternion) -> None:
+        self._orientation = orientation
+        self.invalidateLocal()
+
+    @property
+    def scale(self) -> float:
+        return self._scale
+
+    @scale.setter
+    def scale(self, scale: float) -> None:
+        self._scale = scale
+        self.invalidateLocal()
+
+    def translate(self, x: float, y: float, z: float) -> None:
+        self.position = self._position + Vector3(x, y, z)
+
+    def rotate(self, axis: Vector3, angle: float) -> None:
+        # Rotate around an axis of the parent's space, in degrees
+        self.orientation = (Quaternion.fromAxisAngle(axis, radians(angle)) * self._orientation).normalize()
+
+    def rotateX(self, angle: float) -> None:
+        self.rotate(Vector3(1, 0, 0), angle)
+
+    def rotateY(self, angle: float) -> None:
+        self.rotate(Vector3(0, 1, 0), angle)
+
+    def rotateZ(self, angle: float) -> None:
+        self.rotate(Vector3(0, 0, 1), angle)
+
+    def addChild(self, child: Node) -> None:
+        if child.parent is not None:
+            child.parent.removeChild(child)
+        child.parent = self
+        self.children.append(child)
+        child.markDirty()
+
+    def removeChild(self, child: Node) -> None:
+        self.children.remove(child)
+        child.parent = None
+        child.markDirty()
+
+    def invalidateLocal(self) -> None:
+        self._localMatrix = None
+        self.markDirty()
+
+    def markDirty(self) -> None:
+        # A clean node always has clean ancestors, so a dirty node's subtree is already dirty
+        if self._dirty:
+            return
+        self._dirty = True
+        for child in self.children:
+            child.markDirty()
+
+    def getLocalMatrix(self) -> Mat4:
+        if self._localMatrix is None:
+            self._localMatrix = compose(
+                Mat4.translation(self._position.x, self._position.y, self._position.z),
+                Mat4.fromMat3(self._orientation.toMat3()),
+                Mat4.scale(self._scale),
+            )
+        return self._localMatrix
+
+    def getWorldMatrix(self) -> Mat4:
+        if self._dirty:
+            if self.parent is None:
+                self._worldMatrix = self.getLocalMatrix()
+            else:
+                self._worldMatrix = self.parent.getWorldMatrix() * self.getLocalMatrix()
+            self._dirty = False
+            self.worldVersion = next(_worldVersions)
+        return self._worldMatrix
+
+    def getWorldPosition(self) -> Vector3:
+        return self.getWorldMatrix().getTranslation()
@@ -0,0 +1,56 @@
+import os
+import sys
+sys.dont_write_bytecode = True
+os.environ.setdefault("RENDER3D_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import argparse
+import rendering3d
+import rasterizer
+from rendering3d import Renderer
+from benchmark import getMeshes, benchmark
+
+FRAMES = 20
+TILES = (1, 2, 4, 8)
+
+def getArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Renders meshes with the z-buffer backend split into more and more "
+                                                 "tiles and prints the raster time per frame and the speedup over one tile")
+    parser.add_argument("--frames", type=int, default=FRAMES, help=f"frames per run (default {FRAMES})")
+    parser.add_argument("--tiles", type=int, action="append", help=f"tile count, can be repeated (default {TILES})")
+    parser.add_argument("--executor", action="append", choices=rasterizer.EXECUTORS,
+                        help="pool to run the tiles in, can be repeated (default: all)")
+    parser.add_argument("--mesh", action="append", help="only run meshes whose name contains this, can be repeated "
+                                                        "(default: the biggest sphere and voxel grid)")
+    parser.add_argument("--shading", default="none", choices=rendering3d.SHADING_MODES)
+    return parser.parse_args()
+
+def main():
+    arguments = getArguments()
+    tileCounts = arguments.tiles or list(TILES)
+    executors = arguments.executor or list(rasterizer.EXECUTORS)
+    meshes = arguments.mesh or ["resolution=100", "10x10x10"]
+    rendering3d.shading = arguments.shading
+
+    surface = rendering3d.getWindow()
+    print(f"{os.cpu_count()} CPUs, {arguments.frames} frames per run")
+    print(f"{'mesh':<24}{'executor':>10}{'tiles':>7}{'raster ms':>11}{'frame ms':>10}{'speedup':>9}")
+    for name, obj in getMeshes():
+        if not any(part in name for part in meshes):
+            continue
+        for executor in executors:
+            baseline = None
+            for tiles in tileCounts:
+                rendering3d.rasterTiles = tiles
+                rendering3d.rasterExecutor = executor
+                timings = benchmark(obj, Renderer(surface, "zbuffer"), arguments.frames)
+                # Tiles are rasterized when the buffer is blitted
+                raster = timings["raster"] + timings["blit"]
+                baseline = baseline or raster
+                print(f"{name:<24}{executor:>10}{tiles:>7}{raster:>11.2f}{timings['total']:>10.2f}{baseline / raster:>8.2f}x")
+
+    # Stops the pool and frees the shared buffers
+    rendering3d.rasterTiles = 1
+    rendering3d.getZBuffer(surface)
+
+if __name__ == "__main__":
+    main()
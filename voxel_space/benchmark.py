@@ -0,0 +1,121 @@
+import os
+import sys
+sys.dont_write_bytecode = True
+# The benchmark doesn't need a visible window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import argparse
+import glob
+import re
+from time import perf_counter
+import numpy as np
+import terrain
+from terrain import StripRenderer
+import main as voxelSpace
+
+pathFile = os.path.dirname(__file__)
+
+FRAMES = 10
+QUALITIES = (.5, 1, 2)
+# Dense enough that more steps hardly change the image, what the other settings are compared to
+REFERENCE = ("linear", 2)
+
+def getArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Times the voxel space renderer on every bundled map for each step "
+                                                 "schedule and quality, with and without the early-out, or with "
+                                                 "--scaling for 1 to N parallel workers")
+    parser.add_argument("--frames", type=int, default=FRAMES, help=f"frames per run, turning all the way around (default {FRAMES})")
+    parser.add_argument("--map", type=int, action="append", help="only this map pair, can be repeated")
+    parser.add_argument("--schedule", choices=terrain.STEP_SCHEDULES, action="append", help="can be repeated (default all)")
+    parser.add_argument("--quality", type=float, action="append", help=f"can be repeated (default {QUALITIES})")
+    parser.add_argument("--horizon", type=float, default=voxelSpace.HORIZON_HEIGHT,
+                        help="screen row of the horizon, lower numbers look down at the terrain")
+    parser.add_argument("--camera-height", type=float, default=voxelSpace.CAMERA_HEIGHT)
+    parser.add_argument("--distance", type=float, default=voxelSpace.RENDER_DISTANCE, help="how far the terrain is drawn")
+    parser.add_argument("--mip-levels", type=int, default=terrain.MIP_LEVELS, help="1 samples the full size maps only")
+    parser.add_argument("--scaling", action="store_true", help="time strip rendering with 1 to --workers workers instead")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="most workers with --scaling (default one per CPU)")
+    parser.add_argument("--executor", choices=terrain.EXECUTORS, action="append", help="can be repeated (default all)")
+    return parser.parse_args()
+
+def getMapPairs() -> list[tuple[int, str, str]]:
+    # Every bundled color map with the height map of the same number
+    pairs: list[tuple[int, str, str]] = []
+    for colorPath in sorted(glob.glob(os.path.join(pathFile, "maps", "color*.png"))):
+        number = int(re.search(r"(\d+)\.png$", colorPath).group(1))
+        heightPath = os.path.join(pathFile, "maps", f"height{number}.png")
+        if os.path.exists(heightPath):
+            pairs.append((number, os.path.relpath(colorPath, pathFile), os.path.relpath(heightPath, pathFile)))
+    return pairs
+
+def renderFrames(colorMaps: list[np.ndarray], heightMaps: list[np.ndarray], frames: int, horizon: float,
+                 distance: float, schedule: str, quality: float, earlyOut: bool=True,
+                 renderer: StripRenderer=None) -> tuple[float, list[np.ndarray]]:
+    # Milliseconds per frame turning the camera around in place, and the frames (just the last one with a renderer,
+    # which reuses its frame)
+    images: list[np.ndarray] = []
+    start = perf_counter()
+    for frame in range(frames):
+        voxelSpace.ROTATION = 360 * frame / frames
+        images.append(voxelSpace.renderMap(
+            colorMaps, heightMaps, voxelSpace.skyPixels, voxelSpace.POS, heightScale=voxelSpace.HEIGHT_SCALE,
+            horizon=horizon, distance=distance, distanceScale=voxelSpace.DISTANCE_SCALE,
+            schedule=schedule, quality=quality, earlyOut=earlyOut, renderer=renderer))
+    elapsed = (perf_counter() - start) * 1000 / frames
+    return elapsed, images[-1:] if renderer is not None else images
+
+def printScaling(arguments: argparse.Namespace, number: int, settings: tuple) -> None:
+    # Frame times splitting the screen into as many strips as workers, against rendering it in the main thread
+    schedule = (arguments.schedule or ["accelerating"])[0]
+    quality = (arguments.quality or [1])[0]
+    renderFrames(*settings[:2], 1, *settings[3:], schedule, quality)
+    serialTime, serialFrames = renderFrames(*settings, schedule, quality)
+    print(f"{number:<5}{'serial':>9}{1:>9}{serialTime:>9.1f}{1000 / serialTime:>7.1f}{1:>9.2f}x{'':>6}")
+    for executor in arguments.executor or terrain.EXECUTORS:
+        for workers in range(1, arguments.workers + 1):
+            renderer = StripRenderer((voxelSpace.WIDTH, voxelSpace.HEIGHT), workers, executor)
+            try:
+                # The first frame starts the workers (and shares the maps with processes)
+                renderFrames(*settings[:2], 1, *settings[3:], schedule, quality, renderer=renderer)
+                elapsed, frames = renderFrames(*settings, schedule, quality, renderer=renderer)
+                same = bool((frames[-1] == serialFrames[-1]).all())
+            finally:
+                renderer.close()
+            print(f"{number:<5}{executor:>9}{workers:>9}{elapsed:>9.1f}{1000 / elapsed:>7.1f}"
+                  f"{serialTime / elapsed:>9.2f}x{str(same):>6}")
+
+def main():
+    arguments = getArguments()
+    schedules = arguments.schedule or voxelSpace.STEP_SCHEDULES
+    qualities = arguments.quality or QUALITIES
+    voxelSpace.CAMERA_HEIGHT = arguments.camera_height
+    if arguments.scaling:
+        print(f"{voxelSpace.WIDTH}x{voxelSpace.HEIGHT}, {arguments.frames} frames per run, {os.cpu_count()} CPUs. "
+              f"same tells if the frame matches the serial one")
+        print(f"{'map':<5}{'executor':>9}{'workers':>9}{'ms':>9}{'fps':>7}{'speedup':>10}{'same':>6}")
+    else:
+        print(f"{voxelSpace.WIDTH}x{voxelSpace.HEIGHT}, {arguments.frames} frames per run, {arguments.mip_levels} mip "
+              f"levels. diff % is the share of pixels that differ from {REFERENCE[0]} steps at quality {REFERENCE[1]}")
+        print(f"{'map':<5}{'schedule':>13}{'quality':>9}{'steps':>7}{'ms':>9}{'early ms':>10}{'fps':>7}{'diff %':>8}")
+    for number, colorMapFile, heightMapFile in getMapPairs():
+        if arguments.map and number not in arguments.map:
+            continue
+        colorMap, heightMap = voxelSpace.loadMaps(colorMapFile, heightMapFile)
+        colorMaps = terrain.getMipmaps(colorMap, arguments.mip_levels)
+        heightMaps = terrain.getMipmaps(heightMap, arguments.mip_levels)
+        settings = (colorMaps, heightMaps, arguments.frames, arguments.horizon, arguments.distance)
+        if arguments.scaling:
+            printScaling(arguments, number, settings)
+            continue
+        _, reference = renderFrames(*settings, *REFERENCE, earlyOut=True)
+        for schedule in schedules:
+            for quality in qualities:
+                steps = len(terrain.getDepths(arguments.distance, schedule, quality))
+                fullTime, _ = renderFrames(*settings, schedule, quality, earlyOut=False)
+                earlyTime, images = renderFrames(*settings, schedule, quality, earlyOut=True)
+                diff = np.mean([(image != expected).mean() for image, expected in zip(images, reference)]) * 100
+                print(f"{number:<5}{schedule:>13}{quality:>9.2f}{steps:>7}{fullTime:>9.1f}{earlyTime:>10.1f}"
+                      f"{1000 / earlyTime:>7.1f}{diff:>8.2f}")
+
+if __name__ == "__main__":
+    main()
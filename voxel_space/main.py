@@ -5,7 +5,9 @@ from pygame.math import Vector2
 from random import randint
 from math import atan2, cos, floor, inf, radians, sin
 from time import time
-import os.path
+import os
+import numpy as np
+from terrain import MIP_LEVELS, STEP_SCHEDULES, PixelFormat, StripRenderer, View, getMipmaps, renderColumns
 
 pathFile = os.path.dirname(__file__)
 
@@ -24,40 +26,67 @@ GREEN = (0, 255, 0)
 YELLOW = (255, 255, 0)
 ORANGE = (255, 127, 0)
 
-# Function to load color and height maps
-def loadMaps(colorMapFile: str, heightMapFile: str) -> tuple[list[list[Color]], list[list[int]]]:
-    # Load surfaces
-    colorMap = pygame.image.load(os.path.join(pathFile, colorMapFile))
-    heightMap = pygame.image.load(os.path.join(pathFile, heightMapFile))
-
-    # Get sizes
-    colorMapSize = colorMap.get_size()
-    heightMapSize = heightMap.get_size()
-    heightMap = pygame.transform.scale(heightMap, colorMapSize)
-    print(colorMapSize, heightMapSize)
-
-    # Save height values
-    heightMapList: list[list[int]] = []
-    for y in range(heightMapSize[1]):
-        line: list[int] = []
-        for x in range(heightMapSize[0]):
-            line.append(heightMap.get_at((x, y))[0])
-
-        heightMapList.append(line)
+# Decoded maps are cached next to the images, so later runs memory-map them instead of decoding the PNGs
+MAP_CACHE_EXTENSION = ".npy"
+
+def isPowerOfTwo(n: int) -> bool:
+    return n > 0 and n & (n - 1) == 0
+
+def readMapArray(filePath: str, size: tuple[int, int], gray: bool) -> np.ndarray:
+    # Pixels of the image (scaled to size if given) as a (height, width, 3) uint8 array, or (height, width) with
+    # just the red channel for gray maps. Rows are y so every row is contiguous
+    surface = pygame.image.load(filePath)
+    if size is not None and surface.get_size() != size:
+        surface = pygame.transform.scale(surface, size)
+    pixels = pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+    return np.ascontiguousarray(pixels[..., 0] if gray else pixels)
+
+def loadMapArray(filePath: str, size: tuple[int, int]=None, gray: bool=False, useCache: bool=True) -> np.ndarray:
+    '''
+    Loads a map image into a uint8 array (see readMapArray). With useCache, the array is saved as a .npy file
+    next to the image and memory-mapped (read-only) on later loads, as long as it's newer than the image'''
+
+    if not useCache:
+        return readMapArray(filePath, size, gray)
+
+    cachePath = filePath + (f".{size[0]}x{size[1]}" if size is not None else "") + MAP_CACHE_EXTENSION
+    try:
+        if os.path.getmtime(cachePath) >= os.path.getmtime(filePath):
+            array = np.load(cachePath, mmap_mode="r")
+            if array.dtype == np.uint8 and (array.ndim == 2) == gray and (size is None or array.shape[:2] == size[::-1]):
+                return array
+    except (OSError, ValueError):
+        pass
+
+    array = readMapArray(filePath, size, gray)
+    try:
+        # Written to a temporary file and renamed, so a reader never sees a partial cache
+        temporaryPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(temporaryPath, "wb") as f:
+            np.save(f, array)
+        os.replace(temporaryPath, cachePath)
+    except OSError:
+        # Read-only location: just don't cache
+        pass
+    return array
 
-    # Save color values
-    colorMapList: list[list[tuple[int, int, int]]] = []
-    for y in range(colorMapSize[1]):
-        line: list[tuple[int, int, int]] = []
-        for x in range(colorMapSize[0]):
-            line.append(colorMap.get_at((x, y)))
+# Function to load color and height maps
+def loadMaps(colorMapFile: str, heightMapFile: str, useCache: bool=True) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns the color map as a (height, width, 3) uint8 array and the height map as a (height, width) uint8 array
+    scaled to the color map's size. Sizes must be powers of two, so coordinates wrap around with a mask'''
 
-        colorMapList.append(line)
+    colorMap = loadMapArray(os.path.join(pathFile, colorMapFile), useCache=useCache)
+    colorMapSize = (colorMap.shape[1], colorMap.shape[0])
+    if not all(isPowerOfTwo(side) for side in colorMapSize):
+        raise ValueError(f"{colorMapFile} is {colorMapSize[0]}x{colorMapSize[1]}, map sides must be powers of two")
+    heightMap = loadMapArray(os.path.join(pathFile, heightMapFile), colorMapSize, gray=True, useCache=useCache)
+    print(colorMapSize)
 
-    return colorMapList, heightMapList
+    return colorMap, heightMap
 
 def checkInput():
-    global moveDelta, rotationDelta, pitchDelta, heightDelta
+    global moveDelta, rotationDelta, pitchDelta, heightDelta, QUALITY, STEP_SCHEDULE, MIPMAPS
     for event in pygame.event.get():
         if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
             pygame.quit()
@@ -85,6 +114,17 @@ def checkInput():
                 print(POS)
             elif event.key == K_v:
                 print(ROTATION)
+            elif event.key in (K_MINUS, K_EQUALS):
+                # Fewer depth steps run faster, more look better far away
+                factor = QUALITY_FACTOR if event.key == K_EQUALS else 1 / QUALITY_FACTOR
+                QUALITY = clamp(QUALITY * factor, MIN_QUALITY, MAX_QUALITY)
+                renderFrame()
+            elif event.key == K_t:
+                STEP_SCHEDULE = STEP_SCHEDULES[(STEP_SCHEDULES.index(STEP_SCHEDULE) + 1) % len(STEP_SCHEDULES)]
+                renderFrame()
+            elif event.key == K_m:
+                MIPMAPS = not MIPMAPS
+                renderFrame()
         elif event.type == KEYUP:
             if event.key in (K_w, K_UP):
                 moveDelta += moveSpeed
@@ -113,78 +153,45 @@ def clamp(x, minimum, maximum):
     else:
         return x
 
-def getColorAt(colorMap: list[list[int]], x: int, y: int) -> int:
-    x = round(x) % len(colorMap[0])
-    y = round(y) % len(colorMap)
-
-    return colorMap[y][x]
-
-def getHeightAt(heightMap: list[list[int]], x: int, y: int) -> int:
-    # x = clamp(round(x), 0, len(heightMap[0])-1)
-    # y = clamp(round(y), 0, len(heightMap)-1)
-    x = round(x) % len(heightMap[0])
-    y = round(y) % len(heightMap)
-
-    return heightMap[y][x]
-
-def drawVerticalLine(posX: int, yTop: float, yBottom: float, color: tuple):
-    pygame.draw.line(window, color, (posX, yTop), (posX, yBottom))
-    # if posX % 400 == 0:
-    #     checkInput()
-    #     pygame.display.update()
-
-# Function to render a line
-def renderMap(colorMap: list[list[Color]], heightMap: list[list[int]],
-           point: Vector2, heightScale: float, horizon: float, distance: float, distanceScale: float):
-
-    mapSize = Vector2(len(colorMap[0])-1, len(colorMap)-1)
-    sinA = sin(radians(ROTATION))
-    cosA = cos(radians(ROTATION))
-
-    # Store highest Y values for each screen column
-    columnHeights: list[float] = [WIDTH] * WIDTH
-
-    dz = 1
-    z = 1
-    # for z in range(round(distance), 1, -RENDER_STEP):
-    while z < distance:
-        pLeft = Vector2(
-            (-cosA * z - sinA * z) + point.x,
-            ( sinA * z - cosA * z) + point.y)
-        pRight = Vector2(
-            ( cosA * z - sinA * z) + point.x,
-            (-sinA * z - cosA * z) + point.y)
-
-        # if pLeft.x < 0 or pLeft.x > mapSize.x or pLeft.y < 0 or pLeft.y > mapSize.y or pRight.x < 0 or pRight.x > mapSize.x or pRight.y < 0 or pRight.y > mapSize.y:
-        #     continue
-
-        dx = (pRight - pLeft).x / WIDTH
-        dy = (pRight - pLeft).y / WIDTH
-
-        for x in range(0, WIDTH):
-            # print(f"z={z}, x={x}")
-            heightOnScreen = (CAMERA_HEIGHT - getHeightAt(heightMap, pLeft.x, pLeft.y)) / 255 * heightScale / z * distanceScale + horizon
-            # print(getHeightAt(heightMap, pLeft.x, pLeft.y), heightOnScreen)
-            # heightOnScreen = maxHeight - getHeightAt(heightMap, pLeft.x, pLeft.y) * z / scaleHeight + horizon
-            drawVerticalLine(x, heightOnScreen, columnHeights[x], getColorAt(colorMap, pLeft.x, pLeft.y))
-            if heightOnScreen < columnHeights[x]:
-                columnHeights[x] = heightOnScreen
-            pLeft.x += dx
-            pLeft.y += dy
-
-        z += dz
-        dz += .01
+def getColorAt(colorMap: np.ndarray, x: float, y: float) -> np.ndarray:
+    # Map sizes are powers of two, so masking wraps around like a modulo (negative coordinates too)
+    return colorMap[round(y) & (colorMap.shape[0] - 1), round(x) & (colorMap.shape[1] - 1)]
+
+def getHeightAt(heightMap: np.ndarray, x: float, y: float) -> int:
+    return int(heightMap[round(y) & (heightMap.shape[0] - 1), round(x) & (heightMap.shape[1] - 1)])
+
+# Function to render the map
+def renderMap(colorMaps: list[np.ndarray], heightMaps: list[np.ndarray], sky: np.ndarray,
+              point: Vector2, heightScale: float, horizon: float, distance: float, distanceScale: float,
+              schedule: str="accelerating", quality: float=1, earlyOut: bool=True,
+              renderer: StripRenderer=None) -> np.ndarray:
+    '''
+    Renders the terrain over the sky from the current camera (see terrain.renderColumns) and returns the frame, both
+    (WIDTH, HEIGHT) arrays of pixels mapped to the window's format, ready for surfarray.blit_array.
+    With a renderer, strips of the screen are rendered in parallel and the frame is the renderer's own array'''
+
+    view = View(point.x, point.y, ROTATION, CAMERA_HEIGHT, horizon, heightScale, distance, distanceScale, schedule,
+                quality, earlyOut)
+    if renderer is not None:
+        return renderer.render(colorMaps, heightMaps, sky, pixelFormat, view)
+    frame = np.empty((WIDTH, HEIGHT), dtype=np.uint32)
+    renderColumns(frame, colorMaps, heightMaps, sky, pixelFormat, view, 0, WIDTH)
+    return frame
 
 def renderFrame():
-    # window.fill(WHITE)
-    window.blit(backgroundSurface, (0, 0))
-    renderMap(colorMap, heightMap, POS, heightScale=HEIGHT_SCALE, horizon=HORIZON_HEIGHT, distance=RENDER_DISTANCE, distanceScale=DISTANCE_SCALE)
+    levels = MIP_LEVELS if MIPMAPS else 1
+    frame = renderMap(colorMaps[:levels], heightMaps[:levels], skyPixels, POS, heightScale=HEIGHT_SCALE,
+                      horizon=HORIZON_HEIGHT, distance=RENDER_DISTANCE, distanceScale=DISTANCE_SCALE,
+                      schedule=STEP_SCHEDULE, quality=QUALITY, renderer=stripRenderer)
+    pygame.surfarray.blit_array(window, frame)
 
 ######################################################
 # Variables
 colorMapFile = "maps/color4.png"
 heightMapFile = "maps/height4.png"
 backgroundSurface = pygame.transform.scale(pygame.image.load(os.path.join(pathFile, "images/sky.jpg")), (WIDTH, HEIGHT))
+pixelFormat = PixelFormat(window)
+skyPixels = pixelFormat.mapColors(pygame.surfarray.array3d(backgroundSurface))
 POS = Vector2(440, 250)
 ROTATION = 0
 moveSpeed = 25
@@ -196,47 +203,65 @@ moveDelta = 0
 pitchDelta = 0
 rotationDelta = 0
 heightDelta = 0
-RENDER_STEP = 4
+USE_MAP_CACHE = True
 RENDER_DISTANCE = 800
 DISTANCE_SCALE = 300
 HORIZON_HEIGHT = 100
 HEIGHT_SCALE = 100
 CAMERA_HEIGHT = 255
-
-# Get maps
-colorMap, heightMap = loadMaps(colorMapFile, heightMapFile)
-renderFrame()
-
-while True:
-    lastPos = POS.copy()
-    checkInput()
-
-    render = False
-    if moveDelta != 0:
-        # POS += moveDelta.normalize() * moveSpeed
-        x = -cos(radians(ROTATION + 90)) * moveDelta
-        y = sin(radians(ROTATION + 90)) * moveDelta
-        POS.x += x
-        POS.y += y
-        render = True
-
-    if pitchDelta != 0:
-        HORIZON_HEIGHT += pitchDelta / 1000 * clock.get_time()
-        render = True
-
-    if rotationDelta != 0:
-        ROTATION += rotationDelta / 1000 * clock.get_time()
-        render = True
-
-    if heightDelta != 0:
-        CAMERA_HEIGHT -= heightDelta / 1000 * clock.get_time()
-        render = True
-
-    # print(ROTATION)
-
-    if render:
-        renderFrame()
-
-    pygame.display.set_caption(f"Voxel Space | FPS: {clock.get_fps():.0f}")
-    pygame.display.update()
-    clock.tick(FPS)
\ No newline at end of file
+# Depth steps (see getDepths). The quality is changed with - and =, the schedule with t
+STEP_SCHEDULE = "accelerating"
+QUALITY = 1
+QUALITY_FACTOR = 2 ** .5
+MIN_QUALITY = 1 / 8
+MAX_QUALITY = 4
+# Whether far away steps sample smaller maps (see terrain.renderColumns), changed with m
+MIPMAPS = True
+# Strips of the screen rendered in parallel, in a pool of threads or processes (see terrain.StripRenderer).
+# One renders the whole screen in the main thread
+RENDER_WORKERS = 1
+RENDER_EXECUTOR = "process"
+stripRenderer: StripRenderer = None
+
+if __name__ == "__main__":
+    # Get maps
+    colorMap, heightMap = loadMaps(colorMapFile, heightMapFile, USE_MAP_CACHE)
+    colorMaps, heightMaps = getMipmaps(colorMap), getMipmaps(heightMap)
+    if RENDER_WORKERS > 1:
+        stripRenderer = StripRenderer((WIDTH, HEIGHT), RENDER_WORKERS, RENDER_EXECUTOR)
+    renderFrame()
+
+    while True:
+        lastPos = POS.copy()
+        checkInput()
+
+        render = False
+        if moveDelta != 0:
+            # POS += moveDelta.normalize() * moveSpeed
+            x = -cos(radians(ROTATION + 90)) * moveDelta
+            y = sin(radians(ROTATION + 90)) * moveDelta
+            POS.x += x
+            POS.y += y
+            render = True
+
+        if pitchDelta != 0:
+            HORIZON_HEIGHT += pitchDelta / 1000 * clock.get_time()
+            render = True
+
+        if rotationDelta != 0:
+            ROTATION += rotationDelta / 1000 * clock.get_time()
+            render = True
+
+        if heightDelta != 0:
+            CAMERA_HEIGHT -= heightDelta / 1000 * clock.get_time()
+            render = True
+
+        # print(ROTATION)
+
+        if render:
+            renderFrame()
+
+        pygame.display.set_caption(f"Voxel Space | FPS: {clock.get_fps():.0f} | "
+                                   f"Steps: {STEP_SCHEDULE}, quality {QUALITY:.2f} | Mipmaps: {MIPMAPS}")
+        pygame.display.update()
+        clock.tick(FPS)
\ No newline at end of file
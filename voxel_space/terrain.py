@@ -0,0 +1,290 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from math import cos, floor, radians, sin
+from multiprocessing import shared_memory
+import weakref
+import numpy as np
+import pygame
+import sys
+sys.dont_write_bytecode = True
+
+# How the distance between depth steps grows: constant, by a fixed amount every step, or in proportion to the depth
+STEP_SCHEDULES = ("linear", "accelerating", "geometric")
+ACCELERATION = .01
+GEOMETRIC_STEP = .01
+
+# Most levels a map's mipmaps have (see getMipmaps), the full size map included
+MIP_LEVELS = 6
+
+# Where StripRenderer renders the strips
+EXECUTORS = ("thread", "process")
+
+class PixelFormat:
+    def __init__(self, surface: pygame.Surface=None) -> None:
+        # Format of a regular 32 bit surface when no surface is given
+        self.shifts = (16, 8, 0)
+        self.losses = (0, 0, 0)
+        self.alphaMask = 0
+        if surface:
+            self.shifts = surface.get_shifts()[:3]
+            self.losses = surface.get_losses()[:3]
+            self.alphaMask = surface.get_masks()[3]
+
+    def mapColors(self, colors: np.ndarray) -> np.ndarray:
+        # Vectorized Surface.map_rgb: (..., 3) RGB values to mapped pixels, without needing the surface
+        colors = np.asarray(colors, dtype=np.uint32)
+        mapped = np.full(colors.shape[:-1], self.alphaMask, dtype=np.uint32)
+        for channel in range(3):
+            mapped |= (colors[..., channel] >> self.losses[channel]) << self.shifts[channel]
+        return mapped
+
+class View:
+    '''
+    Everything a frame depends on besides the maps: where the camera is (map x, y and height), where it looks
+    (rotation in degrees, and the screen row of the horizon), the projection and the depth steps (see getDepths)'''
+
+    def __init__(self, x: float, y: float, rotation: float, cameraHeight: float, horizon: float, heightScale: float,
+                 distance: float, distanceScale: float, schedule: str="accelerating", quality: float=1,
+                 earlyOut: bool=True) -> None:
+        self.x, self.y = x, y
+        self.rotation = rotation
+        self.cameraHeight = cameraHeight
+        self.horizon = horizon
+        self.heightScale = heightScale
+        self.distance = distance
+        self.distanceScale = distanceScale
+        self.schedule = schedule
+        self.quality = quality
+        self.earlyOut = earlyOut
+
+def getDepths(distance: float, schedule: str="accelerating", quality: float=1) -> list[float]:
+    '''
+    Distance of every depth step, starting one unit from the camera (see STEP_SCHEDULES). The first step is 1 / quality
+    long and the others scale the same way, so quality sets the trade-off between speed and detail far away'''
+
+    if schedule not in STEP_SCHEDULES:
+        raise ValueError(f"Unknown step schedule {schedule!r}, expected one of {STEP_SCHEDULES}")
+
+    depths: list[float] = []
+    dz = 1 / quality
+    z = 1
+    while z < distance:
+        depths.append(z)
+        if schedule == "geometric":
+            z += max(1, z * GEOMETRIC_STEP) / quality
+        else:
+            z += dz
+            if schedule == "accelerating":
+                dz += ACCELERATION / quality
+    return depths
+
+def getMipmaps(array: np.ndarray, levels: int=MIP_LEVELS) -> list[np.ndarray]:
+    '''
+    The map followed by smaller and smaller versions of it, each half the size of the last with every texel the
+    average of 2x2 texels of the last one. Map sizes are powers of two, so every level keeps wrapping with a mask'''
+
+    mipmaps = [array]
+    while len(mipmaps) < levels and min(mipmaps[-1].shape[:2]) > 1:
+        last = mipmaps[-1].astype(np.uint16)
+        total = last[0::2, 0::2] + last[1::2, 0::2] + last[0::2, 1::2] + last[1::2, 1::2]
+        mipmaps.append(((total + 2) >> 2).astype(np.uint8))
+    return mipmaps
+
+def renderColumns(frame: np.ndarray, colorMaps: list[np.ndarray], heightMaps: list[np.ndarray], sky: np.ndarray,
+                  pixelFormat: PixelFormat, view: View, first: int, last: int) -> None:
+    '''
+    Renders screen columns first to last (excluded) of the terrain front to back over the sky, into the same columns
+    of frame. frame and sky are (width, height) arrays of mapped pixels (x first, so a range of columns is one
+    contiguous block). Columns don't depend on each other, so any split of the screen gives the same frame.
+    Every depth step projects all the columns at once. Only the part of a column above everything drawn so far is
+    visible, so instead of drawing, each step records its depth at the row its visible span starts. A pixel then
+    belongs to the nearest span starting at or above it, and the columns are filled in a single gather at the end:
+    every pixel is written once and occluded spans cost nothing.
+    colorMaps and heightMaps are the maps' mipmaps (see getMipmaps). Every step samples the level whose texels are
+    about the size of the map area one of its samples stands for, so far away steps don't skip texels (which
+    flickers as the camera moves) and read much less memory. A single level turns this off.
+    With earlyOut, a column stops being sampled once no farther terrain can rise above its top (the highest point of
+    the map would still be below it), and the columns are done once every one of them has'''
+
+    width, height = frame.shape
+    sinA = sin(radians(view.rotation))
+    cosA = cos(radians(view.rotation))
+    depths = getDepths(view.distance, view.schedule, view.quality)
+    columns = np.arange(first, last)
+    # Area a sample stands for: the distance to the next column across the view and to the next step along it
+    footprints = np.maximum(2 * np.array(depths) / width, np.diff(depths, append=view.distance))
+    levels = np.clip(np.floor(np.log2(footprints)), 0, len(heightMaps) - 1).astype(np.intp).tolist()
+
+    # Highest row drawn so far in every column
+    columnHeights = np.full(len(columns), height, dtype=np.intp)
+    # Depth step of the span starting at every pixel, len(depths) (the sky) where none does
+    spanStarts = np.full((len(columns), height), len(depths), dtype=np.intp)
+    # Color of every column at every depth step
+    stepColors = np.empty((len(depths) + 1, len(columns), 3), dtype=np.uint8)
+    # Columns still being sampled (positions in columns), and how to index them (a slice is cheaper while they all are)
+    active = np.arange(len(columns))
+    activeIndex = slice(None)
+    # Screen height of a map height at depth z is horizon + (cameraHeight - height) * scale / z
+    scale = view.heightScale / 255 * view.distanceScale
+    highest = view.cameraHeight - int(heightMaps[0].max())
+
+    for step, z in enumerate(depths):
+        # Ends of the line of the map seen at this depth, sampled once per active column
+        leftX = (-cosA * z - sinA * z) + view.x
+        leftY = ( sinA * z - cosA * z) + view.y
+        rightX = ( cosA * z - sinA * z) + view.x
+        rightY = (-sinA * z - cosA * z) + view.y
+        # Texel of the step's level each sample is in, texel i of level k covering texels i * 2^k to (i + 1) * 2^k
+        # of the full map, which are centered on their coordinates
+        heightMap, colorMap = heightMaps[levels[step]], colorMaps[levels[step]]
+        texelSize = 1 / 2 ** levels[step]
+        activeColumns = columns[activeIndex]
+        mapX = np.floor((leftX + .5 + activeColumns * ((rightX - leftX) / width)) * texelSize).astype(np.intp)
+        mapY = np.floor((leftY + .5 + activeColumns * ((rightY - leftY) / width)) * texelSize).astype(np.intp)
+        mapX &= heightMap.shape[1] - 1
+        mapY &= heightMap.shape[0] - 1
+
+        heights = heightMap[mapY, mapX].astype(np.float64)
+        heightOnScreen = (view.cameraHeight - heights) * (scale / z) + view.horizon
+        tops = np.clip(np.floor(heightOnScreen), 0, height).astype(np.intp)
+        activeHeights = columnHeights[activeIndex]
+        visible = tops < activeHeights
+        spanStarts[active[visible], tops[visible]] = step
+        activeHeights = np.minimum(activeHeights, tops)
+        columnHeights[activeIndex] = activeHeights
+        stepColors[step, activeIndex] = colorMap[mapY, mapX]
+
+        if view.earlyOut:
+            # Highest row the highest point of the map reaches from here on: it rises toward the horizon with depth
+            # when the camera is above it, so it's highest at the farthest depth, and sinks away from it otherwise,
+            # so it's never higher than at this depth
+            limit = max(floor(view.horizon + highest * scale / (view.distance if highest >= 0 else z)), 0)
+            remaining = activeHeights > limit
+            if not remaining.all():
+                active = activeIndex = active[remaining]
+                if len(active) == 0:
+                    break
+
+    # Going down a column, spans start nearer and nearer, so the nearest one starting above a pixel is the minimum.
+    # Mapped pixels are a single integer each, cheaper to gather than three channels
+    np.minimum.accumulate(spanStarts, axis=1, out=spanStarts)
+    strip = frame[first:last]
+    # Written straight into the frame; mode="clip" keeps take from buffering the output (the indexes are all valid)
+    np.take(pixelFormat.mapColors(stepColors).ravel(), spanStarts * len(columns) + np.arange(len(columns))[:, None],
+            out=strip, mode="clip")
+    np.copyto(strip, sky[first:last], where=spanStarts == len(depths))
+
+# Shared memory blocks attached by this (worker) process, by name
+_attachedBuffers: dict[str, tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+def getSharedArray(name: str, shape: tuple[int, ...], dtype: type) -> np.ndarray:
+    if name not in _attachedBuffers:
+        # Workers share the creating process' resource tracker, which unregisters the block when it's unlinked there
+        memory = shared_memory.SharedMemory(name=name)
+        _attachedBuffers[name] = memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    return _attachedBuffers[name][1]
+
+def detachSharedArrays(names: set[str]) -> None:
+    # Lets go of attached blocks that aren't in use anymore (the maps of an older frame)
+    for name in list(_attachedBuffers):
+        if name not in names:
+            memory, _ = _attachedBuffers.pop(name)
+            memory.close()
+
+def renderStrip(buffers: tuple, pixelFormat: PixelFormat, view: View, first: int, last: int) -> None:
+    '''
+    renderColumns for a strip of the screen. buffers are the frame, sky, color mipmaps and height mipmaps, or
+    (name, shape, dtype) of the shared memory blocks holding them when running in another process'''
+
+    frame, sky, colorMaps, heightMaps = buffers
+    if isinstance(frame, tuple):
+        detachSharedArrays({name for name, _, _ in (frame, sky, *colorMaps, *heightMaps)})
+        frame, sky = getSharedArray(*frame), getSharedArray(*sky)
+        colorMaps = [getSharedArray(*level) for level in colorMaps]
+        heightMaps = [getSharedArray(*level) for level in heightMaps]
+    renderColumns(frame, colorMaps, heightMaps, sky, pixelFormat, view, first, last)
+
+class StripRenderer:
+    '''
+    Renders the terrain in parallel: the screen is split into vertical strips of columns (contiguous in the x-first
+    layout) and renderColumns runs for every strip in a thread or process pool. With processes the frame, the sky
+    and the maps live in shared memory, so workers read the maps without copying them and write their strips
+    straight into the frame. Either way the strips land in one frame array, which is blitted as is'''
+
+    def __init__(self, size: tuple[int, int], strips: int, executor: str="thread", workers: int=None) -> None:
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor \"{executor}\", expected one of {', '.join(EXECUTORS)}")
+        self.size = size
+        self.strips = strips
+        self.executor = executor
+        self._memories: list[shared_memory.SharedMemory] = []
+        # Maps and sky the shared copies were made from, and the copies
+        self._sources: tuple = None
+        self._sharedMaps: tuple = None
+        self._sharedFrame: tuple = None
+        if executor == "process":
+            self._sharedFrame, self.frame = self.createSharedArray(size, np.uint32)
+        else:
+            self.frame = np.empty(size, dtype=np.uint32)
+
+        self.pool: Executor = (ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor)(workers or strips)
+        self._finalizer = weakref.finalize(self, StripRenderer.release, self.pool, self._memories)
+
+    def createSharedArray(self, shape: tuple[int, ...], dtype: type) -> tuple[tuple, np.ndarray]:
+        # A new shared memory block, as the (name, shape, dtype) workers attach it by and the array on it
+        memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+        self._memories.append(memory)
+        return (memory.name, tuple(shape), dtype), np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    def shareArray(self, array: np.ndarray) -> tuple:
+        description, shared = self.createSharedArray(array.shape, array.dtype.type)
+        shared[...] = array
+        return description
+
+    def freeSharedMaps(self) -> None:
+        # Every block but the frame's, which is the first one
+        for memory in self._memories[1:]:
+            memory.close()
+            memory.unlink()
+        del self._memories[1:]
+
+    @staticmethod
+    def release(pool: Executor, memories: list[shared_memory.SharedMemory]) -> None:
+        pool.shutdown()
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    def close(self) -> None:
+        # Stops the workers and frees the shared memory; the renderer can't be used afterwards
+        self.frame = None
+        self._finalizer()
+
+    def getBuffers(self, colorMaps: list[np.ndarray], heightMaps: list[np.ndarray], sky: np.ndarray) -> tuple:
+        if self.executor == "thread":
+            return self.frame, sky, colorMaps, heightMaps
+
+        # Processes get shared copies, made again only when the maps change
+        sources = (*colorMaps, *heightMaps, sky)
+        if self._sources is None or len(sources) != len(self._sources) or \
+                any(source is not old for source, old in zip(sources, self._sources)):
+            self.freeSharedMaps()
+            self._sharedMaps = ([self.shareArray(level) for level in colorMaps],
+                                [self.shareArray(level) for level in heightMaps], self.shareArray(sky))
+            self._sources = sources
+        sharedColors, sharedHeights, sharedSky = self._sharedMaps
+        return self._sharedFrame, sharedSky, sharedColors, sharedHeights
+
+    def getStripColumns(self) -> list[tuple[int, int]]:
+        edges = np.linspace(0, self.size[0], self.strips + 1).round().astype(int).tolist()
+        return [(edges[i], edges[i+1]) for i in range(self.strips) if edges[i] < edges[i+1]]
+
+    def render(self, colorMaps: list[np.ndarray], heightMaps: list[np.ndarray], sky: np.ndarray,
+               pixelFormat: PixelFormat, view: View) -> np.ndarray:
+        # The frame (see renderColumns). It's the renderer's own array, overwritten by the next render
+        buffers = self.getBuffers(colorMaps, heightMaps, sky)
+        results = [self.pool.submit(renderStrip, buffers, pixelFormat, view, first, last)
+                   for first, last in self.getStripColumns()]
+        for result in results:
+            # Raises the worker's exception, if any
+            result.result()
+        return self.frame